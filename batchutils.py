@@ -0,0 +1,92 @@
+#name:			batchutils
+#created:		October 2026
+#description:	run the same process over a batch of files, optionally in parallel across a pool of worker processes.
+#				shared by the command line tools so they all behave the same way.
+
+import sys
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+###############################################################################
+class BATCHRESULT:
+	'''the outcome of processing one file in a batch'''
+	def __init__(self, filename, ok, result=None, error="", duration=0.0):
+		self.filename = filename
+		self.ok = ok
+		self.result = result
+		self.error = error
+		self.duration = duration
+
+	###############################################################################
+	def __str__(self):
+		if self.ok:
+			return "%s OK (%.1f seconds)" % (self.filename, self.duration)
+		return "%s FAILED (%.1f seconds)\n%s" % (self.filename, self.duration, self.error)
+
+###############################################################################
+def runbatch(function, filenames, jobs=1, args=(), kwargs=None):
+	'''
+	call function(filename, *args, **kwargs) for every file.  jobs is the number of worker processes, 1 processes the files here one at a time and 0 uses every cpu.
+	function must be a module level function so it can be sent to the worker processes.
+	an exception in one file is caught and reported in its result, so one bad file does not stop the batch.
+	returns a list of BATCHRESULT in the same order as filenames
+	'''
+	if kwargs is None:
+		kwargs = {}
+	if jobs <= 0:
+		jobs = os.cpu_count() or 1
+	jobs = min(jobs, max(len(filenames), 1))
+
+	results = [None] * len(filenames)
+	if jobs == 1:
+		for i, filename in enumerate(filenames):
+			results[i] = runjob(function, filename, args, kwargs)
+			update_progress("Processed: %s (%d/%d)" % (filename, i + 1, len(filenames)), (i + 1) / len(filenames))
+		return results
+
+	with ProcessPoolExecutor(max_workers=jobs) as executor:
+		futures = {executor.submit(runjob, function, filename, args, kwargs): i for i, filename in enumerate(filenames)}
+		try:
+			for completed, future in enumerate(as_completed(futures), 1):
+				i = futures[future]
+				try:
+					results[i] = future.result()
+				except Exception:
+					# the worker process itself died (e.g. out of memory), so we only have the pool's error
+					results[i] = BATCHRESULT(filenames[i], False, error=traceback.format_exc())
+				update_progress("Processed: %s (%d/%d)" % (filenames[i], completed, len(filenames)), completed / len(filenames))
+		except KeyboardInterrupt:
+			for future in futures:
+				future.cancel()
+			raise
+	return results
+
+###############################################################################
+def runjob(function, filename, args, kwargs):
+	'''process one file and capture the result or the error.  this runs in the worker process'''
+	start_time = time.time()
+	try:
+		result = function(filename, *args, **kwargs)
+		return BATCHRESULT(filename, True, result, duration=time.time() - start_time)
+	except Exception:
+		return BATCHRESULT(filename, False, error=traceback.format_exc(), duration=time.time() - start_time)
+
+###############################################################################
+def printsummary(results):
+	'''print the files which failed.  returns the number of failures'''
+	failures = [r for r in results if not r.ok]
+	print ("\nProcessed %d files, %d failed" % (len(results), len(failures)))
+	for r in failures:
+		print (r)
+	return len(failures)
+
+###############################################################################
+def update_progress(job_title, progress):
+	length = 20 # modify this to change the length
+	block = int(round(length*progress))
+	msg = "\r{0}: [{1}] {2}%".format(job_title, "#"*block + "-"*(length-block), round(progress*100, 2))
+	if progress >= 1: msg += " DONE\r\n"
+	sys.stdout.write(msg)
+	sys.stdout.flush()
@@ -27,10 +27,16 @@ import time
 import datetime
 import math
 import random
+import tempfile
 from datetime import datetime
 from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
 from statistics import mean
-# import mmap
+import asyncio
+import mmap
+import queue
+import threading
 from delivershared import log as log, makedirs
 # for testing only...
 import numpy as np
@@ -149,9 +155,9 @@ SCALE_FACTORS     					=	100
 # EM121A_SIS_RAW_SPECIFIC       		148
 # EM2040_SPECIFIC     					149
 # DELTA_T_SPECIFIC     					150
-# R2SONIC_2022_SPECIFIC      			151
-# R2SONIC_2024_SPECIFIC     			152             
-# R2SONIC_2020_SPECIFIC     			153             
+R2SONIC_2022_SPECIFIC      				=	151
+R2SONIC_2024_SPECIFIC     				=	152
+R2SONIC_2020_SPECIFIC     				=	153
 # SB_ECHOTRAC_SPECIFIC (obsolete)       206
 # SB_BATHY2000_SPECIFIC (obsolete)      207
 # SB_MGD77_SPECIFIC (obsolete)          208
@@ -159,6 +165,165 @@ SCALE_FACTORS     					=	100
 # SB_NOSHDB_SPECIFIC   (obsolete)       210
 # SB_PDD_SPECIFIC   (obsolete)          211
 # SB_NAVISOUND_SPECIFIC   (obsolete)    212
+
+# the sensor specific subrecords of the sonars whose intensity series carry the r2sonic imagery header.  we cannot decode the intensity series of other sonars yet
+R2SONIC_SPECIFIC = [R2SONIC_2022_SPECIFIC, R2SONIC_2024_SPECIFIC, R2SONIC_2020_SPECIFIC]
+
+# the attribute names used by SWATH_BATHYMETRY_PING for each of the beam array subrecords
+ARRAYNAMES = {
+	DEPTH_ARRAY:					"DEPTH_ARRAY",
+	ACROSS_TRACK_ARRAY:				"ACROSS_TRACK_ARRAY",
+	ALONG_TRACK_ARRAY:				"ALONG_TRACK_ARRAY",
+	TRAVEL_TIME_ARRAY:				"TRAVEL_TIME_ARRAY",
+	BEAM_ANGLE_ARRAY:				"BEAM_ANGLE_ARRAY",
+	MEAN_CAL_AMPLITUDE_ARRAY:		"MEAN_CAL_AMPLITUDE_ARRAY",
+	MEAN_REL_AMPLITUDE_ARRAY:		"MEAN_REL_AMPLITUDE_ARRAY",
+	ECHO_WIDTH_ARRAY:				"ECHO_WIDTH_ARRAY",
+	QUALITY_FACTOR_ARRAY:			"QUALITY_FACTOR_ARRAY",
+	RECEIVE_HEAVE_ARRAY:			"RECEIVE_HEAVE_ARRAY",
+	DEPTH_ERROR_ARRAY:				"DEPTH_ERROR_ARRAY",
+	ACROSS_TRACK_ERROR_ARRAY:		"ACROSS_TRACK_ERROR_ARRAY",
+	ALONG_TRACK_ERROR_ARRAY:		"ALONG_TRACK_ERROR_ARRAY",
+	NOMINAL_DEPTH_ARRAY:			"NOMINAL_DEPTH_ARRAY",
+	QUALITY_FLAGS_ARRAY:			"QUALITY_FLAGS_ARRAY",
+	BEAM_FLAGS_ARRAY:				"BEAM_FLAGS_ARRAY",
+	SIGNAL_TO_NOISE_ARRAY:			"SIGNAL_TO_NOISE_ARRAY",
+	BEAM_ANGLE_FORWARD_ARRAY:		"BEAM_ANGLE_FORWARD_ARRAY",
+	VERTICAL_ERROR_ARRAY:			"VERTICAL_ERROR_ARRAY",
+	HORIZONTAL_ERROR_ARRAY:			"HORIZONTAL_ERROR_ARRAY",
+	INTENSITY_SERIES_ARRAY:			"SNIPPET_SERIES_ARRAY",
+	SECTOR_NUMBER_ARRAY:			"SECTOR_NUMBER_ARRAY",
+	DETECTION_INFO_ARRAY:			"DETECTION_INFO_ARRAY",
+	INCIDENT_BEAM_ADJ_ARRAY:		"INCIDENT_BEAM_ADJ_ARRAY",
+	SYSTEM_CLEANING_ARRAY:			"SYSTEM_CLEANING_ARRAY",
+	DOPPLER_CORRECTION_ARRAY:		"DOPPLER_CORRECTION_ARRAY",
+	SONAR_VERT_UNCERTAINTY_ARRAY:	"SONAR_VERT_UNCERTAINTY_ARRAY",
+}
+
+# the signedness of each fixed size beam array subrecord.  the number of bytes per beam comes from the subrecord size, so together these give the numpy data type
+ARRAYSIGNED = {
+	DEPTH_ARRAY:					False,
+	ACROSS_TRACK_ARRAY:				True,
+	ALONG_TRACK_ARRAY:				True,
+	TRAVEL_TIME_ARRAY:				False,
+	BEAM_ANGLE_ARRAY:				True,
+	MEAN_CAL_AMPLITUDE_ARRAY:		True,
+	MEAN_REL_AMPLITUDE_ARRAY:		False,
+	ECHO_WIDTH_ARRAY:				False,
+	QUALITY_FACTOR_ARRAY:			False,
+	RECEIVE_HEAVE_ARRAY:			True,
+	DEPTH_ERROR_ARRAY:				False,
+	ACROSS_TRACK_ERROR_ARRAY:		False,
+	ALONG_TRACK_ERROR_ARRAY:		False,
+	NOMINAL_DEPTH_ARRAY:			False,
+	QUALITY_FLAGS_ARRAY:			False,
+	BEAM_FLAGS_ARRAY:				False,
+	SIGNAL_TO_NOISE_ARRAY:			True,
+	BEAM_ANGLE_FORWARD_ARRAY:		False,
+	VERTICAL_ERROR_ARRAY:			False,
+	HORIZONTAL_ERROR_ARRAY:			False,
+	SECTOR_NUMBER_ARRAY:			False,
+	DETECTION_INFO_ARRAY:			False,
+	INCIDENT_BEAM_ADJ_ARRAY:		True,
+	SYSTEM_CLEANING_ARRAY:			False,
+	DOPPLER_CORRECTION_ARRAY:		True,
+	SONAR_VERT_UNCERTAINTY_ARRAY:	False,
+}
+
+# bytes per value: (unsigned, signed) big endian numpy data types
+ARRAYDATATYPES = {1: ('u1', 'i1'), 2: ('>u2', '>i2'), 4: ('>u4', '>i4')}
+
+# the scale factors GSFWRITER uses for arrays which do not already carry one: (multiplier, offset, bytes per value).  the writer widens the field if the quantised values do not fit
+ARRAYSCALEFACTORS = {
+	DEPTH_ARRAY:					(100, 0, 2),
+	ACROSS_TRACK_ARRAY:				(100, 0, 2),
+	ALONG_TRACK_ARRAY:				(100, 0, 2),
+	TRAVEL_TIME_ARRAY:				(10000, 0, 2),
+	BEAM_ANGLE_ARRAY:				(100, 0, 2),
+	MEAN_CAL_AMPLITUDE_ARRAY:		(2, 0, 1),
+	MEAN_REL_AMPLITUDE_ARRAY:		(2, 0, 2),
+	ECHO_WIDTH_ARRAY:				(100, 0, 2),
+	QUALITY_FACTOR_ARRAY:			(1, 0, 1),
+	RECEIVE_HEAVE_ARRAY:			(100, 0, 1),
+	DEPTH_ERROR_ARRAY:				(100, 0, 2),
+	ACROSS_TRACK_ERROR_ARRAY:		(100, 0, 2),
+	ALONG_TRACK_ERROR_ARRAY:		(100, 0, 2),
+	NOMINAL_DEPTH_ARRAY:			(100, 0, 2),
+	QUALITY_FLAGS_ARRAY:			(1, 0, 1),
+	BEAM_FLAGS_ARRAY:				(1, 0, 1),
+	SIGNAL_TO_NOISE_ARRAY:			(1, 0, 1),
+	BEAM_ANGLE_FORWARD_ARRAY:		(100, 0, 2),
+	VERTICAL_ERROR_ARRAY:			(100, 0, 2),
+	HORIZONTAL_ERROR_ARRAY:			(100, 0, 2),
+	SECTOR_NUMBER_ARRAY:			(1, 0, 1),
+	DETECTION_INFO_ARRAY:			(1, 0, 1),
+	INCIDENT_BEAM_ADJ_ARRAY:		(1, 0, 1),
+	SYSTEM_CLEANING_ARRAY:			(1, 0, 1),
+	DOPPLER_CORRECTION_ARRAY:		(1, 0, 1),
+	SONAR_VERT_UNCERTAINTY_ARRAY:	(100, 0, 2),
+}
+
+# the gsf version string GSFWRITER puts in the HEADER record
+GSF_WRITER_VERSION = "GSF-v03.09"
+
+# the time series intensity header at the start of subrecord 21: bits per sample, applied corrections and spare
+INTENSITY_SERIES_HEADER_FORMAT = '>bl16s'
+
+# the r2sonic imagery specific header which follows the time series intensity header in subrecord 21
+R2SONIC_IMAGERY_FORMAT = '>12s12slll lllll llllhh lllll lllhh lllll l32s'
+
+# bytes per sample: the numpy type used to keep the raw intensity time series samples
+SNIPPETSAMPLETYPES = {1: np.uint8, 2: np.uint16, 4: np.uint32}
+
+# stop compiling new ping layouts beyond this many per file.  pings with other layouts use the generic decode
+MAX_COMPILED_LAYOUTS = 64
+
+# the scaled ping header attributes decoded by SWATH_BATHYMETRY_PING.read()
+PINGHEADERNAMES = ["timestamp", "longitude", "latitude", "numbeams", "centrebeam", "pingflags", "tidecorrector", "depthcorrector", "heading", "pitch", "roll", "heave", "course", "speed", "height", "separation", "gpstidecorrector"]
+
+# the ping header as stored in the file ('>llll5hlH3h2Hlllh'), so we can decode the headers of many pings at once
+PINGHEADER_RAW_DTYPE = np.dtype([('time', '>i4'), ('nanotime', '>i4'), ('longitude', '>i4'), ('latitude', '>i4'), ('numbeams', '>i2'), ('centrebeam', '>i2'), ('pingflags', '>i2'), ('reserved', '>i2'), 
+	('tidecorrector', '>i2'), ('depthcorrector', '>i4'), ('heading', '>u2'), ('pitch', '>i2'), ('roll', '>i2'), ('heave', '>i2'), ('course', '>u2'), ('speed', '>u2'), 
+	('height', '>i4'), ('separation', '>i4'), ('gpstidecorrector', '>i4'), ('spare', '>i2')])
+
+# an attitude measurement as stored in the ATTITUDE record.  the time is a millisecond offset from the record time.  heading is unsigned
+ATTITUDE_RAW_DTYPE = np.dtype([('time', '>i2'), ('pitch', '>i2'), ('roll', '>i2'), ('heave', '>i2'), ('heading', '>u2')])
+
+# the attitude returned by GSFREADER.loadattitude(), one row per measurement
+ATTITUDE_DTYPE = np.dtype([('timestamp', 'f8'), ('roll', 'f8'), ('pitch', 'f8'), ('heave', 'f8'), ('heading', 'f8')])
+
+# the navigation returned by GSFREADER.loadnavigation(), one row per ping
+NAVIGATION_DTYPE = np.dtype([('timestamp', 'f8'), ('longitude', 'f8'), ('latitude', 'f8'), ('height', 'f8'), ('roll', 'f8'), ('pitch', 'f8'), ('heading', 'f8'), ('deltatime', 'f8')])
+
+# the ping header table used by PINGBATCH, one row per ping
+PINGHEADER_DTYPE = np.dtype([(name, 'i4') if name in ("numbeams", "centrebeam", "pingflags") else (name, 'f8') for name in PINGHEADERNAMES])
+
+# read the file in large blocks when walking the record headers.  this keeps a full file walk running at disk bandwidth
+WALK_BLOCK_SIZE = 4 * 1024 * 1024
+
+# verify reads the file in blocks of this size and recomputes the checksums of every record in a block in one go
+VERIFY_BLOCK_SIZE = 16 * 1024 * 1024
+# when searching for the next record after corruption, a candidate record header is only trusted if this many records chain on from it
+VERIFY_RESYNC_RECORDS = 3
+
+# the async reader reads the file in blocks of this size, keeping ASYNC_INFLIGHT_BLOCKS reads in flight
+ASYNC_BLOCK_SIZE = 1024 * 1024
+ASYNC_INFLIGHT_BLOCKS = 4
+
+# every sidecar file (see writesidecar) starts with the magic, version, gsf file size and gsf modified time in nanoseconds, then the row count of each array it holds
+SIDECAR_HEADER_FORMAT = "<6sHQq"
+
+# the record index sidecar.  one row per record so we can jump straight to any ping without walking the file.  it holds the records then the scale factor rows
+GSFIDX_EXTENSION = ".gsfidx"
+GSFIDX_MAGIC = b"GSFIDX"
+GSFIDX_VERSION = 3
+# sfid is the scale factor set in effect when decoding each ping (-1 for none, and for non ping records)
+GSFIDX_DTYPE = np.dtype([('offset', '<u8'), ('numberofbytes', '<u4'), ('recordidentifier', '<u4'), ('timestamp', '<f8'), ('sfid', '<i4')])
+# the distinct scale factor sets in the file, one row per scale factor
+GSFIDX_SCALEFACTOR_DTYPE = np.dtype([('sfid', '<i4'), ('subrecordid', '<i4'), ('compressionflag', '<i4'), ('multiplier', '<i4'), ('offset', '<i4')])
+# gsflib writes the scale factors as the first subrecord of a ping, so peeking this far past the record header lets the index see them without reading the beam arrays
+GSFIDX_PEEK_BYTES = 56 + 8 + (12 * 32)
+
 ###############################################################################
 def main():
 
@@ -197,7 +362,7 @@ def testreader():
 	r = GSFREADER(filename)
 	# r.loadscalefactors()
 	navigation = r.loadnavigation()
-	# ts, roll, pitch, heave, heading = r.loadattitude()
+	# attitude = r.loadattitude()
 
 	while r.moreData():
 		# read a datagram.  If we support it, return the datagram type and aclass for that datagram
@@ -282,84 +447,41 @@ class SWATH_BATHYMETRY_PING :
 		self.BEAM_ANGLE_ARRAY = []
 		self.MEAN_CAL_AMPLITUDE_ARRAY = []
 		self.MEAN_REL_AMPLITUDE_ARRAY = []
+		self.ECHO_WIDTH_ARRAY = []
 		self.QUALITY_FACTOR_ARRAY = []
+		self.RECEIVE_HEAVE_ARRAY = []
+		self.DEPTH_ERROR_ARRAY = []
+		self.ACROSS_TRACK_ERROR_ARRAY = []
+		self.ALONG_TRACK_ERROR_ARRAY = []
+		self.NOMINAL_DEPTH_ARRAY = []
 		self.QUALITY_FLAGS_ARRAY = []
 		self.BEAM_FLAGS_ARRAY = []
+		self.SIGNAL_TO_NOISE_ARRAY = []
 		self.BEAM_ANGLE_FORWARD_ARRAY = []
 		self.VERTICAL_ERROR_ARRAY = []
 		self.HORIZONTAL_ERROR_ARRAY = []
 		self.SECTOR_NUMBER_ARRAY = []
+		self.DETECTION_INFO_ARRAY = []
+		self.INCIDENT_BEAM_ADJ_ARRAY = []
+		self.SYSTEM_CLEANING_ARRAY = []
+		self.DOPPLER_CORRECTION_ARRAY = []
+		self.SONAR_VERT_UNCERTAINTY_ARRAY = []
 		# self.INTENSITY_SERIES_ARRAY = []
 		self.SNIPPET_SERIES_ARRAY = []
+		# the full intensity time series as a ragged (CSR) array if keepsnippetseries is set.  the samples of beam b are SNIPPET_SAMPLES[SNIPPET_BEAM_OFFSETS[b]:SNIPPET_BEAM_OFFSETS[b+1]]
+		self.keepsnippetseries = False
+		self.SNIPPET_SAMPLES = []
+		self.SNIPPET_BEAM_OFFSETS = []
+		self.SNIPPET_BOTTOM_DETECT = []
+		self.layoutcache = None						# the per file cache of compiled ping layouts.  the reader shares this with every ping it creates
 		self.perbeam = True
 		self.snippettype = SNIPPET_MAX
+		self.sensorid = None						# the sensor specific subrecord identifier, which tells us how to decode the intensity series
 		self.numbeams = 0
 		self.time = 0
 		self.pingnanotime = 0
 		self.frequency = 0
 
-	###############################################################################
-	# def readscalefactors(self, headeronly=False):
-	# 	'''read the scale facttors
-	# 	'''
-	# 	# read ping header
-	# 	hdrfmt = '>llll5hLH3h2Hlllh'
-	# 	hdrlen = struct.calcsize(hdrfmt)
-	# 	rec_unpack = struct.Struct(hdrfmt).unpack
-
-	# 	self.fileptr.seek(self.offset + self.hdrlen, 0)   # move the file pointer to the start of the record so we can read from disc			  
-	# 	# self.fileptr.seek(self.offset + self.hdrlen , 0)   # move the file pointer to the start of the record so we can read from disc			  
-	# 	data = self.fileptr.read(hdrlen)
-	# 	s = rec_unpack(data)
-	# 	self.time 			= s[0] 
-	# 	self.pingnanotime 	= s[1] 
-	# 	self.timestamp		= self.time + (self.pingnanotime/1000000000)
-	# 	self.longitude 		= s[2] / 10000000
-	# 	self.latitude		= s[3] / 10000000
-	# 	self.numbeams 		= s[4]
-	# 	self.centrebeam 	= s[5]
-	# 	self.pingflags 		= s[6]
-	# 	self.reserved 		= s[7]
-	# 	self.tidecorrector	= s[8] / 100
-	# 	self.depthcorrector	= s[9] / 100
-	# 	self.heading		= s[10] / 100
-	# 	self.pitch			= s[11] / 100
-	# 	self.roll			= s[12] / 100
-	# 	self.heave			= s[13] / 100
-	# 	self.course			= s[14] / 100
-	# 	self.speed			= s[15] / 100
-	# 	self.height			= s[16] / 100
-	# 	self.separation		= s[17] / 100
-	# 	self.gpstidecorrector	= s[18] / 100
-	# 	self.spare			= s[19]
-
-	# 	# skip the record for performance reasons.  Very handy in some circumstances
-	# 	if headeronly:
-	# 		self.fileptr.seek(self.offset + self.numbytes, 0) #move forwards to the end of the record as we cannot trust the record length from the 2024
-	# 		return
-
-	# 	while (self.fileptr.tell() <= self.offset + self.numbytes): #dont read past the end of the packet length.  This should never happen!
-	# 		fmt = '>l'
-	# 		fmtlen = struct.calcsize(fmt)
-	# 		rec_unpack = struct.Struct(fmt).unpack
-	# 		data = self.fileptr.read(fmtlen)   # read the record from disc
-	# 		s = rec_unpack(data)
-
-	# 		subrecord_id = (s[0] & 0xFF000000) >> 24
-	# 		subrecord_size = s[0] & 0x00FFFFFF
-	# 		# print("id %d size %d" % (subrecord_id, subrecord_size))
-	# 			# if subrecord_id == 21: 
-	# 			# 	self.fileptr.seek(self.offset + self.numbytes, 0) #move forwards to the end of the record as we cannot trust the record length from the 2024
-	# 			# else:
-	# 			# 	self.fileptr.seek(subrecord_size, 1) #move forwards to the end of teh record
-	# 			# continue
-
-	# 		# now decode the subrecord
-	# 		# curr = self.fileptr.tell()
-	# 		if subrecord_id == 100: 
-	# 			sf = self.readscalefactorrecord()
-	# 		return sf
-			
 	###############################################################################
 	# Subrecord Description Subrecord Identifier
 	# DEPTH_ARRAY				1
@@ -450,7 +572,12 @@ class SWATH_BATHYMETRY_PING :
 	# SB_PDD_SPECIFIC   (obsolete)          211
 	# SB_NAVISOUND_SPECIFIC   (obsolete)    212
 	###############################################################################
-	def read(self, previousscalefactors={}, headeronly=False):
+	def read(self, previousscalefactors=None, headeronly=False, fields=None):
+		'''
+		decode the ping.  previousscalefactors are the scale factors carried forward from earlier pings.  
+		headeronly decodes just the ping header.  fields is an optional list of the subrecord identifiers to decode, e.g. [DEPTH_ARRAY, ACROSS_TRACK_ARRAY].  
+		all other subrecords are skipped using their size so we do not pay to decode data we do not need.  scale factors are always decoded
+		'''
 
 		# read ping header
 		hdrfmt = '>llll5hlH3h2Hlllh'
@@ -484,6 +611,8 @@ class SWATH_BATHYMETRY_PING :
 		self.spare			= s[19]
 
 		# SCALE FACTORS ARE NOT ON EVERYPING SO CARRY FORWARDS
+		if previousscalefactors is None:
+			previousscalefactors = {}
 		self.scalefactorsd = previousscalefactors
 
 		# skip the record for performance reasons.  Very handy in some circumstances
@@ -491,7 +620,12 @@ class SWATH_BATHYMETRY_PING :
 			self.fileptr.seek(self.offset + self.numbytes, 0) #move forwards to the end of the record as we cannot trust the record length from the 2024
 			return
 
-		while (self.fileptr.tell() <= self.offset + self.numbytes): #dont read past the end of the packet length.  This should never happen!
+		# most pings in a file share the same layout, so try the compiled layout first.  if it does not fit, use the generic decode below
+		if self.layoutcache is not None and self.readcompiledlayout(fields):
+			self.fileptr.seek(self.offset + self.numbytes, 0)
+			return self.scalefactorsd
+
+		while (self.fileptr.tell() + 4 <= self.offset + self.numbytes): #dont read past the end of the packet length.  This should never happen!
 			subrecfmt = '>l'
 			subrecfmtlen = struct.calcsize(subrecfmt)
 			subrecrec_unpack = struct.Struct(subrecfmt).unpack
@@ -507,6 +641,15 @@ class SWATH_BATHYMETRY_PING :
 				# 	self.fileptr.seek(subrecord_size, 1) #move forwards to the end of teh record
 				# continue
 
+			# gsflib writes the sensor specific subrecord before the intensity series, so remember which sonar this is
+			if subrecord_id > SCALE_FACTORS:
+				self.sensorid = subrecord_id
+
+			# the caller does not want this subrecord, so skip it
+			if fields is not None and subrecord_id != SCALE_FACTORS and subrecord_id not in fields:
+				self.fileptr.seek(paddedsubrecordsize(subrecord_id, subrecord_size), 1)
+				continue
+
 			# now decode the subrecord
 			# curr = self.fileptr.tell()
 			if subrecord_id == SCALE_FACTORS:
@@ -520,11 +663,14 @@ class SWATH_BATHYMETRY_PING :
 			# else:
 				# scale, offset, compressionFlag, datatype = self.getscalefactor(subrecord_id, subrecord_size / int(self.numbeams))
 
-			if subrecord_id == 0:
-				self.fileptr.seek(subrecord_size, 1) #move forwards to the end of teh record
+			if subrecord_id == INTENSITY_SERIES_ARRAY:
+				data = self.fileptr.read(subrecord_size)
+				self.fileptr.seek(paddedsubrecordsize(subrecord_id, subrecord_size) - subrecord_size, 1)
+				self.readintensityseries(data, 0, subrecord_size)
 				continue
 
-			if subrecord_id > len(self.scalefactorsd):
+			# skip subrecords we do not support, and arrays without a scale factor.  sensor specific subrecords (id > 100) are skipped here
+			if subrecord_id not in ARRAYNAMES or subrecord_id not in self.scalefactorsd or self.numbeams == 0:
 				self.fileptr.seek(subrecord_size, 1) #move forwards to the end of teh record
 				continue
 
@@ -536,59 +682,7 @@ class SWATH_BATHYMETRY_PING :
 				self.fileptr.seek(subrecord_size, 1) #move forwards to the end of teh record
 				continue
 
-			if subrecord_id == 1: 
-				# scale, offset, compressionFlag, datatype = self.getscalefactor(subrecord_id, subrecord_size / int(self.numbeams))
-				# print (sf.multiplier, sf.offset)
-				# print ("DEPTH ARRAY")
-				self.DEPTH_ARRAY = self.readarray(sf.multiplier, sf.offset, datatype)
-			elif subrecord_id == 2: 
-				# print ("ACROSS ARRAY")
-				self.ACROSS_TRACK_ARRAY = self.readarray(sf.multiplier, sf.offset, datatype)
-			elif subrecord_id == 3: 
-				# print ("ALONG ARRAY")
-				self.ALONG_TRACK_ARRAY = self.readarray(sf.multiplier, sf.offset, datatype)
-			elif subrecord_id == 4: 
-				# print ("TT ARRAY")
-				self.TRAVEL_TIME_ARRAY = self.readarray(sf.multiplier, sf.offset, datatype)
-			elif subrecord_id == 5: 
-				# print ("BA ARRAY")
-				self.BEAM_ANGLE_ARRAY = self.readarray(sf.multiplier, sf.offset, datatype)
-			elif subrecord_id == 6: 
-				# print ("MC ARRAY")
-				self.MEAN_CAL_AMPLITUDE_ARRAY = self.readarray(sf.multiplier, sf.offset, datatype)
-			elif subrecord_id == 7: 
-				# print ("MR ARRAY")
-				self.MEAN_REL_AMPLITUDE_ARRAY = self.readarray(sf.multiplier, sf.offset, datatype)
-			elif subrecord_id == 9: 
-				# print ("QF ARRAY")
-				self.QUALITY_FACTOR_ARRAY = self.readarray(sf.multiplier, sf.offset, datatype)
-			elif subrecord_id == 15: 
-				# print ("QF ARRAY")
-				self.QUALITY_FLAGS_ARRAY = self.readarray(sf.multiplier, sf.offset, datatype)
-			elif subrecord_id == 16: 
-				# print ("BF ARRAY")
-				self.BEAM_FLAGS_ARRAY = self.readarray(sf.multiplier, sf.offset, datatype)
-			elif subrecord_id == 18: 
-				# print ("BA ARRAY")
-				self.BEAM_ANGLE_FORWARD_ARRAY = self.readarray(sf.multiplier, sf.offset, datatype)
-			elif subrecord_id == 19: 
-				# print ("VA ARRAY")
-				self.VERTICAL_ERROR_ARRAY = self.readarray(sf.multiplier, sf.offset, datatype)
-			elif subrecord_id == 20: 
-				# print ("VE ARRAY")
-				self.VERTICAL_ERROR_ARRAY = self.readarray(sf.multiplier, sf.offset, datatype)
-			elif subrecord_id == 21: 
-				before = self.fileptr.tell()
-				# print ("SN ARRAY")
-				self.SNIPPET_SERIES_ARRAY = self.readintensityarray(sf.multiplier, sf.offset, datatype, self.snippettype)
-				if subrecord_size % 4 > 0:
-					self.fileptr.seek(4 - (subrecord_size % 4), 1) #pkpk we should not need this!!!
-			elif subrecord_id == 22: 
-				# print ("SE ARRAY")
-				self.SECTOR_NUMBER_ARRAY = self.readarray(sf.multiplier, sf.offset, datatype)
-			else:
-				# read to the end of the record to keep in alignment.  This permits us to not have all the decodes in place
-				self.fileptr.seek(subrecord_size, 1) #move forwards to the end of teh record
+			setattr(self, ARRAYNAMES[subrecord_id], self.readarray(sf.multiplier, sf.offset, datatype))
 			
 		self.fileptr.seek(self.offset + self.numbytes, 0) #move forwards to the end of the record as we cannot trust the record length from the 2024
 		
@@ -639,82 +733,75 @@ class SWATH_BATHYMETRY_PING :
 
 	###############################################################################
 	def getdatatype(self, ID, bytes_per_value):
+		'''return the big endian numpy data type for the array subrecord, or -999 if we do not support it'''
+		if ID not in ARRAYSIGNED or bytes_per_value not in ARRAYDATATYPES:
+			return -999
+		return ARRAYDATATYPES[bytes_per_value][ARRAYSIGNED[ID]]
 
-		datatype = -999
-		if ID == DEPTH_ARRAY:			
-			if bytes_per_value == 2:
-				datatype = 'H'			#unsigned values
-			elif bytes_per_value == 4:
-				datatype = 'L'			#unsigned values
-		elif ID == NOMINAL_DEPTH_ARRAY:
-			if bytes_per_value == 2:
-				datatype = 'H'			#unsigned values
-			elif bytes_per_value == 4:
-				datatype = 'L'			#unsigned values
-		elif ID == ACROSS_TRACK_ARRAY:
-			if bytes_per_value == 2:
-				datatype = 'h'			#signed values
-			elif bytes_per_value == 4:
-				datatype = 'l'			#signed values
-		elif ID == ALONG_TRACK_ARRAY:
-			if bytes_per_value == 2:
-				datatype = 'h'			#signed values
-			elif bytes_per_value == 4:
-				datatype = 'l'			#signed values
-		elif ID == TRAVEL_TIME_ARRAY:			
-			if bytes_per_value == 2:
-				datatype = 'H'			#unsigned values
-			elif bytes_per_value == 4:
-				datatype = 'L'			#unsigned values
-		elif ID == BEAM_ANGLE_ARRAY:
-			if bytes_per_value == 2:
-				datatype = 'h'			#signed values
-			elif bytes_per_value == 4:
-				datatype = 'l'			#signed values
-		elif ID == MEAN_CAL_AMPLITUDE_ARRAY:
-			if bytes_per_value == 1:
-				datatype = 'b' 			#signed values
-			if bytes_per_value == 2:
-				datatype = 'h'			#signed values
-		elif ID == MEAN_REL_AMPLITUDE_ARRAY:
-			if bytes_per_value == 1:
-				datatype = 'B' 			#unsigned values
-			if bytes_per_value == 2:
-				datatype = 'H'			#unsigned values
-		elif ID == ECHO_WIDTH_ARRAY:
-			if bytes_per_value == 1:
-				datatype = 'B' 			#unsigned values
-			if bytes_per_value == 2:
-				datatype = 'H'			#unsigned values
-		elif ID == QUALITY_FACTOR_ARRAY:
-			datatype = 'B' 			#unsigned values
-		elif ID == RECEIVE_HEAVE_ARRAY:
-			datatype = 'b' 			#signed values
-		elif ID == DEPTH_ERROR_ARRAY:
-			datatype = 'H' 			#unsigned values
-		elif ID == ACROSS_TRACK_ERROR_ARRAY:
-			datatype = 'H' 			#unsigned values
-		elif ID == ALONG_TRACK_ERROR_ARRAY:
-			datatype = 'H' 			#unsigned values
-		elif ID == BEAM_FLAGS_ARRAY:
-			datatype = 'B' 			#unsigned values
-		elif ID == QUALITY_FLAGS_ARRAY:
-			datatype = 'B' 			#unsigned values
-		elif ID == SIGNAL_TO_NOISE_ARRAY:
-			datatype = 'b' 			#signed values
-		elif ID == BEAM_ANGLE_FORWARD_ARRAY:
-			datatype = 'H' 			#signed values
-		elif ID == VERTICAL_ERROR_ARRAY:
-				datatype = 'H' 			#signed values
-		elif ID == HORIZONTAL_ERROR_ARRAY:
-			datatype = 'H' 			#signed values
-		elif ID == SECTOR_NUMBER_ARRAY:
-			datatype = 'B' 			#unsigned values
-		elif ID == DETECTION_INFO_ARRAY:
-			datatype = 'B' 			#unsigned values
+	###############################################################################
+	def readcompiledlayout(self, fields=None):
+		'''
+		decode all the fixed size beam arrays in this ping with a single np.frombuffer call using a structured dtype compiled for this ping layout.
+		the layout is fingerprinted from the subrecord identifiers, sizes and positions, and the compiled dtype is cached per file.
+		returns False if the ping does not fit a compiled layout, in which case the caller should use the generic decode.  the file pointer is left at the first subrecord
+		'''
+		start = self.fileptr.tell()
+		end = self.offset + self.numbytes
+		if isinstance(self.fileptr, mmap.mmap):
+			buffer = self.fileptr
+			base = start
 		else:
-			return -999
-		return datatype
+			buffer = self.fileptr.read(end - start)
+			base = 0
+			self.fileptr.seek(start, 0)
+
+		# walk the subrecord headers from the buffer.  no file access needed
+		subrecords = []
+		pos = base
+		limit = base + (end - start)
+		while pos + 4 <= limit:
+			word = struct.unpack_from('>L', buffer, pos)[0]
+			subrecord_id = word >> 24
+			subrecord_size = word & 0x00FFFFFF
+			if pos + 4 + subrecord_size > limit:
+				return False
+			if subrecord_id > SCALE_FACTORS:
+				self.sensorid = subrecord_id
+			subrecords.append((subrecord_id, subrecord_size, pos + 4))
+			pos += 4 + paddedsubrecordsize(subrecord_id, subrecord_size)
+
+		# the scale factors may change on this ping, so decode them first
+		for subrecord_id, subrecord_size, pos in subrecords:
+			if subrecord_id == SCALE_FACTORS:
+				self.decodescalefactorrecord(buffer, pos)
+
+		fingerprint = (self.numbeams, tuple((subrecord_id, subrecord_size, pos - base) for subrecord_id, subrecord_size, pos in subrecords if subrecord_id in ARRAYSIGNED))
+		if fingerprint in self.layoutcache:
+			layout = self.layoutcache[fingerprint]
+		elif len(self.layoutcache) < MAX_COMPILED_LAYOUTS:
+			layout = compilepinglayout(self.numbeams, fingerprint[1])
+			self.layoutcache[fingerprint] = layout
+		else:
+			layout = None
+		if layout is None:
+			return False
+
+		# every array needs a scale factor, otherwise let the generic decode deal with it
+		ids = [subrecord_id for subrecord_id in layout.names if fields is None or subrecord_id in fields]
+		if any(subrecord_id not in self.scalefactorsd for subrecord_id in ids):
+			return False
+
+		record = np.frombuffer(buffer, dtype=layout.dtype, count=1, offset=base)[0]
+		for subrecord_id in ids:
+			sf = self.scalefactorsd[subrecord_id]
+			setattr(self, ARRAYNAMES[subrecord_id], (record[layout.fieldnames[subrecord_id]] / sf.multiplier) - sf.offset)
+
+		# the intensity series are variable length so they are not part of the compiled layout
+		if fields is None or INTENSITY_SERIES_ARRAY in fields:
+			for subrecord_id, subrecord_size, pos in subrecords:
+				if subrecord_id == INTENSITY_SERIES_ARRAY:
+					self.readintensityseries(buffer, pos, pos + subrecord_size)
+		return True
 
 	###############################################################################
 	# def getscalefactor(self, ID, bytes_per_value):
@@ -745,71 +832,21 @@ class SWATH_BATHYMETRY_PING :
 	def readscalefactorrecord(self):
 		# /* First four byte integer contains the number of scale factors */
 		# now read all scale factors
-		scalefmt = '>l'
-		scalelen = struct.calcsize(scalefmt)
-		rec_unpack = struct.Struct(scalefmt).unpack
-
-		data = self.fileptr.read(scalelen)
-		s = rec_unpack(data)
-		self.numscalefactors = s[0]
-
-		scalefmt = '>lll'
-		scalelen = struct.calcsize(scalefmt)
-		rec_unpack = struct.Struct(scalefmt).unpack
-
-		# self.scalefactorsd = {}
-		for i in range(self.numscalefactors):
-			data = self.fileptr.read(scalelen)
-			s = rec_unpack(data)
-			sf = SCALEFACTOR()
-			sf.subrecordID = (s[0] & 0xFF000000) >> 24;
-			sf.compressionFlag = (s[0] & 0x00FF0000) >> 16;
-			sf.compressionFlag = s[0] & 0xF0;
-			sf.multiplier = s[1]
-			sf.offset = s[2]
-			sf.datatype = sf.compressionFlag
-
-			# ALONG_ACROSS_TRACK_ARRAY    				=	2
-			# TRACK_ARRAY    				=	3
-			# TRAVEL_TIME_ARRAY    				=	4
-			# BEAM_ANGLE_ARRAY    				=	5
-			# MEAN_CAL_AMPLITUDE_ARRAY  			=	6
-			# MEAN_REL_AMPLITUDE_ARRAY  			=	7
-			# ECHO_WIDTH_ARRAY    				=	8
-			# QUALITY_FACTOR_ARRAY    			=	9
-			# RECEIVE_HEAVE_ARRAY    				=	10
-			# DEPTH_ERROR_ARRAY			    	=	11
-			# ACROSS_TRACK_ERROR_ARRAY 			=  	12
-			# ALONG_TRACK_ERROR_ARRAY				=	13
-			# NOMINAL_DEPTH_ARRAY    				=	14
-			# QUALITY_FLAGS_ARRAY    				=	15
-			# BEAM_FLAGS_ARRAY    				=	16
-			# SIGNAL_TO_NOISE_ARRAY    			=	17
-			# BEAM_ANGLE_FORWARD_ARRAY    		=	18
-			# VERTICAL_ERROR_ARRAY    			=	19
-
-			# if sf.subrecordID == DEPTH_ARRAY:			# DEPTH_ARRAY array
-			# 	if bytes_per_value == 1:
-			# 		sf.datatype = 'B' 			#unsigned values
-			# 	elif bytes_per_value == 2:
-			# 		sf.datatype = 'H'			#unsigned values
-			# 		if ID == 2:				#ACROSS_TRACK_ARRAY array
-			# 			sf.datatype = 'h'		#unsigned values
-			# 		if ID == 3:				#ACROSS_TRACK_ARRAY array
-			# 			sf.datatype = 'h'		#unsigned values
-			# 		if ID == 5:				#beam angle array
-			# 			sf.datatype = 'h'		#unsigned values
-			# 	elif bytes_per_value == 4:
-			# 		sf.datatype = 'L'			#unsigned values
-			# 		if ID == 2:				#ACROSS_TRACK_ARRAY array
-			# 			sf.datatype = 'l'		#unsigned values
-			# 		if ID == 5:				#beam angle array
-			# 			sf.datatype = 'l'		#unsigned values
-			# 	else:
-			# 		datatype = 'L'			#unsigned values not sure about this one.  needs test data
+		numscalefactors = struct.unpack('>l', self.fileptr.read(4))[0]
+		data = struct.pack('>l', numscalefactors) + self.fileptr.read(numscalefactors * 12)
+		self.decodescalefactorrecord(data, 0)
 
-			# print (sf.subrecordID, sf.compressionFlag, sf.multiplier, sf.offset)
-			self.scalefactorsd[sf.subrecordID] = sf
+	###############################################################################
+	def decodescalefactorrecord(self, buffer, pos):
+		'''
+		decode the scale factors subrecord starting at pos in the buffer into the scale factors dictionary.  
+		the dictionary is copied first, so the scale factors passed in from the previous ping are never changed underneath it
+		'''
+		scalefactors = unpackscalefactors(buffer, pos)
+		self.numscalefactors = len(scalefactors)
+		self.scalefactorsd = dict(self.scalefactorsd)
+		for subrecordid, compressionflag, multiplier, offset in scalefactors:
+			self.scalefactorsd[subrecordid] = createscalefactor(subrecordid, compressionflag, multiplier, offset)
 
 		# self.scalefactors=[]
 		# for i in range(self.numscalefactors):
@@ -825,78 +862,66 @@ class SWATH_BATHYMETRY_PING :
 		# return self.scalefactors
 
 	###############################################################################
-	def readintensityarray(self, snippets, scale, offset, datatype, snippettype):
+	def readintensityseries(self, buffer, pos, end):
+		'''decode the time series intensity subrecord (type 21) held in buffer[pos:end] into SNIPPET_SERIES_ARRAY, one value per beam as per snippettype'''
+		scale = 1
+		offset = 0
+		sf = self.scalefactorsd.get(INTENSITY_SERIES_ARRAY)
+		if sf is not None and sf.multiplier != 0:
+			scale = sf.multiplier
+			offset = sf.offset
+		self.SNIPPET_SERIES_ARRAY = self.readintensityarray(buffer, pos, end, scale, offset, self.snippettype)
+
+	###############################################################################
+	def readintensityarray(self, buffer, pos, end, scale, offset, snippettype):
 		''' 
-		read the time series intensity array type 21 subrecord
+		decode the time series intensity array type 21 subrecord held in buffer[pos:end] and reduce the samples of each beam to a single value as per snippettype.
+		the beam headers are walked to find where the samples of each beam live, then all the samples are gathered into one array and reduced per beam with numpy.
+		samples of zero are ignored.  returns an array with one value per beam (zero for beams without samples), or an empty list if the subrecord does not make sense.
+		the sensor specific header in the subrecord is different for each sonar and we only know the r2sonic one, so the intensity series of other sonars are left as zeros rather than misread
 		'''
-		hdrfmt = '>bl16s'
+		if self.sensorid not in R2SONIC_SPECIFIC:
+			return np.zeros(self.numbeams)
+
+		hdrfmt = INTENSITY_SERIES_HEADER_FORMAT
 		hdrlen = struct.calcsize(hdrfmt)
-		rec_unpack = struct.Struct(hdrfmt).unpack
-		hdr = self.fileptr.read(hdrlen)
-		s = rec_unpack(hdr)
+		if pos + hdrlen > end:
+			return []
+		s = struct.unpack_from(hdrfmt, buffer, pos)
 		bitspersample = s[0]
 		appliedcorrections = s[1]
+		pos += hdrlen
 
 		# before we decode the intentisty data, read the sensor specific header
-		#for now just read the r2sonic as that is what we need.  For other sensors we need to implement decodes
-		self.decodeR2SonicImagerySpecific()
-		
-		for b in range(self.numbeams):
-			hdrfmt = '>hh8s'
-			hdrlen = struct.calcsize(hdrfmt)
-			rec_unpack = struct.Struct(hdrfmt).unpack
-			hdr = self.fileptr.read(hdrlen)
-			s = rec_unpack(hdr)
-			
-			numsamples = s[0]
-			bottomdetectsamplenumber = s[1]
-			spare = s[2]
+		imagerylen = struct.calcsize(R2SONIC_IMAGERY_FORMAT)
+		if pos + imagerylen > end:
+			return []
+		self.decodeR2SonicImagerySpecific(buffer[pos:pos + imagerylen])
+		pos += imagerylen
+
+		if snippettype == SNIPPET_NONE and not self.keepsnippetseries:
+			return np.zeros(self.numbeams)
+
+		snippets = splitsnippets(buffer, pos, end, self.numbeams, bitspersample // 8)
+		if snippets is None:
+			return []
+		samples, counts, bottomdetect = snippets
+
+		if self.keepsnippetseries:
+			# keep the raw samples in one flat array with an offset per beam rather than a list per beam, so memory stays proportional to the real sample count
+			self.SNIPPET_SAMPLES = samples.astype(SNIPPETSAMPLETYPES[bitspersample // 8])
+			self.SNIPPET_BEAM_OFFSETS = np.zeros(self.numbeams + 1, dtype=np.int64)
+			self.SNIPPET_BEAM_OFFSETS[1:] = np.cumsum(counts)
+			self.SNIPPET_BOTTOM_DETECT = bottomdetect.astype(np.int16)
+
+		if snippettype == SNIPPET_NONE:
+			return np.zeros(self.numbeams)
+		return reducesnippets(samples, counts, bottomdetect, snippettype, scale, offset)
 
-			fmt = '>' + str(numsamples) + 'H'
-			l = struct.calcsize(fmt)
-			rec_unpack = struct.Struct(fmt).unpack
-			
-			data = self.fileptr.read(l)  
-			raw = rec_unpack(data)
-			# strip out zero values
-			raw = [s for s in raw if s != 0]
-
-			if snippettype == SNIPPET_NONE:
-				snippets.append(0)
-				continue
-			elif snippettype == SNIPPET_MEAN5DB:
-				# populate the array with the mean of all samples withing a 5dB range of the mean.  As per QPS
-				if len(raw) > 0:
-					raw2 = [20.0 * math.log10(s / scale + offset) for s in raw]
-					mean = (sum(raw2) / float(len(raw2) ))
-					highcut = [s for s in raw2 if s < mean + 5] #high cut +5dB
-					highlowcut = [s for s in highcut if s > mean - 5] #low cut -5dB
-				else:
-					snippets.append(0)
-					continue
-				if len(highlowcut) > 0:
-					snippets.append((sum(highlowcut) / float(len(highlowcut) / scale) + offset))
-				else:
-					snippets.append((mean / scale) + offset)
-			elif snippettype == SNIPPET_MEAN:
-				# populate the array with the mean of all samples	 
-				if len(raw) > 0:
-					snippets.append((sum(raw) / float(len(raw) / scale) + offset))
-				else:
-					snippets.append(0)
-			elif snippettype == SNIPPET_MAX:
-				# populate the array with the MAX of all samples	 
-				if len(raw) > 0:
-					snippets.append(max(raw) / scale + offset)
-				else:
-					snippets.append(0)
-			elif snippettype == SNIPPET_MEAN:
-				# populate with a single value as identified by the bottom detect
-				if bottomdetectsamplenumber > 0:
-					snippets.append ((raw[bottomdetectsamplenumber] / scale) + offset)
-				else:
-					snippets.append (0)
-		return
+	###############################################################################
+	def snippetbeam(self, beam):
+		'''return the raw intensity time series samples of a beam.  the ping must have been read with keepsnippetseries set'''
+		return self.SNIPPET_SAMPLES[self.SNIPPET_BEAM_OFFSETS[beam]:self.SNIPPET_BEAM_OFFSETS[beam + 1]]
 
 	###############################################################################
 	def R2Soniccorrection(self):
@@ -1028,18 +1053,19 @@ class SWATH_BATHYMETRY_PING :
 		return backscatter_dB_m
 
 	###############################################################################
-	def decodeR2SonicImagerySpecific(self):
+	def decodeR2SonicImagerySpecific(self, data=None):
 		''' 
-		read the imagery information for the r2sonic 2024
+		read the imagery information for the r2sonic 2024.  data is the imagery specific header bytes if we already have them, otherwise read them from the file
 		'''
-		fmt = '>12s12slll lllll llllhh lllll lllhh lllll l32s'
+		fmt = R2SONIC_IMAGERY_FORMAT
 		l = struct.calcsize(fmt)
 		rec_unpack = struct.Struct(fmt).unpack
-		data = self.fileptr.read(l) 
+		if data is None:
+			data = self.fileptr.read(l) 
 		raw = rec_unpack(data)
 		
-		self.modelnumber = raw[0]
-		self.serialnumber = raw[1].decode('utf-8').rstrip('\x00')
+		self.modelnumber = raw[0].decode('utf-8', 'ignore').rstrip('\x00')
+		self.serialnumber = raw[1].decode('utf-8', 'ignore').rstrip('\x00')
 
 		self.pingtime = raw[2]
 		self.pingnanotime = raw[3]
@@ -1055,8 +1081,9 @@ class SWATH_BATHYMETRY_PING :
 		self.beamwidthhorizontal = math.radians(raw[11] / 1.0e6)
 		
 		#apply scaling as per email from Beaudoin https://jira.qps.nl/browse/SFM-2857
-		self.beamwidthvertical = math.radians(raw[10] / 1.0e6 * (400000 / self.frequency))
-		self.beamwidthhorizontal = math.radians(raw[11] / 1.0e6 * (400000 / self.frequency))
+		if self.frequency > 0:
+			self.beamwidthvertical = math.radians(raw[10] / 1.0e6 * (400000 / self.frequency))
+			self.beamwidthhorizontal = math.radians(raw[11] / 1.0e6 * (400000 / self.frequency))
 	
 		transmitsteeringvertical = raw[12] / 1.0e6
 		transmitsteeringhorizontal = raw[13] / 1.0e6
@@ -1095,8 +1122,7 @@ class SWATH_BATHYMETRY_PING :
 		'''
 		# https://stackoverflow.com/questions/54679949/unpacking-binary-file-using-struct-unpack-vs-np-frombuffer-vs-np-ndarray-vs-np-f
 
-		fmt = '>' + datatype
-		nparr = np.fromfile(self.fileptr, dtype=np.dtype(fmt), count=self.numbeams)
+		nparr = readnumpyarray(self.fileptr, np.dtype(datatype), self.numbeams)
 		nparr = (nparr / scale) - offset
 		# nparr = (nparr / scale) + offset  we should be subtracting not adding!!!!
 		return nparr
@@ -1227,23 +1253,16 @@ class CATTITUDE:
 		self.nummeasurements 			= s[2]
 
 		# print(self.nummeasurements)
-		rec_fmt = '>%dh' % (self.nummeasurements*5)
-		rec_len = struct.calcsize(rec_fmt)
-		rec_unpack = struct.Struct(rec_fmt).unpack
-		data = self.fileptr.read(rec_len)
-		s = rec_unpack(data)
-
-		self.attitudearray = np.array(s[0:self.nummeasurements*5])
+		self.attitudearray = readnumpyarray(self.fileptr, ATTITUDE_RAW_DTYPE, self.nummeasurements)
 
-		# we need to add the timestamp to each attitude partial timestamp
+		# we need to add the timestamp to each attitude partial timestamp.  the partial timestamps are in milliseconds
 		timestamp = self.timestamp + self.nanoseconds/1000000000.0
 
-		ts				= self.attitudearray[0::5]
-		self.ts			= ts + timestamp
-		self.pitch		= self.attitudearray[1::5] / 100
-		self.roll		= self.attitudearray[2::5] / 100
-		self.heave		= self.attitudearray[3::5] / 100
-		self.heading	= self.attitudearray[4::5] / 100
+		self.ts			= (self.attitudearray['time'] / 1000) + timestamp
+		self.pitch		= self.attitudearray['pitch'] / 100
+		self.roll		= self.attitudearray['roll'] / 100
+		self.heave		= self.attitudearray['heave'] / 100
+		self.heading	= self.attitudearray['heading'] / 100
 
 		self.fileptr.seek(self.offset + self.numbytes + self.hdrlen, 0)	# move the file pointer to the end of the record			  
 
@@ -1290,12 +1309,11 @@ class CSOUND_VELOCITY_PROFILE:
 		self.latitude 						= s[5] / 10000000
 		self.numpoints 						= s[6]
 		
-		rec_fmt = '>%dh' % (self.numpoints*2)
-		rec_len = struct.calcsize(rec_fmt)
-		rec_unpack = struct.Struct(rec_fmt).unpack
-		data = self.fileptr.read(rec_len)
-		s = rec_unpack(data)
-				
+		# the depth and sound velocity pairs are I4 in centimetres and hundredths of metres per second
+		points = np.frombuffer(self.fileptr.read(self.numpoints * 8), dtype='>i4').reshape(-1, 2)
+		self.depths = points[:, 0] / 100
+		self.velocities = points[:, 1] / 100
+
 		self.fileptr.seek(self.offset + self.numbytes + self.hdrlen, 0)	# move the file pointer to the end of the record			  
 
 		return
@@ -1436,27 +1454,94 @@ class CSWATH_BATHY_SUMMARY:
 		'''
 		return pprint.pformat(vars(self))
 
+###############################################################################
+class PINGBATCH:
+	'''
+	a batch of pings held as a structure of arrays so the beam data can be processed with numpy across many pings at once.
+	header is a structured array with one row per ping (see PINGHEADER_DTYPE).  each requested field is a (pings x beams) float array, 
+	padded with NaN out to the largest beam count in the batch, and is available by name, e.g. batch.DEPTH_ARRAY, or by subrecord identifier from batch.arrays
+	'''
+	def __init__(self, header, arrays):
+		self.header = header
+		self.arrays = arrays
+		self.numbeams = header['numbeams']
+		for field, values in arrays.items():
+			setattr(self, ARRAYNAMES[field], values)
+
+	###############################################################################
+	@classmethod
+	def frompings(cls, pings, fields=None):
+		'''build a batch from a list of decoded SWATH_BATHYMETRY_PING records.  if fields is None the batch holds every array decoded in any of the pings'''
+		header = np.array([tuple(getattr(ping, name) for name in PINGHEADERNAMES) for ping in pings], dtype=PINGHEADER_DTYPE)
+		if fields is None:
+			fields = decodedfields(pings)
+
+		maxbeams = max([ping.numbeams for ping in pings] + [0])
+		arrays = {}
+		for field in fields:
+			name = ARRAYNAMES[field]
+			values = np.full((len(pings), maxbeams), np.nan)
+			for i, ping in enumerate(pings):
+				beams = getattr(ping, name, [])
+				values[i, :len(beams)] = beams
+			arrays[field] = values
+		return cls(header, arrays)
+
+	###############################################################################
+	def beammask(self):
+		'''a (pings x beams) boolean array which is True for the real beams and False for the padding'''
+		maxbeams = max([values.shape[1] for values in self.arrays.values()] + [0])
+		return np.arange(maxbeams) < self.numbeams[:, np.newaxis]
+
+	###############################################################################
+	def __len__(self):
+		return len(self.header)
+
+	###############################################################################
+	def __str__(self):
+		'''
+		pretty print this class
+		'''
+		return pprint.pformat(vars(self))
+
 ###############################################################################
 class GSFREADER:
-	def __init__(self, filename, loadscalefactors=False):
+	def __init__(self, filename, loadscalefactors=False, mmap=False, prefetch=0, snippetseries=False):
 		'''
 		class to read generic sensor format files.
+		if mmap is True the file is memory mapped and the record classes decode directly from the mapped pages.  
+		this avoids the small buffered reads and lets forked worker processes share the same page cache.
+		if prefetch is greater than zero a background thread reads up to prefetch records ahead of readDatagram() so disc reads overlap with decoding.  
+		this suits sequential reads.  it is ignored for memory mapped files.
+		if snippetseries is True every ping keeps its full intensity time series as a ragged array (see SWATH_BATHYMETRY_PING.SNIPPET_SAMPLES)
 		'''
 		if not os.path.isfile(filename):
 			print ("file not found:", filename)
 		self.fileName = filename
 		self.fileSize = os.path.getsize(filename)
-		self.fileptr 		= open(filename, 'rb')
-
-		# f = open(filename, 'r+b')		
-		# self.f = f
-		# self.fileptr = mmap.mmap(f.fileno(), 0)
+		self.fileobject		= open(filename, 'rb')
+		self.fileptr 		= self.fileobject
+		self.memorymap		= None
+
+		# the memory map quacks like a file (seek, tell, read) so the record classes do not need to know which mode we are in
+		if mmap and self.fileSize > 0:
+			self.memorymap = memorymapfile(self.fileobject)
+			self.fileptr = self.memorymap
 		self.hdrfmt = ">LL"
 		self.hdrlen = struct.calcsize(self.hdrfmt)
 		self.scalefactorsd = {}
 		# if loadscalefactors:
 		# self.scalefactors = self.loadscalefactors()
 		self.attitudedata = np.empty((0), int)
+		self.index = None
+		self.pingindex = None
+		self.scalefactortable = None
+		self.scalefactorsets = {}
+		self.layoutcache = {}
+		self.snippetseries = snippetseries
+		self.prefetcher = None
+		if prefetch > 0 and self.memorymap is None:
+			self.prefetcher = PREFETCHER(filename, prefetch, self.hdrfmt)
 
 	###########################################################################
 	def moreData(self):
@@ -1473,7 +1558,15 @@ class GSFREADER:
 		'''
 		close the file
 		'''
-		self.fileptr.close()
+		if self.prefetcher is not None:
+			self.prefetcher.stop()
+		if self.memorymap is not None:
+			try:
+				self.memorymap.close()
+			except BufferError:
+				# a caller still holds a zero copy array over the mapped pages.  the map is released when that array is garbage collected
+				pass
+		self.fileobject.close()
 		
 	###########################################################################
 	def rewind(self):
@@ -1492,6 +1585,8 @@ class GSFREADER:
 	###########################################################################
 	def readDatagramBytes(self, offset, byteCount):
 		'''read the entire raw bytes for the datagram without changing the file pointer.  this is used for file conditioning'''
+		if self.memorymap is not None:
+			return self.memorymap[offset:offset + byteCount]
 		curr = self.fileptr.tell()
 		self.fileptr.seek(offset, 0)   # move the file pointer to the start of the record so we can read from disc			  
 		data = self.fileptr.read(byteCount)
@@ -1518,122 +1613,484 @@ class GSFREADER:
 	###########################################################################
 	def loadattitude(self):
 		'''
-		rewind, load the navigation from the bathy records and rewind.  output format is ts,x,y,z,roll,pitch,heading
+		load the attitude from all the ATTITUDE records.  output is a structured numpy array (see ATTITUDE_DTYPE) with one row per measurement and the fields timestamp, roll, pitch, heave, heading.
+		the record headers are scanned first so the output is allocated once, then each record is decoded with a single np.frombuffer.  the file pointer is not disturbed
 		'''
-		ts = np.empty((0), float)
-		roll = np.empty((0), int)
-		pitch = np.empty((0), int)
-		heave = np.empty((0), int)
-		heading = np.empty((0), int)
+		basefmt = struct.Struct('>2lH')
+		records = []
+		for offset, numberofbytes, recordidentifier, hdrlen, peek in self.walkheaders(peekbytes=basefmt.size):
+			if recordidentifier == ATTITUDE and len(peek) == basefmt.size:
+				seconds, nanoseconds, nummeasurements = basefmt.unpack(peek)
+				nummeasurements = min(nummeasurements, (numberofbytes - hdrlen - basefmt.size) // ATTITUDE_RAW_DTYPE.itemsize)
+				records.append((offset + hdrlen + basefmt.size, nummeasurements, seconds + (nanoseconds / 1000000000.0)))
+
+		attitude = np.zeros(sum(record[1] for record in records), dtype=ATTITUDE_DTYPE)
+		row = 0
+		for offset, nummeasurements, timestamp in records:
+			if self.memorymap is not None:
+				raw = np.frombuffer(self.memorymap, dtype=ATTITUDE_RAW_DTYPE, count=nummeasurements, offset=offset)
+			else:
+				raw = np.frombuffer(self.readDatagramBytes(offset, nummeasurements * ATTITUDE_RAW_DTYPE.itemsize), dtype=ATTITUDE_RAW_DTYPE)
+			rows = slice(row, row + nummeasurements)
+			attitude['timestamp'][rows] = (raw['time'] / 1000) + timestamp
+			attitude['roll'][rows] = raw['roll'] / 100
+			attitude['pitch'][rows] = raw['pitch'] / 100
+			attitude['heave'][rows] = raw['heave'] / 100
+			attitude['heading'][rows] = raw['heading'] / 100
+			row += nummeasurements
+
+		print ("Attitude records loaded:", len(attitude))
+		return attitude
 
-		curr = self.fileptr.tell()
-		self.rewind()
+	###########################################################################
+	def loadnavigation(self):
+		'''
+		load the navigation from the bathy ping headers.  output is a structured numpy array with one row per ping and the fields timestamp, longitude, latitude, height, roll, pitch, heading, deltatime.
+		rejected pings (pingflags bit 0) are skipped.  the ping headers are read in bulk without creating the ping classes, so this is fast even for very large files.  the file pointer is not disturbed
+		'''
+		headers = self.readpingheaders()
+		headers = headers[(headers['pingflags'] & 1) == 0] #skip rejected records
+
+		navigation = np.zeros(len(headers), dtype=NAVIGATION_DTYPE)
+		navigation['timestamp'] = headers['time'] + (headers['nanotime'] / 1000000000)
+		navigation['longitude'] = headers['longitude'] / 10000000
+		navigation['latitude'] = headers['latitude'] / 10000000
+		navigation['height'] = headers['height'] / 100
+		navigation['roll'] = headers['roll'] / 100
+		navigation['pitch'] = headers['pitch'] / 100
+		navigation['heading'] = headers['heading'] / 100
+		# ensure the first record is not seen as a jump
+		navigation['deltatime'][1:] = np.diff(navigation['timestamp'])
+		# print ("Navigation records loaded:", len(navigation))
+		return navigation
 
-		while self.moreData():
-			numberofbytes, recordidentifier, datagram = self.readDatagram()
-			if recordidentifier == 	ATTITUDE:
-				datagram.read()
-				ts			= np.append(ts, datagram.ts)
-				roll		= np.append(roll, datagram.roll)
-				pitch		= np.append(pitch, datagram.pitch)
-				heave		= np.append(heave, datagram.heave)
-				heading		= np.append(heading, datagram.heading)
+	###########################################################################
+	def readpingheaders(self):
+		'''read the raw ping header of every ping in one pass over the record headers.  returns a structured array (see PINGHEADER_RAW_DTYPE), one row per ping'''
+		headerlen = PINGHEADER_RAW_DTYPE.itemsize
+		peeks = [peek for offset, numberofbytes, recordidentifier, hdrlen, peek in self.walkheaders(peekbytes=headerlen) if recordidentifier == SWATH_BATHYMETRY and len(peek) == headerlen]
+		return np.frombuffer(b"".join(peeks), dtype=PINGHEADER_RAW_DTYPE)
 
-		self.fileptr.seek(curr, 0)
-		print ("Attitude records loaded:", len(ts))
-		return ts, roll, pitch, heave, heading
+	###########################################################################
+	def indexfilename(self):
+		'''the name of the record index sidecar file which lives next to the gsf file'''
+		return self.fileName + GSFIDX_EXTENSION
 
 	###########################################################################
-	def loadnavigation(self):
+	def loadindex(self, rebuild=False):
+		'''
+		load the record index from the sidecar file.  if the sidecar is missing or stale (the gsf file size or modified time has changed) rebuild it and save it for next time.
+		the index has one row per record containing the offset, size, record identifier, ping timestamp (zero for non ping records) and the scale factor set in effect for each ping
+		'''
+		if self.index is not None and not rebuild:
+			return self.index
+
+		index = None
+		if not rebuild:
+			index = self.readindexfile()
+		if index is None:
+			index = self.buildindex()
+			self.writeindexfile(index)
+
+		self.index, self.scalefactortable = index
+		self.pingindex = np.flatnonzero(self.index['recordidentifier'] == SWATH_BATHYMETRY)
+		self.scalefactorsets = {}
+		return self.index
+
+	###########################################################################
+	def buildindex(self):
+		'''
+		walk the file once recording where every record lives.  for ping records we also decode the ping time so we can query by time, 
+		and any scale factors so we know which scale factors are in effect for every ping.  the distinct scale factor sets are stored once in a table.
+		returns (index, scale factor table)
+		'''
+		rows = []
+		timefmt = struct.Struct('>ll')
+		pingheaderlen = struct.calcsize('>llll5hlH3h2Hlllh')
+		sfid = -1
+		current = {}
+		scalefactorsets = {}
+		for offset, numberofbytes, recordidentifier, hdrlen, peek in self.walkheaders(peekbytes=GSFIDX_PEEK_BYTES):
+			timestamp = 0.0
+			pingsfid = -1
+			if recordidentifier == SWATH_BATHYMETRY and len(peek) >= timefmt.size:
+				seconds, nanoseconds = timefmt.unpack_from(peek)
+				timestamp = seconds + (nanoseconds / 1000000000)
+				# gsflib writes the scale factors as the first subrecord, but other writers may not, so walk the subrecords until we find them
+				pos = findsubrecord(peek, pingheaderlen, numberofbytes - hdrlen, SCALE_FACTORS)
+				if pos is None:
+					# the subrecords run past what we peeked, so read the whole ping
+					peek = self.readDatagramBytes(offset + hdrlen, numberofbytes - hdrlen)
+					pos = findsubrecord(peek, pingheaderlen, len(peek), SCALE_FACTORS)
+				if pos >= 0:
+					if pos + 4 > len(peek):
+						peek = self.readDatagramBytes(offset + hdrlen, pos + 4)
+					count = max(0, struct.unpack_from('>l', peek, pos)[0])
+					if pos + 4 + (count * 12) > len(peek):
+						# more scale factors than we peeked, so read them from the file
+						peek = self.readDatagramBytes(offset + hdrlen, pos + 4 + (count * 12))
+					# the scale factors merge with those carried forward from earlier pings
+					current = dict(current)
+					for scalefactor in unpackscalefactors(peek, pos):
+						current[scalefactor[0]] = scalefactor
+					key = tuple(sorted(current.values()))
+					sfid = scalefactorsets.setdefault(key, len(scalefactorsets))
+				pingsfid = sfid
+			rows.append((offset, numberofbytes, recordidentifier, timestamp, pingsfid))
+
+		table = [(setid,) + scalefactor for key, setid in scalefactorsets.items() for scalefactor in key]
+		return np.array(rows, dtype=GSFIDX_DTYPE), np.array(table, dtype=GSFIDX_SCALEFACTOR_DTYPE)
+
+	###########################################################################
+	def readindexfile(self):
+		'''read the index sidecar file.  return None if it does not exist or no longer matches the gsf file'''
+		arrays = readsidecar(self.indexfilename(), self.fileName, GSFIDX_MAGIC, GSFIDX_VERSION, [GSFIDX_DTYPE, GSFIDX_SCALEFACTOR_DTYPE])
+		if arrays is None:
+			return None
+		return tuple(arrays)
+
+	###########################################################################
+	def writeindexfile(self, index):
+		'''save the index sidecar file'''
+		if not writesidecar(self.indexfilename(), self.fileName, GSFIDX_MAGIC, GSFIDX_VERSION, list(index), [GSFIDX_DTYPE, GSFIDX_SCALEFACTOR_DTYPE]):
+			print ("unable to save record index:", self.indexfilename())
+
+	###########################################################################
+	def scalefactorsforping(self, n):
+		'''
+		return the scale factors in effect when decoding ping n (zero based).  this comes straight from the record index so any ping can be decoded on its own, e.g.
+			datagram = reader[n]
+			datagram.read(reader.scalefactorsforping(n))
+		'''
+		self.loadindex()
+		sfid = int(self.index['sfid'][self.pingindex[n]])
+		return self.scalefactorset(sfid)
+
+	###########################################################################
+	def scalefactorset(self, sfid):
+		'''return a new scale factors dictionary for scale factor set sfid from the index'''
+		if sfid < 0:
+			return {}
+		if sfid not in self.scalefactorsets:
+			rows = self.scalefactortable[self.scalefactortable['sfid'] == sfid]
+			self.scalefactorsets[sfid] = [(int(row['subrecordid']), int(row['compressionflag']), int(row['multiplier']), int(row['offset'])) for row in rows]
+		return {scalefactor[0]: createscalefactor(*scalefactor) for scalefactor in self.scalefactorsets[sfid]}
+
+	###########################################################################
+	def seek_ping(self, n):
+		'''
+		move the file pointer to the start of ping n (zero based, negative values count from the end) so the next readDatagram() returns that ping
+		'''
+		self.loadindex()
+		pingcount = len(self.pingindex)
+		if n < 0:
+			n += pingcount
+		if n < 0 or n >= pingcount:
+			raise IndexError("ping %d out of range, file has %d pings" % (n, pingcount))
+		self.fileptr.seek(int(self.index['offset'][self.pingindex[n]]), 0)
+
+	###########################################################################
+	def __len__(self):
+		'''the number of ping records in the file'''
+		self.loadindex()
+		return len(self.pingindex)
+
+	###########################################################################
+	def __bool__(self):
+		'''a reader is always true.  without this, if reader: would call __len__ and index the whole file'''
+		return True
+
+	###########################################################################
+	def __getitem__(self, n):
 		'''
-		rewind, load the navigation from the bathy records and rewind.  output format is ts,x,y,z,roll,pitch,heading
+		random access to ping n, e.g. reader[1234].  returns the ping datagram ready for the user to call read().  the file pointer is left at the end of the ping
+		'''
+		self.seek_ping(n)
+		numberofbytes, recordidentifier, datagram = self.readDatagram()
+		return datagram
+
+	###########################################################################
+	def iter_batches(self, batch_size=1024, fields=None):
+		'''
+		read the pings sequentially and yield them batch_size at a time as a PINGBATCH, a structure of arrays with one (pings x beams) array per field.
+		fields is a list of the subrecord identifiers to return, e.g. [DEPTH_ARRAY, ACROSS_TRACK_ARRAY].  None returns every array decoded in the first batch.
+		every batch holds the same arrays, so they can be concatenated.  an array a ping does not have is NaN.  the file pointer is restored when the iteration completes
 		'''
-		navigation = []
-		previoustimestamp = 0
 		curr = self.fileptr.tell()
 		self.rewind()
+		scalefactorsd = {}
+		pings = []
+		batchfields = fields
+		try:
+			while self.moreData():
+				numberofbytes, recordidentifier, datagram = self.readDatagram()
+				if recordidentifier != SWATH_BATHYMETRY:
+					continue
+				scalefactorsd = datagram.read(scalefactorsd, fields=fields)
+				pings.append(datagram)
+				if len(pings) == batch_size:
+					if batchfields is None:
+						batchfields = decodedfields(pings)
+					yield PINGBATCH.frompings(pings, batchfields)
+					pings = []
+			if len(pings) > 0:
+				if batchfields is None:
+					batchfields = decodedfields(pings)
+				yield PINGBATCH.frompings(pings, batchfields)
+		finally:
+			self.fileptr.seek(curr, 0)
 
+	###########################################################################
+	def read_time_range(self, t0, t1, fields=None):
+		'''
+		decode only the pings with a timestamp between t0 and t1 inclusive (seconds since 1970).  the ping times come from the record index, so we jump straight to the first ping without reading the file.
+		fields is a list of the subrecord identifiers to decode, e.g. [DEPTH_ARRAY, ACROSS_TRACK_ARRAY].  None decodes every array.
+		returns a list of the decoded pings in file order.  the file pointer is restored when complete
+		'''
+		self.loadindex()
+		timestamps = self.index['timestamp'][self.pingindex]
+		if len(timestamps) == 0:
+			return []
+
+		if np.all(timestamps[1:] >= timestamps[:-1]):
+			# the usual case, so use a binary search
+			first = int(np.searchsorted(timestamps, t0, side='left'))
+			last = int(np.searchsorted(timestamps, t1, side='right'))
+			selected = np.zeros(len(timestamps), dtype=bool)
+			selected[first:last] = True
+		else:
+			# time goes backwards somewhere in the file, so we need to check every ping
+			selected = (timestamps >= t0) & (timestamps <= t1)
+		return self.readpings(np.flatnonzero(selected), fields)
 
-		while self.moreData():
-			numberofbytes, recordidentifier, datagram = self.readDatagram()
-			if recordidentifier == SWATH_BATHYMETRY:
-				datagram.read({}, True)
-
-				if isBitSet(datagram.pingflags, 0) == True:
-				# if datagram.pingflags > 0:
-					continue #skip rejected records
-
-				if previoustimestamp == 0:
-					# ensure the first record is not seen as a jump
-					previoustimestamp = datagram.timestamp
-				deltatime = datagram.timestamp - previoustimestamp
-				navigation.append([datagram.timestamp, datagram.longitude, datagram.latitude, datagram.height, datagram.roll, datagram.pitch, datagram.heading, deltatime])
-				previoustimestamp = datagram.timestamp
-		self.fileptr.seek(curr, 0)
-		# print ("Navigation records loaded:", len(navigation))
-		self.rewind()
+	###########################################################################
+	def readpings(self, pingnumbers, fields=None):
+		'''
+		decode the requested pings (zero based ping numbers) using the record index to jump straight to each one.
+		the scale factors for each ping come from the index, so the pings are decoded exactly as a sequential read would decode them, without reading the pings in between.
+		fields is a list of the subrecord identifiers to decode, e.g. [DEPTH_ARRAY, ACROSS_TRACK_ARRAY].  None decodes every array.
+		returns a list of the decoded pings.  the file pointer is restored when complete
+		'''
+		curr = self.fileptr.tell()
+		pings = []
+		try:
+			for pingnumber in pingnumbers:
+				datagram = self[int(pingnumber)]
+				datagram.read(self.scalefactorsforping(int(pingnumber)), fields=fields)
+				pings.append(datagram)
+		finally:
+			self.fileptr.seek(curr, 0)
+		return pings
+
+	###########################################################################
+	def scalefactorsbeforepings(self, pingnumbers):
+		'''
+		return the scale factors in effect immediately before each of the requested pings, i.e. the scale factors to carry forward into a sequential read starting at that ping.  
+		these come straight from the record index
+		'''
+		self.loadindex()
+		return [self.scalefactorsforping(n - 1) if n > 0 else {} for n in pingnumbers]
+
+	###########################################################################
+	def decode_parallel(self, workers=None, fields=None):
+		'''
+		decode every ping in the file using a pool of worker processes.  the file is split into record aligned byte ranges (shards), 
+		each shard is decoded in its own process starting with the scale factors carried forward from earlier pings, and the results are returned in the original ping order.
+		fields is a list of the subrecord identifiers to return, e.g. [DEPTH_ARRAY, ACROSS_TRACK_ARRAY].  None returns every array decoded.
+		each ping is returned as a dictionary of the ping header values and the requested arrays, keyed by name
+		'''
+		if workers is None:
+			workers = os.cpu_count() or 1
+		self.loadindex()
+		pingcount = len(self.pingindex)
+		if pingcount == 0:
+			return []
+
+		# use a few shards per worker so a slow shard does not hold up the whole pool
+		shardcount = min(pingcount, max(1, workers * 4))
+		startpings = [int(chunk[0]) for chunk in np.array_split(np.arange(pingcount), shardcount)]
+		offsets = [int(self.index['offset'][self.pingindex[n]]) for n in startpings] + [self.fileSize]
+		scalefactors = self.scalefactorsbeforepings(startpings)
+		usemmap = self.memorymap is not None
+
+		shards = [(self.fileName, offsets[i], offsets[i + 1], scalefactors[i], fields, usemmap) for i in range(shardcount)]
+		if workers == 1:
+			results = [decodeshard(*shard) for shard in shards]
+		else:
+			with ProcessPoolExecutor(max_workers=workers) as executor:
+				results = list(executor.map(decodeshard, *zip(*shards)))
+
+		pings = []
+		for result in results:
+			pings.extend(result)
+		return pings
+
+	###########################################################################
+	def verify(self, workers=None, blocksize=VERIFY_BLOCK_SIZE):
+		'''
+		check the integrity of the file.  every record header is checked for sense and every record carrying a checksum has it recomputed.  
+		after a corrupt header we search forward for the next good record, so one bad record does not hide the rest of the file.
+		the file is split into byte ranges which are verified in parallel by a pool of worker processes.  each worker finds the first record in its range for itself, 
+		and if the ranges do not join up (e.g. a worker locked onto something which only looked like a record header) we verify that range again from where the previous one finished.
+		returns a dictionary with the number of records, the number of records carrying a checksum, and the errors as a list of (offset, recordidentifier, reason) for every corrupt record
+		'''
+		if workers is None:
+			workers = os.cpu_count() or 1
+		# use a few ranges per worker so a slow range does not hold up the whole pool, but never less than a block per range
+		rangecount = max(1, min(workers * 4, self.fileSize // blocksize))
+		boundaries = [int(b) for b in np.linspace(0, self.fileSize, rangecount + 1)]
+		ranges = [(self.fileName, boundaries[i], boundaries[i + 1], i == 0, blocksize) for i in range(rangecount)]
+		if workers == 1 or rangecount == 1:
+			results = [verifyrange(*r) for r in ranges]
+		else:
+			with ProcessPoolExecutor(max_workers=workers) as executor:
+				results = list(executor.map(verifyrange, *zip(*ranges)))
+
+		records = 0
+		checksummed = 0
+		errors = []
+		nextoffset = 0
+		for i, result in enumerate(results):
+			if result[0] != nextoffset:
+				result = verifyrange(self.fileName, nextoffset, boundaries[i + 1], True, blocksize)
+			firstoffset, nextoffset, rangerecords, rangechecksummed, rangeerrors = result
+			records += rangerecords
+			checksummed += rangechecksummed
+			errors.extend(rangeerrors)
+		return {'records': records, 'checksummed': checksummed, 'errors': errors}
 
-		return navigation
 	###########################################################################
 	def getrecordcount(self):
 		'''
-		rewind, count the number of ping records as fast as possible.  useful for progress bars
+		count the number of ping records as fast as possible.  useful for progress bars
 		'''
-		numpings = 0
-		curr = self.fileptr.tell()
-		self.rewind()
+		if self.index is not None:
+			return len(self.pingindex)
 
-		while self.moreData():
-			numberofbytes, recordidentifier, datagram = self.readDatagram()
+		numpings = 0
+		for offset, numberofbytes, recordidentifier, hdrlen, peek in self.walkheaders():
 			if recordidentifier == SWATH_BATHYMETRY:
 				numpings += 1
-
-		self.fileptr.seek(curr, 0)
 		return numpings
+
+	###########################################################################
+	def getrecordinventory(self):
+		'''
+		count the number of records of each type in the file.  returns a dictionary of record identifier: count
+		'''
+		inventory = {}
+		for offset, numberofbytes, recordidentifier, hdrlen, peek in self.walkheaders():
+			inventory[recordidentifier] = inventory.get(recordidentifier, 0) + 1
+		return inventory
+
+	###########################################################################
+	def walkheaders(self, startoffset=0, endoffset=None, peekbytes=0, blocksize=WALK_BLOCK_SIZE):
+		'''
+		walk the record headers from startoffset to endoffset as fast as possible, without creating any record classes.
+		the file is read in large blocks using its own file handle and the headers are decoded from the buffer, so the reader's file pointer is not disturbed.
+		if the file is memory mapped we decode straight from the map.
+		yields (offset, numberofbytes, recordidentifier, hdrlen, peek) for each record, where peek is up to peekbytes of the record body following the header.
+		'''
+		if endoffset is None or endoffset > self.fileSize:
+			endoffset = self.fileSize
+		hdr = struct.Struct(self.hdrfmt)
+
+		f = None
+		if self.memorymap is not None:
+			buffer = self.memorymap
+			bufferstart = 0
+		else:
+			f = open(self.fileName, 'rb', buffering=0)
+			buffer = b""
+			bufferstart = startoffset
+
+		try:
+			offset = startoffset
+			while offset + self.hdrlen <= endoffset:
+				pos = offset - bufferstart
+				if f is not None and (pos < 0 or pos + self.hdrlen + peekbytes > len(buffer)):
+					# the next header (and peek) is not in the buffer, so read the next block
+					f.seek(offset, 0)
+					buffer = f.read(max(blocksize, self.hdrlen + peekbytes))
+					bufferstart = offset
+					pos = 0
+					if len(buffer) < self.hdrlen:
+						break
+				sizeofdata, recordidentifier = hdr.unpack_from(buffer, pos)
+				numberofbytes, recordidentifier, haschecksum, hdrlen = decoderecordheader(sizeofdata, recordidentifier)
+				peek = None
+				if peekbytes > 0:
+					# a checksummed record has a longer header, so make sure the peek is in the buffer
+					if f is not None and pos + hdrlen + peekbytes > len(buffer) and bufferstart + len(buffer) < endoffset:
+						f.seek(offset, 0)
+						buffer = f.read(max(blocksize, hdrlen + peekbytes))
+						bufferstart = offset
+						pos = 0
+					peek = buffer[pos + hdrlen:pos + hdrlen + min(peekbytes, sizeofdata)]
+				yield offset, numberofbytes, recordidentifier, hdrlen, peek
+				offset += numberofbytes
+		finally:
+			if f is not None:
+				f.close()
 		
+	###########################################################################
+	def prefetchstats(self):
+		'''the read ahead statistics for tuning the prefetch depth: queue depth, bytes in flight, records read and the time (seconds) readDatagram() has waited for the disc'''
+		if self.prefetcher is None:
+			return None
+		return self.prefetcher.stats()
+
 	###########################################################################
 	def readDatagram(self):
-		# read the datagram header.  This permits us to skip datagrams we do not support
-		numberofbytes, recordidentifier, haschecksum, hdrlen = self.sniffDatagramHeader()
+		fileptr = self.fileptr
+		if self.prefetcher is not None:
+			# the record bytes have already been read by the prefetch thread.  the record classes decode from them while we move our file pointer to the next record
+			curr = self.fileptr.tell()
+			numberofbytes, recordidentifier, haschecksum, hdrlen, fileptr = self.prefetcher.next(curr)
+			self.fileptr.seek(curr + numberofbytes, 0)
+		else:
+			# read the datagram header.  This permits us to skip datagrams we do not support
+			numberofbytes, recordidentifier, haschecksum, hdrlen = self.sniffDatagramHeader()
 		# print ("ID %d Bytes %d ftell %d" % (recordidentifier, numberofbytes, self.fileptr.tell()))
 		# if self.fileptr.tell() == 78410380:
 			# print ("pkpkpk")
 		if recordidentifier == HEADER:
 			# create a class for this datagram, but only decode if the resulting class if called by the user.  This makes it much faster
-			dg = CHEADER(self.fileptr, numberofbytes, recordidentifier, hdrlen)
+			dg = CHEADER(fileptr, numberofbytes, recordidentifier, hdrlen)
 			# self.fileptr.seek(numberofbytes, 1) # set the file ptr to the end of the record			
 			return numberofbytes, recordidentifier, dg		
 		if recordidentifier == 	COMMENT:
-			dg = CCOMMENT(self.fileptr, numberofbytes, recordidentifier, hdrlen)
+			dg = CCOMMENT(fileptr, numberofbytes, recordidentifier, hdrlen)
 			return numberofbytes, recordidentifier, dg
 		if recordidentifier == 	PROCESSING_PARAMETERS:
-			dg = CPROCESSINGPARAMETERS(self.fileptr, numberofbytes, recordidentifier, hdrlen)
+			dg = CPROCESSINGPARAMETERS(fileptr, numberofbytes, recordidentifier, hdrlen)
 			return numberofbytes, recordidentifier, dg
 		if recordidentifier == 	SOUND_VELOCITY_PROFILE:
-			dg = CSOUND_VELOCITY_PROFILE(self.fileptr, numberofbytes, recordidentifier, hdrlen)
+			dg = CSOUND_VELOCITY_PROFILE(fileptr, numberofbytes, recordidentifier, hdrlen)
 			return numberofbytes, recordidentifier, dg
 
 		if recordidentifier == SWATH_BATHYMETRY:
-			dg = SWATH_BATHYMETRY_PING(self.fileptr, numberofbytes, recordidentifier, hdrlen)
-			# dg.scalefactors = self.scalefactors
+			dg = SWATH_BATHYMETRY_PING(fileptr, numberofbytes, recordidentifier, hdrlen)
+			dg.layoutcache = self.layoutcache
+			dg.keepsnippetseries = self.snippetseries
 			return numberofbytes, recordidentifier, dg 
 
 		elif recordidentifier == SWATH_BATHY_SUMMARY:
-			dg = CSWATH_BATHY_SUMMARY(self.fileptr, numberofbytes, recordidentifier, hdrlen)
+			dg = CSWATH_BATHY_SUMMARY(fileptr, numberofbytes, recordidentifier, hdrlen)
 			# dg.scalefactors = self.scalefactors
 			return numberofbytes, recordidentifier, dg 
 
 		if recordidentifier == ATTITUDE:
-			dg = CATTITUDE(self.fileptr, numberofbytes, recordidentifier, hdrlen)
+			dg = CATTITUDE(fileptr, numberofbytes, recordidentifier, hdrlen)
 			return numberofbytes, recordidentifier, dg 
 
 		# elif recordidentifier == 3: # SOUND_VELOCITY_PROFILE
-		# 	dg = SOUND_VELOCITY_PROFILE(self.fileptr, numberofbytes)
+		# 	dg = SOUND_VELOCITY_PROFILE(fileptr, numberofbytes)
 		# 	return dg.recordidentifier, dg 
 		
 		else:
-			# dg = UNKNOWN_RECORD(self.fileptr, numberofbytes, recordidentifier, hdrlen)
-			self.fileptr.seek(numberofbytes, 1) # set the file ptr to the end of the record			
+			# dg = UNKNOWN_RECORD(fileptr, numberofbytes, recordidentifier, hdrlen)
+			fileptr.seek(numberofbytes, 1) # set the file ptr to the end of the record			
 			dg = None
 			return numberofbytes, recordidentifier, dg
 
@@ -1650,43 +2107,972 @@ class GSFREADER:
 			return (0, 0, False, 0)
 
 		# version header format
+		if self.memorymap is not None:
+			# no need to read and seek back, just decode the header in place
+			s = struct.unpack_from(self.hdrfmt, self.memorymap, curr)
+			return decoderecordheader(s[0], s[1])
+
 		data = self.fileptr.read(self.hdrlen)
 		s = struct.unpack(self.hdrfmt, data)
-		sizeofdata = s[0]
-		recordidentifier = s[1]
-		# haschecksum = recordidentifier & 0x80000000
-
-		haschecksum = isBitSet(recordidentifier, 31)
-		# temp = recordidentifier & 0x7FC00000
-		# reserved = (temp >> 22)
-
-		# recordidentifier = (recordidentifier & 0x003FFFFF)
-
-		# bit=int(1)
-		# num=recordidentifier>>(bit-1)
-		# if((num&1)!=0):
-		# 	print("{} is set".format(bit))
-		# 	haschecksum = true
-		# else:
-		# 	print("{} is reset".format(bit))
-		# 	haschecksum = false
-
-		# if haschecksum == true:
-		# 	# read the checksum of 4 bytes if required
-		# 	chksum = self.fileptr.read(4)
-		# 	return (sizeofdata + self.hdrlen + 4, recordidentifier, haschecksum, self.hdrlen + 4)
-		
+
 		# now reset file pointer to the start of the record
 		self.fileptr.seek(curr, 0)
-		return (sizeofdata + self.hdrlen, recordidentifier, haschecksum, self.hdrlen )
-		
-		# if haschecksum == true:
-		# 	return (sizeofdata + 4, recordidentifier, haschecksum, self.hdrlen + 4)
-		# 	# return (sizeofdata + self.hdrlen + 4, recordidentifier, haschecksum, self.hdrlen + 4)
-		# else:
-		# 	return (sizeofdata, recordidentifier, haschecksum, self.hdrlen )
-		# 	# return (sizeofdata + self.hdrlen, recordidentifier, haschecksum, self.hdrlen )
+		return decoderecordheader(s[0], s[1])
+
+###############################################################################
+class ASYNCGSFREADER:
+	'''
+	stream the pings from a gsf file with asyncio so disc (or network share) reads overlap with decoding.  usage:
+		async for ping in ASYNCGSFREADER(filename, fields=[DEPTH_ARRAY]):
+			print (ping.DEPTH_ARRAY)
+	the file is read in blocks of blocksize bytes on an executor thread with up to inflight reads outstanding.  the next read is only issued when the caller consumes a block, so a slow consumer applies back pressure.
+	the records are split from the blocks and each ping is decoded by SWATH_BATHYMETRY_PING.read() with the scale factors carried forward, so the pings are identical to a sequential read.
+	many files can be streamed concurrently from the same event loop
+	'''
+	def __init__(self, filename, fields=None, inflight=ASYNC_INFLIGHT_BLOCKS, blocksize=ASYNC_BLOCK_SIZE, executor=None, snippetseries=False):
+		self.fileName = filename
+		self.snippetseries = snippetseries
+		self.fileSize = os.path.getsize(filename)
+		self.fields = fields
+		self.inflight = max(1, inflight)
+		self.blocksize = blocksize
+		self.executor = executor
+		self.hdrfmt = ">LL"
+		self.hdrlen = struct.calcsize(self.hdrfmt)
+		self.layoutcache = {}
+		self.fileobject = None
+		self.lock = threading.Lock()
+
+	###########################################################################
+	def __aiter__(self):
+		return self.pings()
+
+	###########################################################################
+	async def __aenter__(self):
+		return self
+
+	###########################################################################
+	async def __aexit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+	###########################################################################
+	def close(self):
+		if self.fileobject is not None:
+			self.fileobject.close()
+			self.fileobject = None
+
+	###########################################################################
+	def readblock(self, offset, size):
+		'''read a block from the file.  this runs on the executor threads, so use a positional read (or a lock where pread is not available) so concurrent reads do not fight over the file pointer'''
+		if hasattr(os, "pread"):
+			data = os.pread(self.fileobject.fileno(), size, offset)
+		else:
+			with self.lock:
+				self.fileobject.seek(offset, 0)
+				data = self.fileobject.read(size)
+		return data
+
+	###########################################################################
+	async def pings(self):
+		'''async generator yielding the decoded pings in file order'''
+		loop = asyncio.get_running_loop()
+		if self.fileobject is None:
+			self.fileobject = open(self.fileName, 'rb', buffering=0)
+
+		pending = deque()
+		nextoffset = 0
+		buffer = b""
+		bufferstart = 0
+		scalefactorsd = {}
+		hdr = struct.Struct(self.hdrfmt)
+		try:
+			while True:
+				# keep the reads in flight
+				while len(pending) < self.inflight and nextoffset < self.fileSize:
+					size = min(self.blocksize, self.fileSize - nextoffset)
+					pending.append(loop.run_in_executor(self.executor, self.readblock, nextoffset, size))
+					nextoffset += size
+				if len(pending) == 0:
+					break
+				buffer += await pending.popleft()
+
+				# split the complete records from the buffer.  a partial record at the end waits for the next block
+				pos = 0
+				while pos + self.hdrlen <= len(buffer):
+					sizeofdata, recordidentifier = hdr.unpack_from(buffer, pos)
+					numberofbytes, recordidentifier, haschecksum, hdrlen = decoderecordheader(sizeofdata, recordidentifier)
+					if pos + numberofbytes > len(buffer):
+						break
+					if recordidentifier == SWATH_BATHYMETRY:
+						recordbuffer = RECORDBUFFER(buffer[pos:pos + numberofbytes], bufferstart + pos)
+						datagram = SWATH_BATHYMETRY_PING(recordbuffer, numberofbytes, recordidentifier, hdrlen)
+						datagram.layoutcache = self.layoutcache
+						datagram.keepsnippetseries = self.snippetseries
+						scalefactorsd = datagram.read(scalefactorsd, fields=self.fields)
+						yield datagram
+					pos += numberofbytes
+				buffer = buffer[pos:]
+				bufferstart += pos
+		finally:
+			# cancel() cannot stop a read already running on an executor thread, so let the outstanding reads finish before we close the file underneath them
+			await asyncio.gather(*pending, return_exceptions=True)
+			self.close()
+
+# the name used in the asyncio examples
+AsyncGSFReader = ASYNCGSFREADER
+
+###############################################################################
+class GSFWRITER:
+	'''
+	write a gsf file.  the beam arrays are quantised with their scale factors and encoded with one numpy cast per array, so writing runs at close to disk speed.
+	pings are written from SWATH_BATHYMETRY_PING objects (or anything with the same attributes), so the usual pattern is read, correct, write
+	'''
+	def __init__(self, filename, version=GSF_WRITER_VERSION, scalefactors=None):
+		'''
+		scalefactors is an optional dictionary of {subrecord identifier: (multiplier, offset, bytes per value)} which overrides both the defaults and the scale factors carried by the pings
+		'''
+		self.filename = filename
+		self.fileptr = open(filename, 'wb')
+		self.scalefactors = dict(ARRAYSCALEFACTORS)
+		self.overridescalefactors = scalefactors or {}
+		self.lastscalefactors = None			# the scale factors subrecord most recently written.  we only write it again when it changes, the same as gsflib
+		self.recordcount = 0
+		self.writeheader(version)
+
+	###############################################################################
+	def __enter__(self):
+		return self
+
+	###############################################################################
+	def __exit__(self, *args):
+		self.close()
+
+	###############################################################################
+	def close(self):
+		self.fileptr.close()
+
+	###############################################################################
+	def __str__(self):
+		return pprint.pformat(vars(self))
+
+	###############################################################################
+	def writerecord(self, recordidentifier, data):
+		'''
+		write one record.  the data is padded to a multiple of 4 bytes as the record size must be.  returns the offset of the record in the file
+		'''
+		offset = self.fileptr.tell()
+		padding = (4 - (len(data) % 4)) % 4
+		self.fileptr.write(struct.pack('>LL', len(data) + padding, recordidentifier))
+		self.fileptr.write(data)
+		if padding:
+			self.fileptr.write(bytes(padding))
+		self.recordcount += 1
+		return offset
+
+	###############################################################################
+	def writeheader(self, version=GSF_WRITER_VERSION):
+		return self.writerecord(HEADER, struct.pack('>12s', version.encode('utf-8')))
+
+	###############################################################################
+	def writecomment(self, timestamp, comment):
+		text = comment.encode('utf-8') + b'\x00'
+		seconds, nanoseconds = splittimestamp(timestamp)
+		return self.writerecord(COMMENT, struct.pack('>3l', seconds, nanoseconds, len(text)) + text)
+
+	###############################################################################
+	def writesoundvelocityprofile(self, observationtime, applicationtime, longitude, latitude, depths, velocities):
+		'''
+		write a sound velocity profile.  depths are in metres and velocities in metres per second
+		'''
+		depths = np.asarray(depths, dtype=np.float64)
+		velocities = np.asarray(velocities, dtype=np.float64)
+		observationseconds, observationnanoseconds = splittimestamp(observationtime)
+		applicationseconds, applicationnanoseconds = splittimestamp(applicationtime)
+		data = struct.pack('>7l', observationseconds, observationnanoseconds, applicationseconds, applicationnanoseconds, round(longitude * 10000000), round(latitude * 10000000), len(depths))
+		points = np.empty((len(depths), 2), dtype='>i4')
+		points[:, 0] = np.round(depths * 100)
+		points[:, 1] = np.round(velocities * 100)
+		return self.writerecord(SOUND_VELOCITY_PROFILE, data + points.tobytes())
+
+	###############################################################################
+	def writeattitude(self, attitude):
+		'''
+		write an ATTITUDE_DTYPE array, e.g. from GSFREADER.loadattitude().  the measurement times are millisecond offsets held in 2 bytes, so long series are split across as many records as needed
+		returns the number of records written
+		'''
+		timestamps = np.asarray(attitude['timestamp'], dtype=np.float64)
+		records = 0
+		start = 0
+		while start < len(timestamps):
+			end = min(np.searchsorted(timestamps, timestamps[start] + 32.767, side='right'), start + 65535)
+			end = max(end, start + 1)
+			seconds, nanoseconds = splittimestamp(timestamps[start])
+			basetime = seconds + (nanoseconds / 1000000000.0)
+			raw = np.empty(end - start, dtype=ATTITUDE_RAW_DTYPE)
+			raw['time'] = np.round((timestamps[start:end] - basetime) * 1000)
+			raw['pitch'] = np.round(attitude['pitch'][start:end] * 100)
+			raw['roll'] = np.round(attitude['roll'][start:end] * 100)
+			raw['heave'] = np.round(attitude['heave'][start:end] * 100)
+			raw['heading'] = np.round((attitude['heading'][start:end] % 360.0) * 100) % 36000
+			self.writerecord(ATTITUDE, struct.pack('>2lH', seconds, nanoseconds, end - start) + raw.tobytes())
+			records += 1
+			start = end
+		return records
+
+	###############################################################################
+	def writeping(self, ping, copysubrecords=True):
+		'''
+		write a ping.  every beam array attribute holding numbeams values is quantised and written.  
+		if copysubrecords is True and the ping was read from a file, the subrecords we did not decode (intensity series, sensor specific records and any arrays skipped with fields=) are copied from the source ping unchanged.
+		the scale factors subrecord is only written when it differs from the previous ping
+		'''
+		numbeams = int(ping.numbeams)
+		source = self.sourcesubrecords(ping) if copysubrecords and hasattr(ping, 'fileptr') else []
+		# start from the field size the source used so we do not grow the file
+		sourcebytes = {subrecordid: (len(data) - 4) // numbeams for subrecordid, data in source if subrecordid in ARRAYSIGNED and numbeams > 0}
+
+		subrecords = []
+		scalefactors = {}
+		for subrecordid, name in ARRAYNAMES.items():
+			if subrecordid not in ARRAYSIGNED:
+				continue
+			values = getattr(ping, name, [])
+			if numbeams == 0 or len(values) != numbeams:
+				continue
+			multiplier, offset, bytespervalue = self.pingscalefactor(ping, subrecordid, sourcebytes.get(subrecordid))
+			raw, bytespervalue = quantisearray(subrecordid, values, multiplier, offset, bytespervalue)
+			scalefactors[subrecordid] = (multiplier, offset, bytespervalue)
+			subrecords.append(packsubrecord(subrecordid, raw))
+
+		for subrecordid, data in source:
+			if subrecordid in scalefactors:
+				continue
+			if subrecordid in ping.scalefactorsd:
+				sf = ping.scalefactorsd[subrecordid]
+				scalefactors[subrecordid] = (sf.multiplier, sf.offset, sourcebytes.get(subrecordid, 0))
+			subrecords.append(data)
+
+		if scalefactors != self.lastscalefactors:
+			subrecords.insert(0, packscalefactors(scalefactors))
+			self.lastscalefactors = scalefactors
+
+		return self.writerecord(SWATH_BATHYMETRY, packpingheader(ping) + b''.join(subrecords))
+
+	###############################################################################
+	def pingscalefactor(self, ping, subrecordid, sourcebytes=None):
+		'''return the (multiplier, offset, bytes per value) for an array.  overrides win, then the scale factors the ping was read with, then the defaults'''
+		if subrecordid in self.overridescalefactors:
+			return self.overridescalefactors[subrecordid]
+		multiplier, offset, bytespervalue = self.scalefactors[subrecordid]
+		if sourcebytes in ARRAYDATATYPES:
+			bytespervalue = sourcebytes
+		sf = getattr(ping, 'scalefactorsd', {}).get(subrecordid)
+		if sf is not None and sf.multiplier != 0:
+			return sf.multiplier, sf.offset, bytespervalue
+		return multiplier, offset, bytespervalue
+
+	###############################################################################
+	def sourcesubrecords(self, ping):
+		'''
+		return the (subrecord identifier, raw bytes including the subrecord header) of every subrecord in the source ping, excluding the scale factors.
+		the source file pointer is put back where we found it so the reader is not disturbed
+		'''
+		fileptr = ping.fileptr
+		curr = fileptr.tell()
+		fileptr.seek(ping.offset + ping.hdrlen, 0)
+		data = fileptr.read(ping.numbytes - ping.hdrlen)
+		fileptr.seek(curr, 0)
+
+		subrecords = []
+		pos = PINGHEADER_RAW_DTYPE.itemsize
+		while pos + 4 <= len(data):
+			s = struct.unpack_from('>L', data, pos)[0]
+			subrecordid = (s & 0xFF000000) >> 24
+			subrecordsize = s & 0x00FFFFFF
+			# the reader skips the padding gsflib puts after the intensity series, so we keep it with the subrecord
+			end = pos + 4 + paddedsubrecordsize(subrecordid, subrecordsize)
+			if subrecordid != SCALE_FACTORS:
+				subrecords.append((subrecordid, bytes(data[pos:end])))
+			pos = end
+		return subrecords
+
+###########################################################################
+def splittimestamp(timestamp):
+	'''split a unix timestamp into whole seconds and nanoseconds as gsf stores them'''
+	seconds = math.floor(timestamp)
+	nanoseconds = min(round((timestamp - seconds) * 1000000000), 999999999)
+	return int(seconds), int(nanoseconds)
+
+###########################################################################
+def quantisearray(subrecordid, values, multiplier, offset, bytespervalue):
+	'''
+	quantise the array with its scale factor in one pass.  if the values do not fit in bytespervalue we widen the field rather than wrap.
+	returns the big endian bytes and the bytes per value used
+	'''
+	raw = np.round((np.asarray(values, dtype=np.float64) + offset) * multiplier)
+	if not np.all(np.isfinite(raw)):
+		raise ValueError("%s contains values which cannot be written" % (ARRAYNAMES[subrecordid]))
+	lowest = raw.min()
+	highest = raw.max()
+	for size in sorted(ARRAYDATATYPES):
+		if size < bytespervalue:
+			continue
+		datatype = np.dtype(ARRAYDATATYPES[size][ARRAYSIGNED[subrecordid]])
+		limits = np.iinfo(datatype)
+		if lowest >= limits.min and highest <= limits.max:
+			return raw.astype(datatype).tobytes(), size
+	raise ValueError("%s values are out of range for multiplier %d" % (ARRAYNAMES[subrecordid], multiplier))
+
+###########################################################################
+def packsubrecord(subrecordid, data):
+	return struct.pack('>L', (subrecordid << 24) | len(data)) + data
+
+###########################################################################
+def packscalefactors(scalefactors):
+	'''pack the scale factors subrecord.  the compression flag holds the field size in its high nibble, the same as GSF_FIELD_SIZE_ONE, TWO and FOUR'''
+	raw = np.empty((len(scalefactors), 3), dtype='>i4')
+	for i, (subrecordid, (multiplier, offset, bytespervalue)) in enumerate(sorted(scalefactors.items())):
+		raw[i] = ((subrecordid << 24) | ((bytespervalue * 16) << 16), multiplier, offset)
+	return packsubrecord(SCALE_FACTORS, struct.pack('>l', len(scalefactors)) + raw.tobytes())
+
+###########################################################################
+def packpingheader(ping):
+	'''pack the ping header attributes decoded by SWATH_BATHYMETRY_PING.read() back into the file format'''
+	seconds, nanoseconds = splittimestamp(ping.timestamp)
+	raw = np.zeros(1, dtype=PINGHEADER_RAW_DTYPE)
+	raw['time'] = seconds
+	raw['nanotime'] = nanoseconds
+	raw['longitude'] = round(ping.longitude * 10000000)
+	raw['latitude'] = round(ping.latitude * 10000000)
+	raw['numbeams'] = ping.numbeams
+	raw['centrebeam'] = ping.centrebeam
+	raw['pingflags'] = ping.pingflags
+	raw['reserved'] = getattr(ping, 'reserved', 0)
+	raw['spare'] = getattr(ping, 'spare', 0)
+	for name in ["heading", "course"]:
+		# these are unsigned, so wrap negative or overflowing angles into 0 to 360
+		value = round(getattr(ping, name) * 100)
+		raw[name] = value if 0 <= value <= 65535 else round((getattr(ping, name) % 360.0) * 100) % 36000
+	for name in ["tidecorrector", "depthcorrector", "pitch", "roll", "heave", "speed", "height", "separation", "gpstidecorrector"]:
+		raw[name] = round(getattr(ping, name) * 100)
+	return raw.tobytes()
+
+###############################################################################
+class PREFETCHER:
+	'''
+	a background thread which reads whole records ahead of the reader into a bounded queue, so the disc reads overlap with decoding in the main thread.
+	the thread has its own file handle.  if the reader asks for a record other than the next one in the queue (e.g. after a seek or rewind) the thread is restarted from the new position
+	'''
+	def __init__(self, filename, depth, hdrfmt):
+		self.fileName = filename
+		self.depth = depth
+		self.hdr = struct.Struct(hdrfmt)
+		self.thread = None
+		self.queue = None
+		self.stopevent = None
+		self.nextoffset = None
+		self.eof = False
+		self.lock = threading.Lock()
+		self.bytesinflight = 0
+		self.records = 0
+		self.stalltime = 0.0
+		self.restarts = 0
+
+	###########################################################################
+	def start(self, offset):
+		'''start reading records from offset'''
+		self.stop()
+		self.queue = queue.Queue(maxsize=self.depth)
+		self.stopevent = threading.Event()
+		self.nextoffset = offset
+		self.eof = False
+		self.bytesinflight = 0
+		self.restarts += 1
+		self.thread = threading.Thread(target=self.run, args=(offset, self.queue, self.stopevent), daemon=True)
+		self.thread.start()
+
+	###########################################################################
+	def stop(self):
+		'''stop the thread.  drain the queue so a blocked put() can see the stop event'''
+		if self.thread is None:
+			return
+		self.stopevent.set()
+		while self.thread.is_alive():
+			try:
+				self.queue.get(timeout=0.1)
+			except queue.Empty:
+				pass
+		self.thread.join()
+		self.thread = None
+
+	###########################################################################
+	def run(self, offset, recordqueue, stopevent):
+		'''the thread.  read each record header and body and queue them until the end of the file'''
+		try:
+			with open(self.fileName, 'rb') as f:
+				f.seek(offset, 0)
+				while not stopevent.is_set():
+					header = f.read(self.hdr.size)
+					if len(header) < self.hdr.size:
+						item = None
+					else:
+						sizeofdata, recordidentifier = self.hdr.unpack(header)
+						numberofbytes, recordidentifier, haschecksum, hdrlen = decoderecordheader(sizeofdata, recordidentifier)
+						data = header + f.read(numberofbytes - len(header))
+						item = (offset, recordidentifier, haschecksum, hdrlen, data)
+						offset += len(data)
+						with self.lock:
+							self.bytesinflight += len(data)
+					if not self.put(recordqueue, stopevent, item) or item is None:
+						return
+		except Exception as e:
+			self.put(recordqueue, stopevent, e)
+
+	###########################################################################
+	def put(self, recordqueue, stopevent, item):
+		'''queue an item, waiting while the queue is full.  returns False if we were asked to stop'''
+		while not stopevent.is_set():
+			try:
+				recordqueue.put(item, timeout=0.1)
+				return True
+			except queue.Full:
+				continue
+		return False
+
+	###########################################################################
+	def next(self, offset):
+		'''
+		return the record starting at offset as (numberofbytes, recordidentifier, haschecksum, hdrlen, recordbuffer).  
+		at the end of the file numberofbytes is zero, as per sniffDatagramHeader()
+		'''
+		if self.thread is None or offset != self.nextoffset:
+			self.start(offset)
+		if self.eof:
+			return (0, 0, False, 0, RECORDBUFFER(b"", offset))
+
+		t = time.perf_counter()
+		item = self.queue.get()
+		self.stalltime += time.perf_counter() - t
+
+		if isinstance(item, Exception):
+			self.thread = None
+			raise item
+		if item is None:
+			self.eof = True
+			return (0, 0, False, 0, RECORDBUFFER(b"", offset))
+
+		offset, recordidentifier, haschecksum, hdrlen, data = item
+		with self.lock:
+			self.bytesinflight -= len(data)
+		self.records += 1
+		self.nextoffset = offset + len(data)
+		return (len(data), recordidentifier, haschecksum, hdrlen, RECORDBUFFER(data, offset))
+
+	###########################################################################
+	def stats(self):
+		return {
+			'queuedepth': self.queue.qsize() if self.queue is not None else 0,
+			'bytesinflight': self.bytesinflight,
+			'records': self.records,
+			'stalltime': self.stalltime,
+			'restarts': self.restarts,
+			}
+
+###############################################################################
+class RECORDBUFFER:
+	'''
+	a file like object (seek, tell, read) over the bytes of a record which has already been read into memory.  the positions are absolute file offsets so the record classes decode exactly as they would from the file
+	'''
+	def __init__(self, data, offset):
+		self.data = data
+		self.base = offset
+		self.pos = offset
+
+	def seek(self, offset, whence=0):
+		if whence == 0:
+			self.pos = offset
+		elif whence == 1:
+			self.pos += offset
+		else:
+			self.pos = self.base + len(self.data) + offset
+		return self.pos
+
+	def tell(self):
+		return self.pos
+
+	def read(self, size=-1):
+		start = self.pos - self.base
+		if size is None or size < 0:
+			end = len(self.data)
+		else:
+			end = min(start + size, len(self.data))
+		self.pos = self.base + end
+		return self.data[start:end]
+
+###########################################################################
+class PINGLAYOUT:
+	'''a compiled ping layout.  dtype is a numpy structured dtype which maps every fixed size beam array in the ping body in one go'''
+	def __init__(self, dtype, names, fieldnames):
+		self.dtype = dtype
+		self.names = names
+		self.fieldnames = fieldnames
+
+###########################################################################
+def compilepinglayout(numbeams, subrecords):
+	'''
+	compile a numpy structured dtype for a ping layout.  subrecords is a list of (subrecord identifier, size, position of the data relative to the start of the ping body).
+	returns None if the layout cannot be compiled, e.g. the array sizes do not match the number of beams
+	'''
+	if numbeams == 0 or len(subrecords) == 0:
+		return None
+	names = []
+	fieldnames = {}
+	formats = []
+	offsets = []
+	itemsize = 0
+	for subrecord_id, subrecord_size, pos in subrecords:
+		if subrecord_id in fieldnames or subrecord_size % numbeams != 0:
+			return None
+		bytes_per_value = subrecord_size // numbeams
+		if bytes_per_value not in ARRAYDATATYPES:
+			return None
+		names.append(subrecord_id)
+		fieldnames[subrecord_id] = ARRAYNAMES[subrecord_id]
+		formats.append((ARRAYDATATYPES[bytes_per_value][ARRAYSIGNED[subrecord_id]], (numbeams,)))
+		offsets.append(pos)
+		itemsize = max(itemsize, pos + subrecord_size)
+	dtype = np.dtype({'names': [fieldnames[i] for i in names], 'formats': formats, 'offsets': offsets, 'itemsize': itemsize})
+	return PINGLAYOUT(dtype, names, fieldnames)
+
+###########################################################################
+def splitsnippets(buffer, pos, end, numbeams, bytespersample):
+	'''
+	walk the beam headers (>hh8s) of a time series intensity subrecord in buffer[pos:end] and gather the samples of every beam into one flat array.
+	returns (samples, sample count per beam, bottom detect sample number per beam) or None if the beams run past the end of the subrecord
+	'''
+	if bytespersample not in ARRAYDATATYPES:
+		return None
+	beamhdr = struct.Struct('>hh8s')
+	counts = np.zeros(numbeams, dtype=np.int64)
+	bottomdetect = np.zeros(numbeams, dtype=np.int64)
+	starts = np.zeros(numbeams, dtype=np.int64)
+	for beam in range(numbeams):
+		if pos + beamhdr.size > end:
+			return None
+		numsamples, bottomdetectsamplenumber, spare = beamhdr.unpack_from(buffer, pos)
+		pos += beamhdr.size
+		numsamples = max(0, numsamples)
+		counts[beam] = numsamples
+		bottomdetect[beam] = bottomdetectsamplenumber
+		starts[beam] = pos
+		pos += numsamples * bytespersample
+	if pos > end:
+		return None
+
+	# the byte position of every sample, then assemble the big endian samples from their bytes
+	total = int(counts.sum())
+	beamstart = np.cumsum(counts) - counts
+	positions = np.repeat(starts, counts) + ((np.arange(total) - np.repeat(beamstart, counts)) * bytespersample)
+	raw = np.frombuffer(buffer, dtype=np.uint8, count=end)
+	samples = np.zeros(total, dtype=np.uint64)
+	for i in range(bytespersample):
+		samples = (samples << np.uint64(8)) | raw[positions + i].astype(np.uint64)
+	return samples, counts, bottomdetect
+
+###########################################################################
+def reducesnippets(samples, counts, bottomdetect, snippettype, scale=1, offset=0):
+	'''
+	reduce the flat array of raw samples to one scaled value per beam using numpy segment operations.  counts is the number of samples in each beam.
+	samples of zero are ignored.  beams without samples get zero
+	'''
+	numbeams = len(counts)
+	result = np.zeros(numbeams)
+	beam = np.repeat(np.arange(numbeams), counts)
+
+	if snippettype == SNIPPET_DETECT:
+		# populate with a single value as identified by the bottom detect
+		valid = (bottomdetect >= 0) & (bottomdetect < counts)
+		beamstart = np.cumsum(counts) - counts
+		result[valid] = (samples[beamstart[valid] + bottomdetect[valid]] / scale) - offset
+		return result
+
+	# strip out zero values
+	keep = samples != 0
+	samples = (samples[keep] / scale) - offset
+	beam = beam[keep]
+	if snippettype == SNIPPET_MEAN5DB:
+		# we cannot take the log of anything at or below zero
+		positive = samples > 0
+		samples = samples[positive]
+		beam = beam[positive]
+	validcounts = np.bincount(beam, minlength=numbeams)
+	populated = validcounts > 0
+
+	if snippettype == SNIPPET_MEAN:
+		# populate the array with the mean of all samples
+		sums = np.bincount(beam, weights=samples, minlength=numbeams)
+		result[populated] = sums[populated] / validcounts[populated]
+	elif snippettype == SNIPPET_MAX:
+		# populate the array with the MAX of all samples.  the segments of the populated beams are contiguous, so reduceat over their starts
+		segmentstarts = (np.cumsum(validcounts) - validcounts)[populated]
+		if len(segmentstarts) > 0:
+			result[populated] = np.maximum.reduceat(samples, segmentstarts)
+	elif snippettype == SNIPPET_MEAN5DB:
+		# populate the array with the mean of all samples withing a 5dB range of the mean.  As per QPS
+		db = 20.0 * np.log10(samples)
+		meandb = np.zeros(numbeams)
+		meandb[populated] = np.bincount(beam, weights=db, minlength=numbeams)[populated] / validcounts[populated]
+		inside = np.abs(db - meandb[beam]) < 5
+		insidecounts = np.bincount(beam[inside], minlength=numbeams)
+		insidesums = np.bincount(beam[inside], weights=db[inside], minlength=numbeams)
+		result[populated] = meandb[populated]
+		cut = insidecounts > 0
+		result[cut] = insidesums[cut] / insidecounts[cut]
+	return result
+
+###########################################################################
+def decodeshard(filename, startoffset, endoffset, scalefactorsd, fields=None, usemmap=False):
+	'''
+	decode the pings in one byte range of a file.  this is the worker for GSFREADER.decode_parallel() so it must live at module level so it can be pickled.
+	startoffset must be the start of a record.  scalefactorsd are the scale factors in effect at startoffset
+	'''
+	r = GSFREADER(filename, mmap=usemmap)
+	r.fileptr.seek(startoffset, 0)
+	pings = []
+	while r.fileptr.tell() < endoffset and r.moreData():
+		numberofbytes, recordidentifier, datagram = r.readDatagram()
+		if recordidentifier != SWATH_BATHYMETRY:
+			continue
+		scalefactorsd = datagram.read(scalefactorsd, fields=fields)
+		ping = {name: getattr(datagram, name) for name in PINGHEADERNAMES}
+		if fields is None:
+			for name in ARRAYNAMES.values():
+				values = getattr(datagram, name, [])
+				if len(values) > 0:
+					ping[name] = values
+		else:
+			for field in fields:
+				ping[ARRAYNAMES[field]] = getattr(datagram, ARRAYNAMES[field], [])
+		pings.append(ping)
+	r.close()
+	return pings
+
+###########################################################################
+def verifyrange(filename, startoffset, endoffset, synchronised=False, blocksize=VERIFY_BLOCK_SIZE):
+	'''
+	verify the records which start in one byte range of a file.  this is the worker for GSFREADER.verify() so it must live at module level so it can be pickled.
+	if synchronised is False the range may start part way through a record, so we first search for the next record header.
+	returns (offset of the first record, offset following the last record, number of records, number of records with a checksum, list of (offset, recordidentifier, reason) for every corrupt record)
+	'''
+	filesize = os.path.getsize(filename)
+	endoffset = min(endoffset, filesize)
+	records = 0
+	checksummed = 0
+	errors = []
+	with open(filename, 'rb', buffering=0) as f:
+		offset = startoffset if synchronised else findrecordheader(f, startoffset, filesize, blocksize)
+		firstoffset = offset
+		while offset < endoffset:
+			f.seek(offset, 0)
+			buffer = f.read(blocksize)
+			if len(buffer) < 8:
+				errors.append((offset, 0, "record header truncated"))
+				offset = filesize
+				break
+			# the checksummed records in this block as (offset, recordidentifier, start of data, end of data, checksum), so we can sum them all in one go
+			checks = []
+			pos = 0
+			while offset < endoffset and pos + 8 <= len(buffer):
+				sizeofdata, identifier = struct.unpack_from('>LL', buffer, pos)
+				numberofbytes, recordidentifier, haschecksum, hdrlen = decoderecordheader(sizeofdata, identifier)
+				if not isrecordheader(identifier):
+					errors.append((offset, recordidentifier, "bad record header"))
+					offset = findrecordheader(f, offset + 4, filesize, blocksize)
+					break
+				if offset + numberofbytes > filesize:
+					errors.append((offset, recordidentifier, "record truncated, %d bytes missing" % (offset + numberofbytes - filesize)))
+					offset = findrecordheader(f, offset + 4, filesize, blocksize)
+					break
+				if pos + numberofbytes > len(buffer):
+					if pos > 0:
+						# read the next block from the start of this record
+						break
+					# the record is bigger than a block, so read the rest of it
+					buffer += f.read(numberofbytes - len(buffer))
+				records += 1
+				if haschecksum:
+					checksummed += 1
+					checks.append((offset, recordidentifier, pos + hdrlen, pos + numberofbytes, struct.unpack_from('>L', buffer, pos + 8)[0]))
+				pos += numberofbytes
+				offset += numberofbytes
+			errors.extend(checksumerrors(buffer, checks))
+	return firstoffset, max(offset, firstoffset), records, checksummed, sorted(errors)
+
+###########################################################################
+def checksumerrors(buffer, checks):
+	'''
+	recompute the checksums of the records in buffer with one numpy reduction rather than record by record.  the checksum is the sum of the data bytes modulo 2^32.
+	checks is a list of (offset, recordidentifier, start of data, end of data, checksum) in file order.  returns (offset, recordidentifier, reason) for those which do not match
+	'''
+	if len(checks) == 0:
+		return []
+	offsets, identifiers, starts, ends, expected = (np.array(c, dtype=np.int64) for c in zip(*checks))
+	sums = np.zeros(len(checks), dtype=np.uint64)
+	populated = ends > starts
+	if populated.any():
+		# reduceat over the interleaved (start, end) positions sums the data of every record, and the gaps between them which we ignore.
+		# reduceat cannot take an index at the end of the array, so we stop the array at the end of the last record and drop its end
+		data = np.frombuffer(buffer, dtype=np.uint8, count=int(ends[populated][-1]))
+		indices = np.column_stack((starts[populated], ends[populated])).ravel()[:-1]
+		sums[populated] = np.add.reduceat(data, indices, dtype=np.uint64)[::2]
+	sums &= np.uint64(0xFFFFFFFF)
+	bad = np.nonzero(sums != expected.astype(np.uint64))[0]
+	return [(int(offsets[i]), int(identifiers[i]), "checksum mismatch, header %d data %d" % (expected[i], sums[i])) for i in bad]
+
+###########################################################################
+def isrecordheader(identifier):
+	'''true if the identifier word of a record header makes sense, i.e. the reserved bits are clear and it is a record we know'''
+	return (identifier & 0x7FC00000) == 0 and HEADER <= (identifier & 0x003FFFFF) <= ATTITUDE
+
+###########################################################################
+def findrecordheader(f, offset, filesize, blocksize=VERIFY_BLOCK_SIZE):
+	'''
+	search forward from offset for the next record header.  records are padded to 4 bytes so we only look at 4 byte aligned offsets.
+	every candidate in a block is screened at once with numpy, and one is only trusted if VERIFY_RESYNC_RECORDS records chain on from it.
+	returns the offset of the record, or filesize if there are none
+	'''
+	offset = (offset + 3) & ~3
+	while offset + 8 <= filesize:
+		f.seek(offset, 0)
+		# read one word more than the block so a header on the last word of the block is seen
+		buffer = f.read(blocksize + 4)
+		words = np.frombuffer(buffer, dtype='>u4', count=len(buffer) // 4)
+		if len(words) < 2:
+			break
+		sizeofdata = words[:-1].astype(np.int64)
+		identifier = words[1:]
+		hdrlen = np.where(identifier & 0x80000000, 12, 8)
+		candidateoffsets = offset + (np.arange(len(identifier), dtype=np.int64) * 4)
+		candidates = ((identifier & 0x7FC00000) == 0) & ((identifier & 0x003FFFFF) >= HEADER) & ((identifier & 0x003FFFFF) <= ATTITUDE) & (sizeofdata % 4 == 0) & (candidateoffsets + sizeofdata + hdrlen <= filesize)
+		for candidate in candidateoffsets[candidates]:
+			if chainsrecords(f, int(candidate), filesize):
+				return int(candidate)
+		offset += blocksize
+	return filesize
+
+###########################################################################
+def chainsrecords(f, offset, filesize, count=VERIFY_RESYNC_RECORDS):
+	'''true if count sensible record headers follow on from each other starting at offset, or they run exactly to the end of the file'''
+	for i in range(count):
+		if offset == filesize:
+			return True
+		f.seek(offset, 0)
+		data = f.read(8)
+		if len(data) < 8:
+			return False
+		sizeofdata, identifier = struct.unpack('>LL', data)
+		numberofbytes, recordidentifier, haschecksum, hdrlen = decoderecordheader(sizeofdata, identifier)
+		if not isrecordheader(identifier) or sizeofdata % 4 != 0 or offset + numberofbytes > filesize:
+			return False
+		offset += numberofbytes
+	return True
+
+###########################################################################
+def unpackscalefactors(buffer, pos):
+	'''unpack the scale factors subrecord starting at pos in the buffer.  returns a list of (subrecord identifier, compression flag, multiplier, offset)'''
+	count = struct.unpack_from('>l', buffer, pos)[0]
+	scalefactors = []
+	for s in struct.iter_unpack('>lll', buffer[pos + 4:pos + 4 + (count * 12)]):
+		scalefactors.append(((s[0] & 0xFF000000) >> 24, s[0] & 0xF0, s[1], s[2]))
+	return scalefactors
+
+###########################################################################
+def createscalefactor(subrecordid, compressionflag, multiplier, offset):
+	sf = SCALEFACTOR()
+	sf.subrecordID = subrecordid
+	sf.compressionFlag = compressionflag
+	sf.multiplier = multiplier
+	sf.offset = offset
+	sf.datatype = compressionflag
+	return sf
+
+###########################################################################
+def readsidecar(filename, sourcefilename, magic, version, dtypes):
+	'''
+	read the arrays saved by writesidecar().  dtypes is the dtype of each array in the order they were saved.
+	returns a list of the arrays, or None if the sidecar does not exist, is truncated, is another version, or no longer matches the gsf file size and modified time
+	'''
+	if not os.path.isfile(filename):
+		return None
+
+	stat = os.stat(sourcefilename)
+	hdrfmt = SIDECAR_HEADER_FORMAT + ("Q" * len(dtypes))
+	hdrlen = struct.calcsize(hdrfmt)
+	with open(filename, 'rb') as f:
+		data = f.read(hdrlen)
+		if len(data) < hdrlen:
+			return None
+		s = struct.unpack(hdrfmt, data)
+		if s[0] != magic or s[1] != version:
+			return None
+		if s[2] != stat.st_size or s[3] != stat.st_mtime_ns:
+			return None
+		counts = s[4:]
+		arrays = [np.fromfile(f, dtype=dtype, count=count) for dtype, count in zip(dtypes, counts)]
+	if any(len(array) != count for array, count in zip(arrays, counts)):
+		return None
+	return arrays
+
+###########################################################################
+def writesidecar(filename, sourcefilename, magic, version, arrays, dtypes):
+	'''
+	save arrays in a sidecar file next to a gsf file, stamped with the gsf file size and modified time so readsidecar() can tell when it is stale.
+	we write a uniquely named temporary file and rename it into place, so a reader never sees half a sidecar and processes saving the same sidecar do not write over each other.
+	the gsf file may live on a read only share, so failing to save is not an error.  returns True if the sidecar was saved
+	'''
+	stat = os.stat(sourcefilename)
+	tmpfilename = None
+	try:
+		fd, tmpfilename = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filename)), prefix=os.path.basename(filename) + ".", suffix=".tmp")
+		with os.fdopen(fd, 'wb') as f:
+			f.write(struct.pack(SIDECAR_HEADER_FORMAT + ("Q" * len(arrays)), magic, version, stat.st_size, stat.st_mtime_ns, *[len(array) for array in arrays]))
+			for array, dtype in zip(arrays, dtypes):
+				f.write(array.astype(dtype).tobytes())
+		# mkstemp makes the file private to us, but the sidecar is shared with everyone who reads the gsf file
+		os.chmod(tmpfilename, 0o644)
+		os.replace(tmpfilename, filename)
+	except OSError:
+		if tmpfilename is not None and os.path.exists(tmpfilename):
+			os.remove(tmpfilename)
+		return False
+	return True
+
+###########################################################################
+def memorymapfile(fileobject):
+	'''map the entire file read only.  the map shares the operating system page cache so forked processes do not duplicate it'''
+	return mmap.mmap(fileobject.fileno(), 0, access=mmap.ACCESS_READ)
+
+###########################################################################
+def readnumpyarray(fileptr, dtype, count):
+	'''
+	read count values of dtype from the current file position and advance the file pointer.
+	if the file is memory mapped we return a zero copy view over the mapped pages rather than a copy
+	'''
+	if isinstance(fileptr, mmap.mmap):
+		offset = fileptr.tell()
+		nparr = np.frombuffer(fileptr, dtype=dtype, count=count, offset=offset)
+		fileptr.seek(offset + nparr.nbytes, 0)
+		return nparr
+	if isinstance(fileptr, RECORDBUFFER):
+		offset = fileptr.tell()
+		nparr = np.frombuffer(fileptr.data, dtype=dtype, count=count, offset=offset - fileptr.base)
+		fileptr.seek(offset + nparr.nbytes, 0)
+		return nparr
+	return np.fromfile(fileptr, dtype=dtype, count=count)
+
+###########################################################################
+def interpolateattitude(attitude, times):
+	'''
+	interpolate the attitude (as returned by GSFREADER.loadattitude()) at an array of times, e.g. the ping or beam times.  heading is interpolated across the 359 to 0 degree wrap.
+	returns an ATTITUDE_DTYPE array the same shape as times.  times outside the attitude series are NaN rather than extrapolated
+	'''
+	times = np.asarray(times, dtype=np.float64)
+	result = np.zeros(times.shape, dtype=ATTITUDE_DTYPE)
+	result['timestamp'] = times
+	position = interpolationweights(attitude['timestamp'], times)
+	for name in ["roll", "pitch", "heave"]:
+		result[name] = interpolatevalues(attitude[name], position).reshape(times.shape)
+	result['heading'] = (interpolatevalues(attitude['heading'], position, period=360.0) % 360.0).reshape(times.shape)
+	return result
 
+###########################################################################
+def interpolatenavigation(navigation, times):
+	'''
+	interpolate the navigation (as returned by GSFREADER.loadnavigation()) at an array of times.  heading is interpolated across the 359 to 0 degree wrap and longitude across the anti-meridian.
+	returns a NAVIGATION_DTYPE array the same shape as times, where deltatime is the time since the preceding navigation record.  times outside the navigation series are NaN rather than extrapolated
+	'''
+	times = np.asarray(times, dtype=np.float64)
+	result = np.zeros(times.shape, dtype=NAVIGATION_DTYPE)
+	result['timestamp'] = times
+	position = interpolationweights(navigation['timestamp'], times)
+	for name in ["latitude", "height", "roll", "pitch"]:
+		result[name] = interpolatevalues(navigation[name], position).reshape(times.shape)
+	result['heading'] = (interpolatevalues(navigation['heading'], position, period=360.0) % 360.0).reshape(times.shape)
+	result['longitude'] = (((interpolatevalues(navigation['longitude'], position, period=360.0) + 180.0) % 360.0) - 180.0).reshape(times.shape)
+	result['deltatime'] = (times.ravel() - interpolatevalues(navigation['timestamp'], position, previous=True)).reshape(times.shape)
+	return result
+
+###########################################################################
+def interpolationweights(seriestimes, times):
+	'''
+	find where each of the times falls in the time series using a binary search, so we can interpolate many values at the same times.
+	returns (sort order of the series, index of the series value after each time, weight of that value, True if the time is inside the series)
+	'''
+	order = np.argsort(seriestimes, kind='stable')
+	seriestimes = np.asarray(seriestimes, dtype=np.float64)[order]
+	times = times.ravel()
+	if len(seriestimes) < 2:
+		return order, None, None, np.zeros(len(times), dtype=bool)
+	after = np.clip(np.searchsorted(seriestimes, times, side='right'), 1, len(seriestimes) - 1)
+	span = seriestimes[after] - seriestimes[after - 1]
+	weight = np.divide(times - seriestimes[after - 1], span, out=np.zeros(len(times)), where=span > 0)
+	valid = (times >= seriestimes[0]) & (times <= seriestimes[-1])
+	return order, after, weight, valid
+
+###########################################################################
+def interpolatevalues(values, position, period=None, previous=False):
+	'''
+	linear interpolation of values at the positions from interpolationweights().  if period is set (e.g. 360 for degrees) the values are unwrapped first so we interpolate the short way around.
+	if previous is True return the series value before each time rather than interpolating
+	'''
+	order, after, weight, valid = position
+	if after is None:
+		return np.full(len(valid), np.nan)
+	values = np.asarray(values, dtype=np.float64)[order]
+	if period is not None:
+		values = np.unwrap(values, period=period)
+	if previous:
+		result = np.where(weight >= 1.0, values[after], values[after - 1])
+	else:
+		result = values[after - 1] + (weight * (values[after] - values[after - 1]))
+	return np.where(valid, result, np.nan)
+
+###########################################################################
+def decoderecordheader(sizeofdata, recordidentifier):
+	'''
+	decode the size and identifier words of a record header.  if bit 31 of the identifier is set, a 4 byte checksum of the record data follows the 8 byte header.  bits 22 to 30 are reserved.
+	returns (numberofbytes including the header, recordidentifier, haschecksum, header length)
+	'''
+	if recordidentifier & 0x80000000:
+		return (sizeofdata + 12, recordidentifier & 0x003FFFFF, True, 12)
+	return (sizeofdata + 8, recordidentifier & 0x003FFFFF, False, 8)
+
+###########################################################################
+def paddedsubrecordsize(subrecord_id, subrecord_size):
+	'''the number of bytes a ping subrecord takes up after its 4 byte header.  gsflib pads the intensity series to a multiple of 4 bytes but does not count the padding in the subrecord size'''
+	if subrecord_id == INTENSITY_SERIES_ARRAY and subrecord_size % 4 > 0:
+		return subrecord_size + 4 - (subrecord_size % 4)
+	return subrecord_size
+
+###########################################################################
+def decodedfields(pings):
+	'''the subrecord identifiers of the beam arrays decoded in any of the pings'''
+	return [field for field, name in ARRAYNAMES.items() if any(len(getattr(ping, name, [])) > 0 for ping in pings)]
+
+###########################################################################
+def findsubrecord(buffer, pos, end, subrecordid):
+	'''
+	walk the subrecord size words of a ping from buffer[pos] to end and return the position of the data of the first subrecord with this identifier, or -1 if the ping does not have one.
+	buffer may hold only the start of the ping, in which case we return None if the walk needs bytes beyond it
+	'''
+	while pos + 4 <= end:
+		if pos + 4 > len(buffer):
+			return None
+		word = struct.unpack_from('>L', buffer, pos)[0]
+		if word >> 24 == subrecordid:
+			return pos + 4
+		pos += 4 + paddedsubrecordsize(word >> 24, word & 0x00FFFFFF)
+	return -1
 
 ###########################################################################
 def isBitSet(int_type, offset):
@@ -1846,7 +3232,7 @@ if __name__ == "__main__":
 
 ###############################################################################
 		# if recordidentifier == SWATH_BATHYMETRY:
-		# 	datagram.read()
+		# 	scalefactorsd = datagram.read(scalefactorsd)
 		# 	datagram.snippettype = SNIPPET_NONE
 			# print ("%s Lat:%.3f Lon:%.3f Ping:%d Freq:%d Serial %s" % (datagram.currentRecordDateTime(), datagram.latitude, datagram.longitude, datagram.pingnumber, datagram.frequency, datagram.serialnumber))
 
@@ -246,7 +246,7 @@ def clipintensity(datagram, minimumintenisty=0.0):
 
 ###############################################################################
 		# if recordidentifier == SWATH_BATHYMETRY:
-		# 	datagram.read()
+		# 	scalefactorsd = datagram.read(scalefactorsd)
 		# 	datagram.snippettype = SNIPPET_NONE
 			# print ("%s Lat:%.3f Lon:%.3f Ping:%d Freq:%d Serial %s" % (datagram.currentRecordDateTime(), datagram.latitude, datagram.longitude, datagram.pingnumber, datagram.frequency, datagram.serialnumber))
 
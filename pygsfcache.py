@@ -0,0 +1,234 @@
+#name:			pygsfcache
+#created:		October 2026
+#description:	python module to cache the decoded beam arrays of gsf files on disc as .npy files, so repeated runs over the same files memory map them rather than decoding every ping again
+#				this is a library for scripts which process the beam arrays in bulk.  the command line tools do not use it.
+#				See readme.md for more details
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+from argparse import ArgumentParser
+from argparse import RawTextHelpFormatter
+
+import numpy as np
+
+import pygsf
+import fileutils
+
+# bump this if the decode changes so old cache entries are not used
+CACHE_VERSION = 2
+
+# the cache lives on the scratch disc unless PYGSF_CACHE_DIR says otherwise
+CACHE_DIR = os.environ.get("PYGSF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "pygsfcache"))
+
+# the cache evicts the least recently used files once it is bigger than this
+CACHE_MAX_BYTES = 10 * 1024 * 1024 * 1024
+
+# the beam arrays cached unless the caller asks for others
+CACHE_FIELDS = [pygsf.DEPTH_ARRAY, pygsf.ACROSS_TRACK_ARRAY, pygsf.ALONG_TRACK_ARRAY, pygsf.BEAM_ANGLE_ARRAY, pygsf.BEAM_FLAGS_ARRAY]
+
+# the beam flags are bit fields, so they are cached as integers rather than float64.  integers cannot hold NaN, so they are padded with zero and cached with a mask which is True for the padding
+CACHE_INTEGER_FIELDS = {pygsf.BEAM_FLAGS_ARRAY: np.uint8}
+CACHE_MASK_SUFFIX = "_mask"
+
+# each cache entry is a folder of .npy files.  the manifest is written last, so a folder without one is incomplete.  its modified time is the last time the entry was used
+CACHE_MANIFEST = "manifest.json"
+CACHE_HEADER = "header.npy"
+
+# incomplete entries older than this (seconds) were left by a crashed process and are removed
+CACHE_STALE_SECONDS = 24 * 60 * 60
+
+###############################################################################
+def main():
+	parser = ArgumentParser(description='Cache the decoded beam arrays of gsf files as memory mapped .npy files so repeated processing does not decode every ping again.',
+			epilog='Example: \n To cache a single file use -i c:/temp/myfile.gsf \n To cache all .gsf files recursively from the current folder, use -r -i ./ \n To empty the cache use -clear \n', formatter_class=RawTextHelpFormatter)
+	parser.add_argument('-cachedir', dest='cachedir', action='store', default=CACHE_DIR, help='The cache folder. [Default: %s]' % (CACHE_DIR))
+	parser.add_argument('-clear', action='store_true', default=False, dest='clear', help='Remove everything from the cache.  [Default: False]')
+	parser.add_argument('-i', dest='inputFile', action='store', default="", help='Input gsf filename to cache. It can also be a wildcard, e.g. *.gsf')
+	parser.add_argument('-maxsize', dest='maxsize', action='store', type=float, default=CACHE_MAX_BYTES / (1024 * 1024 * 1024), help='The largest the cache may grow in gigabytes before the least recently used files are evicted. [Default: %d]' % (CACHE_MAX_BYTES / (1024 * 1024 * 1024)))
+	parser.add_argument('-r', action='store_true', default=False, dest='recursive', help='Search recursively from the current folder.  [Default: False]')
+
+	if len(sys.argv)==1:
+		parser.print_help()
+		sys.exit(1)
+
+	args = parser.parse_args()
+
+	cache = GSFCACHE(args.cachedir, int(args.maxsize * 1024 * 1024 * 1024))
+	if args.clear:
+		cache.clear()
+
+	if len(args.inputFile) > 0:
+		if os.path.isfile(args.inputFile):
+			matches = [args.inputFile]
+		elif args.recursive:
+			matches = fileutils.findFiles2(True, args.inputFile, "*.gsf")
+		else:
+			matches = fileutils.findFiles2(False, os.path.dirname(args.inputFile) or ".", os.path.basename(args.inputFile) or "*.gsf")
+		for filename in matches:
+			batch = cache.load(filename)
+			print ("%s pings: %d" % (filename, len(batch)))
+
+	print ("Cache %s size: %.1f MB" % (cache.cachedir, cache.size() / (1024 * 1024)))
+
+###############################################################################
+class GSFCACHE:
+	'''
+	an on disc cache of decoded gsf beam arrays.  each file is cached as a ping header table and one (pings x beams) .npy file per beam array, keyed by the file path, size, modified time and the arrays requested.
+	later runs memory map the .npy files (np.load(mmap_mode='r')) instead of decoding.  when the cache is bigger than maxbytes the least recently used entries are evicted
+	'''
+	def __init__(self, cachedir=CACHE_DIR, maxbytes=CACHE_MAX_BYTES):
+		self.cachedir = cachedir
+		self.maxbytes = maxbytes
+
+	###########################################################################
+	def key(self, filename, fields):
+		'''the cache key for a file.  if the file is replaced or modified the key changes, so stale entries are never used and age out of the cache'''
+		stat = os.stat(filename)
+		text = "%s|%d|%d|%s|%d" % (os.path.abspath(filename), stat.st_size, stat.st_mtime_ns, sorted(fields), CACHE_VERSION)
+		return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+	###########################################################################
+	def load(self, filename, fields=CACHE_FIELDS, rebuild=False):
+		'''
+		return the decoded pings of the file as a PINGBATCH whose arrays are read only memory maps over the cache.  if the file is not in the cache we decode it once and add it.
+		the float arrays are padded with NaN.  the beam flags are a masked array of integers
+		'''
+		entrydir = os.path.join(self.cachedir, self.key(filename, fields))
+		if rebuild and os.path.isdir(entrydir):
+			shutil.rmtree(entrydir, ignore_errors=True)
+		if not os.path.isfile(os.path.join(entrydir, CACHE_MANIFEST)):
+			self.build(filename, fields, entrydir)
+			self.evict(keep=entrydir)
+		else:
+			# remember when we last used this entry so eviction is least recently used
+			os.utime(os.path.join(entrydir, CACHE_MANIFEST))
+		return self.read(entrydir, fields)
+
+	###########################################################################
+	def build(self, filename, fields, entrydir):
+		'''
+		decode the file into the cache.  the arrays are written straight into memory mapped .npy files a batch at a time, so we never hold the whole file in memory.
+		we build in a temporary folder and rename it into place when complete, so other processes never see a half written entry
+		'''
+		os.makedirs(self.cachedir, exist_ok=True)
+		tmpdir = tempfile.mkdtemp(prefix=os.path.basename(entrydir) + ".", suffix=".tmp", dir=self.cachedir)
+		try:
+			reader = pygsf.GSFREADER(filename)
+			numbeams = reader.readpingheaders()['numbeams']
+			shape = (len(numbeams), int(numbeams.max()) if len(numbeams) > 0 else 0)
+
+			header = np.zeros(shape[0], dtype=pygsf.PINGHEADER_DTYPE)
+			arrays = {}
+			masks = {}
+			for field in fields:
+				if field in CACHE_INTEGER_FIELDS:
+					arrays[field] = np.lib.format.open_memmap(os.path.join(tmpdir, pygsf.ARRAYNAMES[field] + ".npy"), mode='w+', dtype=CACHE_INTEGER_FIELDS[field], shape=shape)
+					arrays[field][:] = 0
+					masks[field] = np.lib.format.open_memmap(os.path.join(tmpdir, pygsf.ARRAYNAMES[field] + CACHE_MASK_SUFFIX + ".npy"), mode='w+', dtype=np.bool_, shape=shape)
+					masks[field][:] = True
+				else:
+					arrays[field] = np.lib.format.open_memmap(os.path.join(tmpdir, pygsf.ARRAYNAMES[field] + ".npy"), mode='w+', dtype=np.float64, shape=shape)
+					arrays[field][:] = np.nan
+
+			pingnumber = 0
+			for batch in reader.iter_batches(fields=fields):
+				rows = slice(pingnumber, pingnumber + len(batch))
+				header[rows] = batch.header
+				for field in fields:
+					values = batch.arrays[field]
+					if field in masks:
+						missing = np.isnan(values)
+						arrays[field][rows, :values.shape[1]] = np.where(missing, 0, values)
+						masks[field][rows, :values.shape[1]] = missing
+					else:
+						arrays[field][rows, :values.shape[1]] = values
+				pingnumber += len(batch)
+			reader.close()
+
+			for field in fields:
+				arrays[field].flush()
+				if field in masks:
+					masks[field].flush()
+			arrays = None
+			masks = None
+			np.save(os.path.join(tmpdir, CACHE_HEADER), header)
+			with open(os.path.join(tmpdir, CACHE_MANIFEST), 'w') as f:
+				json.dump({"filename": os.path.abspath(filename), "fields": sorted(fields), "pings": shape[0], "beams": shape[1], "version": CACHE_VERSION}, f)
+			try:
+				os.replace(tmpdir, entrydir)
+			except OSError:
+				# another process cached the same file while we were decoding it, so use theirs
+				shutil.rmtree(tmpdir, ignore_errors=True)
+		except BaseException:
+			shutil.rmtree(tmpdir, ignore_errors=True)
+			raise
+
+	###########################################################################
+	def read(self, entrydir, fields):
+		'''memory map a cache entry into a PINGBATCH.  the integer fields are returned as masked arrays, masked where there is no value'''
+		header = np.load(os.path.join(entrydir, CACHE_HEADER))
+		# an empty array cannot be memory mapped
+		mmap_mode = 'r' if len(header) > 0 else None
+		arrays = {}
+		for field in fields:
+			arrays[field] = np.load(os.path.join(entrydir, pygsf.ARRAYNAMES[field] + ".npy"), mmap_mode=mmap_mode)
+			if field in CACHE_INTEGER_FIELDS:
+				mask = np.load(os.path.join(entrydir, pygsf.ARRAYNAMES[field] + CACHE_MASK_SUFFIX + ".npy"), mmap_mode=mmap_mode)
+				arrays[field] = np.ma.MaskedArray(arrays[field], mask=mask, copy=False)
+		return pygsf.PINGBATCH(header, arrays)
+
+	###########################################################################
+	def entries(self):
+		'''the complete cache entries as a list of (last used time, bytes, folder), oldest first'''
+		entries = []
+		if not os.path.isdir(self.cachedir):
+			return entries
+		for name in os.listdir(self.cachedir):
+			entrydir = os.path.join(self.cachedir, name)
+			manifest = os.path.join(entrydir, CACHE_MANIFEST)
+			if not os.path.isdir(entrydir):
+				continue
+			if not os.path.isfile(manifest):
+				if name.endswith(".tmp") and time.time() - os.path.getmtime(entrydir) > CACHE_STALE_SECONDS:
+					shutil.rmtree(entrydir, ignore_errors=True)
+				continue
+			size = sum(entry.stat().st_size for entry in os.scandir(entrydir) if entry.is_file())
+			entries.append((os.path.getmtime(manifest), size, entrydir))
+		return sorted(entries)
+
+	###########################################################################
+	def size(self):
+		'''the number of bytes in the cache'''
+		return sum(size for lastused, size, entrydir in self.entries())
+
+	###########################################################################
+	def evict(self, keep=None):
+		'''remove the least recently used entries until the cache fits in maxbytes.  the keep entry is never removed.  returns the number of bytes freed'''
+		entries = self.entries()
+		total = sum(size for lastused, size, entrydir in entries)
+		freed = 0
+		for lastused, size, entrydir in entries:
+			if total - freed <= self.maxbytes:
+				break
+			if entrydir == keep:
+				continue
+			shutil.rmtree(entrydir, ignore_errors=True)
+			freed += size
+		return freed
+
+	###########################################################################
+	def clear(self):
+		'''remove every entry from the cache'''
+		for lastused, size, entrydir in self.entries():
+			shutil.rmtree(entrydir, ignore_errors=True)
+
+###############################################################################
+if __name__ == "__main__":
+	start_time = time.time() # time  the process
+	main()
+	print("Duration: %d seconds" % (time.time() - start_time))
@@ -0,0 +1,298 @@
+#name:			pygsfcatalog
+#created:		October 2026
+#description:	python module to maintain a local sqlite catalog of gsf holdings so we can ask which files cover an area and time without re-reading them
+#				See readme.md for more details
+
+import os
+import sys
+import time
+import struct
+import sqlite3
+from argparse import ArgumentParser
+from argparse import RawTextHelpFormatter
+
+import numpy as np
+
+import pygsf
+import fileutils
+from timeutils import parsetime
+
+CATALOG_FILENAME = "gsfcatalog.sqlite"
+
+CATALOG_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+	path TEXT PRIMARY KEY,
+	size INTEGER,
+	mtime_ns INTEGER,
+	scanned REAL,
+	pingcount INTEGER,
+	begintime REAL,
+	endtime REAL,
+	minlongitude REAL,
+	minlatitude REAL,
+	maxlongitude REAL,
+	maxlatitude REAL,
+	mindepth REAL,
+	maxdepth REAL,
+	sensorid INTEGER,
+	modelnumber TEXT,
+	serialnumber TEXT
+);
+CREATE TABLE IF NOT EXISTS recordcounts (
+	path TEXT,
+	recordidentifier INTEGER,
+	count INTEGER,
+	PRIMARY KEY (path, recordidentifier)
+);
+CREATE TABLE IF NOT EXISTS frequencies (
+	path TEXT,
+	frequency REAL,
+	PRIMARY KEY (path, frequency)
+);
+CREATE INDEX IF NOT EXISTS files_time ON files (begintime, endtime);
+CREATE INDEX IF NOT EXISTS files_extents ON files (minlongitude, maxlongitude, minlatitude, maxlatitude);
+'''
+
+###############################################################################
+def main():
+	parser = ArgumentParser(description='Maintain a sqlite catalog of gsf files and query it by area and time.',
+			epilog='Example: \n To catalog all .gsf files recursively from the current folder, use -r -i ./ \n To list the files which cover an area and time use -bbox 1.2345,51.1234,1.2375,51.1252 -start 2022-04-15T14:00:00 -end 2022-04-15T15:00:00 \n', formatter_class=RawTextHelpFormatter)
+	parser.add_argument('-bbox', dest='bbox', action='store', default="", help='List the files which overlap this bounding box in geographicals: minlongitude,minlatitude,maxlongitude,maxlatitude')
+	parser.add_argument('-db', dest='db', action='store', default=CATALOG_FILENAME, help='The catalog database filename. [Default: %s]' % (CATALOG_FILENAME))
+	parser.add_argument('-end', dest='end', action='store', default="", help='List the files with data before this UTC time e.g. 2022-04-15T15:00:00')
+	parser.add_argument('-i', dest='inputFile', action='store', default="", help='Input gsf filename to add to the catalog. It can also be a wildcard, e.g. *.gsf')
+	parser.add_argument('-prune', action='store_true', default=False, dest='prune', help='Remove files from the catalog which no longer exist.  [Default: False]')
+	parser.add_argument('-r', action='store_true', default=False, dest='recursive', help='Search recursively from the current folder.  [Default: False]')
+	parser.add_argument('-start', dest='start', action='store', default="", help='List the files with data after this UTC time e.g. 2022-04-15T14:00:00')
+
+	if len(sys.argv)==1:
+		parser.print_help()
+		sys.exit(1)
+
+	args = parser.parse_args()
+
+	catalog = GSFCATALOG(args.db)
+
+	if len(args.inputFile) > 0:
+		if os.path.isfile(args.inputFile):
+			matches = [args.inputFile]
+		elif args.recursive:
+			matches = fileutils.findFiles2(True, args.inputFile, "*.gsf")
+		else:
+			matches = fileutils.findFiles2(False, os.path.dirname(args.inputFile) or ".", os.path.basename(args.inputFile) or "*.gsf")
+		scanned = catalog.refresh(matches)
+		print ("Files found: %d scanned: %d" % (len(matches), scanned))
+
+	if args.prune:
+		print ("Files removed: %d" % (catalog.prune()))
+
+	if len(args.bbox) > 0 or len(args.start) > 0 or len(args.end) > 0:
+		bbox = None
+		if len(args.bbox) > 0:
+			bbox = list(map(float, args.bbox.split(",")))
+		start = parsetime(args.start) if len(args.start) > 0 else None
+		end = parsetime(args.end) if len(args.end) > 0 else None
+		for filename in catalog.query(bbox, start, end):
+			print (filename)
+
+	catalog.close()
+
+###############################################################################
+class GSFCATALOG:
+	'''
+	a sqlite catalog of gsf files.  per file we store the size, modified time, record counts by type, time span, extents, sonar model, serial number and frequencies.
+	refresh() only rescans files which are new or whose size or modified time has changed, so keeping a large project up to date is cheap
+	'''
+	def __init__(self, filename=CATALOG_FILENAME):
+		self.fileName = filename
+		self.connection = sqlite3.connect(filename)
+		self.connection.executescript(CATALOG_SCHEMA)
+
+	###########################################################################
+	def close(self):
+		self.connection.close()
+
+	###########################################################################
+	def refresh(self, filenames):
+		'''add new files and rescan changed files.  returns the number of files scanned'''
+		known = {}
+		for path, size, mtime in self.connection.execute("SELECT path, size, mtime_ns FROM files"):
+			known[path] = (size, mtime)
+
+		scanned = 0
+		for filename in filenames:
+			path = os.path.abspath(filename).replace('\\','/')
+			try:
+				stat = os.stat(path)
+			except FileNotFoundError:
+				# the file was deleted or moved after we listed it
+				print ("unable to catalog %s : file not found" % (path))
+				continue
+			if known.get(path) == (stat.st_size, stat.st_mtime_ns):
+				continue
+			try:
+				summary = scanfile(path)
+			except Exception as e:
+				print ("unable to catalog %s : %s" % (path, e))
+				continue
+			self.update(path, stat, summary)
+			scanned += 1
+		return scanned
+
+	###########################################################################
+	def update(self, path, stat, summary):
+		'''replace the catalog entry for a file'''
+		with self.connection:
+			self.remove(path)
+			self.connection.execute("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+				(path, stat.st_size, stat.st_mtime_ns, time.time(), summary['pingcount'], summary['begintime'], summary['endtime'],
+				summary['minlongitude'], summary['minlatitude'], summary['maxlongitude'], summary['maxlatitude'], summary['mindepth'], summary['maxdepth'],
+				summary['sensorid'], summary['modelnumber'], summary['serialnumber']))
+			self.connection.executemany("INSERT INTO recordcounts VALUES (?, ?, ?)", [(path, recordidentifier, count) for recordidentifier, count in summary['recordcounts'].items()])
+			self.connection.executemany("INSERT INTO frequencies VALUES (?, ?)", [(path, frequency) for frequency in summary['frequencies']])
+
+	###########################################################################
+	def remove(self, path):
+		'''remove a file from the catalog'''
+		for table in ["files", "recordcounts", "frequencies"]:
+			self.connection.execute("DELETE FROM %s WHERE path = ?" % (table), (path,))
+
+	###########################################################################
+	def prune(self):
+		'''remove files from the catalog which no longer exist on disc.  returns the number of files removed'''
+		missing = [path for (path,) in self.connection.execute("SELECT path FROM files") if not os.path.isfile(path)]
+		with self.connection:
+			for path in missing:
+				self.remove(path)
+		return len(missing)
+
+	###########################################################################
+	def query(self, bbox=None, start=None, end=None):
+		'''
+		list the files which overlap the bounding box (minlongitude, minlatitude, maxlongitude, maxlatitude) and the time span start to end (seconds since 1970).
+		any of the criteria can be None
+		'''
+		sql = "SELECT path FROM files WHERE 1"
+		parameters = []
+		if bbox is not None:
+			minx, miny, maxx, maxy = bbox
+			sql += " AND minlongitude <= ? AND maxlongitude >= ? AND minlatitude <= ? AND maxlatitude >= ?"
+			parameters += [maxx, minx, maxy, miny]
+		if start is not None:
+			sql += " AND endtime >= ?"
+			parameters.append(start)
+		if end is not None:
+			sql += " AND begintime <= ?"
+			parameters.append(end)
+		sql += " ORDER BY begintime"
+		return [path for (path,) in self.connection.execute(sql, parameters)]
+
+	###########################################################################
+	def recordcounts(self, path):
+		'''the number of records of each type in a cataloged file.  returns a dictionary of record identifier: count'''
+		path = os.path.abspath(path).replace('\\','/')
+		return dict(self.connection.execute("SELECT recordidentifier, count FROM recordcounts WHERE path = ?", (path,)))
+
+	###########################################################################
+	def frequencies(self, path):
+		'''the distinct sonar frequencies (Hz) in a cataloged file'''
+		path = os.path.abspath(path).replace('\\','/')
+		return [frequency for (frequency,) in self.connection.execute("SELECT frequency FROM frequencies WHERE path = ? ORDER BY frequency", (path,))]
+
+###############################################################################
+def scanfile(filename):
+	'''
+	scan a gsf file in a single pass over the record headers.  the ping time and position come from the ping header, so we only read the subrecord headers of each ping to find the sonar details.
+	the extents come from the SWATH_BATHY_SUMMARY record if there is one, otherwise from the ping positions
+	'''
+	reader = pygsf.GSFREADER(filename, mmap=True)
+	hdrfmt = struct.Struct('>llll')
+	recordcounts = {}
+	pings = []
+	frequencies = set()
+	summary = None
+	sensorid = None
+	modelnumber = ""
+	serialnumber = ""
+
+	try:
+		for offset, numberofbytes, recordidentifier, hdrlen, peek in reader.walkheaders(peekbytes=hdrfmt.size):
+			recordcounts[recordidentifier] = recordcounts.get(recordidentifier, 0) + 1
+			if recordidentifier == pygsf.SWATH_BATHYMETRY and len(peek) == hdrfmt.size:
+				pings.append(hdrfmt.unpack(peek))
+				sonar = readsonardetails(reader.memorymap, offset + hdrlen, offset + numberofbytes)
+				if sonar[0] is not None:
+					sensorid = sonar[0]
+				if sonar[1] is not None:
+					modelnumber, serialnumber, frequency = sonar[1:]
+					frequencies.add(frequency)
+			elif recordidentifier == pygsf.SWATH_BATHY_SUMMARY and summary is None:
+				reader.fileptr.seek(offset, 0)
+				numberofbytes, recordidentifier, datagram = reader.readDatagram()
+				datagram.read()
+				summary = datagram
+	finally:
+		reader.close()
+
+	result = {
+		'pingcount': len(pings),
+		'recordcounts': recordcounts,
+		'frequencies': sorted(frequencies),
+		'sensorid': sensorid,
+		'modelnumber': modelnumber,
+		'serialnumber': serialnumber,
+		'begintime': None, 'endtime': None,
+		'minlongitude': None, 'minlatitude': None, 'maxlongitude': None, 'maxlatitude': None,
+		'mindepth': None, 'maxdepth': None,
+		}
+
+	if len(pings) > 0:
+		pings = np.array(pings, dtype=np.float64)
+		timestamps = pings[:, 0] + (pings[:, 1] / 1000000000)
+		result['begintime'] = float(timestamps.min())
+		result['endtime'] = float(timestamps.max())
+		result['minlongitude'] = float(pings[:, 2].min() / 10000000)
+		result['maxlongitude'] = float(pings[:, 2].max() / 10000000)
+		result['minlatitude'] = float(pings[:, 3].min() / 10000000)
+		result['maxlatitude'] = float(pings[:, 3].max() / 10000000)
+
+	if summary is not None:
+		result['minlongitude'] = summary.MIN_LONGITUDE
+		result['maxlongitude'] = summary.MAX_LONGITUDE
+		result['minlatitude'] = summary.MIN_LATITUDE
+		result['maxlatitude'] = summary.MAX_LATITUDE
+		result['mindepth'] = summary.MIN_DEPTH
+		result['maxdepth'] = summary.MAX_DEPTH
+	return result
+
+###############################################################################
+def readsonardetails(buffer, start, end):
+	'''
+	walk the subrecord headers of a ping in the buffer and return (sensor identifier, model number, serial number, frequency (Hz)).
+	the sensor identifier is None if there is no sensor specific subrecord.  the model, serial number and frequency are None unless the ping has r2sonic imagery
+	'''
+	pingheaderlen = struct.calcsize('>llll5hlH3h2Hlllh')
+	intensitylen = struct.calcsize(pygsf.INTENSITY_SERIES_HEADER_FORMAT)
+	imagerylen = struct.calcsize(pygsf.R2SONIC_IMAGERY_FORMAT)
+	sensorid = None
+	sonar = (None, None, None)
+	pos = start + pingheaderlen
+	while pos + 4 <= end:
+		word = struct.unpack_from('>L', buffer, pos)[0]
+		subrecord_id = word >> 24
+		subrecord_size = word & 0x00FFFFFF
+		pos += 4
+		if subrecord_id > pygsf.SCALE_FACTORS:
+			sensorid = subrecord_id
+		elif subrecord_id == pygsf.INTENSITY_SERIES_ARRAY and sensorid in pygsf.R2SONIC_SPECIFIC and subrecord_size >= intensitylen + imagerylen:
+			# we only need the model, serial number and frequency from the r2sonic imagery header.  gsflib writes the sensor specific subrecord first, so we know the sonar by now
+			raw = struct.unpack_from(pygsf.R2SONIC_IMAGERY_FORMAT, buffer, pos + intensitylen)
+			modelnumber = raw[0].decode('utf-8', 'ignore').rstrip('\x00')
+			serialnumber = raw[1].decode('utf-8', 'ignore').rstrip('\x00')
+			sonar = (modelnumber, serialnumber, raw[7] / 1.0e3)
+		pos += pygsf.paddedsubrecordsize(subrecord_id, subrecord_size)
+	return (sensorid,) + sonar
+
+###############################################################################
+if __name__ == "__main__":
+	main()
@@ -15,20 +15,34 @@ from argparse import RawTextHelpFormatter
 from datetime import datetime
 from datetime import timedelta
 from glob import glob
+import batchutils
+from batchutils import update_progress
 import pygsf
 import struct
+from timeutils import parsetime
+
+# the buffered copy used when the kernel cannot copy the records for us reads this many bytes at a time
+COPY_BLOCK_SIZE = 4 * 1024 * 1024
 
 ###############################################################################
 def main():
 	parser = ArgumentParser(description='Read gsf file and condition the file by removing redundant records and injecting updated information to make the file self-contained.',
 			epilog='Example: \n To condition a single file use -i c:/temp/myfile.gsf -exclude 12 \n to condition gsf files in a folder use -i c:/temp/*.gsf\n To condition gsf .gsf files recursively in a folder, use -r -i c:/temp \n To condition all .gsf files recursively from the current folder, use -r -i ./ \n', formatter_class=RawTextHelpFormatter)
+	parser.add_argument('-bbox', dest='bbox', action='store', default="", help='Split the file into the runs of pings inside this bounding box in geographicals: minlongitude,minlatitude,maxlongitude,maxlatitude.  If the box starts with a negative value use -bbox=-1.2,51.1,-1.1,51.2')
 	parser.add_argument('-exclude', dest='exclude', action='store', default="", help='Exclude these records.  Note: this needs to be case sensitive e.g. -exclude 12,22')
 	parser.add_argument('-dump', action='store_true', default=False, dest='dump', help='Ascii Dump of the GSF file. [Default: False]')
 	parser.add_argument('-extractbs', action='store_true', default=False, dest='extractbs', help='Extract backscatter from snippet so we can analyse. [Default: False]')
 	parser.add_argument('-i', dest='inputFile', action='store', help='Input gsf filename. It can also be a wildcard, e.g. *.gsf')
+	parser.add_argument('-merge', action='store_true', default=False, dest='merge', help='Merge the input files into one file in time order, keeping one HEADER and dropping repeated sound velocity profiles and processing parameters. Use -o to name the merged file. [Default: False]')
 	parser.add_argument('-o', dest='outputFile', action='store', help='Output gsf filename. If not supplied, a filename is auto generated. [Default = ""')
 	parser.add_argument('-odir', dest='odir', action='store', default="", help='Specify a relative output folder e.g. -odir conditioned')
+	parser.add_argument('-polygon', dest='polygon', action='store', default="", help='Split the file into the runs of pings inside this polygon in geographicals: longitude,latitude,longitude,latitude,...')
 	parser.add_argument('-r', action='store_true', default=False, dest='recursive', help='Search recursively from the current folder.  [Default: False]')
+	parser.add_argument('-splitduration', dest='splitduration', action='store', type=float, default=0, help='Split the file into pieces of this many seconds, on ping boundaries. [Default: 0, do not split]')
+	parser.add_argument('-splitsize', dest='splitsize', action='store', type=float, default=0, help='Split the file into pieces of about this many megabytes, on ping boundaries. [Default: 0, do not split]')
+	parser.add_argument('-verify', action='store_true', default=False, dest='verify', help='Verify the files by checking every record header and recomputing the record checksums, and report the offsets of any corrupt records. [Default: False]')
+	parser.add_argument('-window', dest='window', action='append', default=[], help='Cut out the records between these UTC times, e.g. -window 2022-04-15T14:00:00,2022-04-15T14:30:00.  Repeat -window to cut several pieces.')
+	parser.add_argument('-j', '--jobs', dest='jobs', action='store', type=int, default=1, help='Process this many files at the same time in separate processes. 0 uses every cpu. [Default: 1]')
 
 	if len(sys.argv)==1:
 		parser.print_help()
@@ -44,6 +58,8 @@ def main():
 	latitude = 0
 	longitude = 0
 	exclude = []
+	windows = []
+	polygon = []
 
 	if args.dump:
 		dump = args.dump
@@ -68,6 +84,32 @@ def main():
 	if len(args.exclude) > 0:
 		exclude = list(map(int, args.exclude.split(",")))
 		print ("Excluding datagrams: %s :" % exclude)
+		writeConditionedFile = True
+
+	for window in args.window:
+		windows.append(tuple(map(parsetime, window.split(","))))
+	if len(args.bbox) > 0:
+		minx, miny, maxx, maxy = map(float, args.bbox.split(","))
+		polygon = [(minx, miny), (maxx, miny), (maxx, maxy), (minx, maxy)]
+	if len(args.polygon) > 0:
+		values = list(map(float, args.polygon.split(",")))
+		polygon = list(zip(values[0::2], values[1::2]))
+	if len(windows) > 0 or len(polygon) > 0 or args.splitsize > 0 or args.splitduration > 0:
+		# the cut files replace the subset file
+		writeConditionedFile = False
+
+	if args.verify:
+		# if we are verifying several files at once each one uses a single process, otherwise one file uses every cpu
+		results = batchutils.runbatch(verifyfile, matches, args.jobs, (1 if args.jobs != 1 else None,))
+		batchutils.printsummary(results)
+		return
+
+	if args.merge:
+		outFileName = args.outputFile
+		if outFileName is None:
+			outFileName = os.path.join(os.path.dirname(os.path.abspath(matches[0])), str(args.odir), "merged.gsf")
+		mergefiles(matches, outFileName, exclude)
+		return
 
 	# if args.extractbs:
 	# 	extractBackscatter = True
@@ -81,26 +123,46 @@ def main():
 	# 	beamPointingAngles = []
 	# 	transmitSector = []
 
-	for filename in matches:
-		if dump:
-			dumpfile(filename, str(args.odir))
-
-		if writeConditionedFile:
-			createsubsetfile(filename, str(args.odir), exclude)
-		# if extractBackscatter:
-		# 	outFileName = os.path.join(os.path.dirname(os.path.abspath(matches[0])), args.odir, "AngularResponseCurve_.csv")
-		# 	outFileName = createOutputFileName(outFileName)
-		# 	ARC = extractARC(filename, ARC, pygsf.ARCIdx, beamPointingAngles, transmitSector)
-		# 	# ARC, beamPointingAngles, transmitSector = extractARC(filename, ARC, ARCIdx, beamPointingAngles, transmitSector)
-
-		update_progress("Processed: %s (%d/%d)" % (filename, fileCounter, len(matches)), (fileCounter/len(matches)))
-		fileCounter +=1
+	results = batchutils.runbatch(conditionfile, matches, args.jobs, (str(args.odir), dump, writeConditionedFile, exclude, windows, polygon, int(args.splitsize * 1024 * 1024), args.splitduration))
+	fileCounter = len(results)
+	batchutils.printsummary(results)
 
 	if extractBackscatter:
 		saveARC(outFileName, ARC)
 
 		update_progress("Process Complete: ", (fileCounter/len(matches)))
 
+###############################################################################
+def conditionfile(filename, odir, dump, writeConditionedFile, exclude, windows=None, polygon=None, splitsize=0, splitduration=0):
+	'''condition one file.  this is called by the batch runner, possibly in a worker process'''
+	if windows is None:
+		windows = []
+	if polygon is None:
+		polygon = []
+	if dump:
+		dumpfile(filename, odir)
+
+	if writeConditionedFile:
+		createsubsetfile(filename, odir, exclude)
+
+	if len(windows) > 0:
+		splitfile(filename, odir, "_window", timewindowkeys(windows), exclude)
+
+	if len(polygon) > 0:
+		splitfile(filename, odir, "_segment", polygonkeys(polygon), exclude)
+
+	if splitsize > 0:
+		splitfile(filename, odir, "_part", sizekeys(splitsize), exclude, keepleading=True)
+
+	if splitduration > 0:
+		splitfile(filename, odir, "_part", durationkeys(splitduration), exclude, keepleading=True)
+	# if extractBackscatter:
+	# 	outFileName = os.path.join(os.path.dirname(os.path.abspath(matches[0])), args.odir, "AngularResponseCurve_.csv")
+	# 	outFileName = createOutputFileName(outFileName)
+	# 	ARC = extractARC(filename, ARC, pygsf.ARCIdx, beamPointingAngles, transmitSector)
+	# 	# ARC, beamPointingAngles, transmitSector = extractARC(filename, ARC, ARCIdx, beamPointingAngles, transmitSector)
+	return
+
 ###############################################################################
 def saveARC(outFileName, ARC):
 	'''print out the extracted backscatter angular response curve'''
@@ -127,6 +189,19 @@ def saveARC(outFileName, ARC):
 
 			f.write("%.3f, %d, %.3f, %d, %d, %.3f, %d, %d, %.3f, %d, %d, %.3f\n" % (record[0].takeOffAngle, record[0].sector, record[0].samples[0], record[0].sampleSum, record[0].numberOfSamplesPerBeam, record[1].samples[0], record[1].sampleSum, record[1].numberOfSamplesPerBeam,record[2].samples[0], record[2].sampleSum, record[2].numberOfSamplesPerBeam, responseAverage))
 
+###############################################################################
+def verifyfile(filename, workers=None):
+	'''verify the integrity of one file and print any corrupt records.  raises an exception if the file is corrupt, so the batch summary lists it as failed'''
+	r = pygsf.GSFREADER(filename)
+	result = r.verify(workers)
+	r.close()
+	print ("\n%s records: %d with checksums: %d corrupt: %d" % (filename, result['records'], result['checksummed'], len(result['errors'])))
+	for offset, recordidentifier, reason in result['errors']:
+		print ("  offset %d record %d: %s" % (offset, recordidentifier, reason))
+	if len(result['errors']) > 0:
+		raise ValueError("%s has %d corrupt records" % (filename, len(result['errors'])))
+	return result
+
 ###############################################################################
 def	dumpfile(filename, odir):
 	# create an output file based on the input
@@ -138,6 +213,7 @@ def	dumpfile(filename, odir):
 
 	r = pygsf.GSFREADER(filename)
 	counter = 0
+	scalefactorsd = {}
 
 	outFilePtr.write ("PingNumber, Latitude(Deg), Longitude(Deg), Frequency(Hz), SerialNumber, Heading(Deg), DepthCorrector(m), GPSTideCorrector(m), TideCorrector(m) \n")
 	while r.moreData():
@@ -147,7 +223,7 @@ def	dumpfile(filename, odir):
 		rawBytes = r.readDatagramBytes(datagram.offset, numberofbytes)
 		# the user has opted to skip this datagram, so continue
 		if recordidentifier == pygsf.SWATH_BATHYMETRY:
-			datagram.read()
+			scalefactorsd = datagram.read(scalefactorsd)
 			outFilePtr.write ("%d, %s, %.8f, %.8f, %d, %s, %.3f, %.3f, %.3f, %.3f\n" % (datagram.pingnumber, datagram.currentRecordDateTime(), datagram.latitude, datagram.longitude, datagram.frequency, datagram.serialnumber, datagram.heading, datagram.depthcorrector, datagram.gpstidecorrector, datagram.tidecorrector))
 	
 	outFilePtr.close()
@@ -161,26 +237,79 @@ def	createsubsetfile(filename, odir, exclude):
 	# create an output file based on the input
 	outFileName = os.path.join(os.path.dirname(os.path.abspath(filename)), odir, os.path.splitext(os.path.basename(filename))[0] + "_subset" + os.path.splitext(os.path.basename(filename))[1])
 	outFileName  = createOutputFileName(outFileName)
-	outFilePtr = open(outFileName, 'wb')
 	print ("writing subset to file: %s" % outFileName)
 
+	# we only need the record headers to decide what to keep, so walk them rather than creating a class for every record
 	r = pygsf.GSFREADER(filename)
-	counter = 0
-
-	while r.moreData():
-		# read a datagram.  If we support it, return the datagram type and aclass for that datagram
-		numberofbytes, recordidentifier, datagram = r.readDatagram()
-		# read the bytes into a buffer 
-		rawBytes = r.readDatagramBytes(datagram.offset, numberofbytes)
-		# the user has opted to skip this datagram, so continue
-		if recordidentifier in exclude:
-			continue
-		outFilePtr.write(rawBytes)
+	ranges = keptranges(r.walkheaders(), exclude)
 	r.close()
+
+	with open(filename, 'rb') as inFilePtr, open(outFileName, 'wb', buffering=0) as outFilePtr:
+		copyranges(inFilePtr, outFilePtr, ranges)
 	print ("Saving conditioned file to: %s" % outFileName)		
-	outFilePtr.close()
 	return
 
+###############################################################################
+def keptranges(records, exclude):
+	'''
+	return the byte ranges [start, end) of the records we keep, merging adjacent records into one range.  records are the (offset, numberofbytes, recordidentifier, ...) tuples from GSFREADER.walkheaders()
+	'''
+	ranges = []
+	for record in records:
+		offset, numberofbytes, recordidentifier = record[0], record[1], record[2]
+		if recordidentifier in exclude:
+			continue
+		if len(ranges) > 0 and ranges[-1][1] == offset:
+			ranges[-1][1] = offset + numberofbytes
+		else:
+			ranges.append([offset, offset + numberofbytes])
+	return ranges
+
+###############################################################################
+def copyranges(inFilePtr, outFilePtr, ranges):
+	'''
+	copy the byte ranges from one file to the end of another.  we let the kernel copy the bytes with copy_file_range or sendfile where we can so they never come up into python.  
+	if neither is available (or the file systems do not support it) we fall back to a buffered copy.  returns the number of bytes copied
+	'''
+	total = 0
+	for start, end in ranges:
+		total += copyrange(inFilePtr, outFilePtr, start, end - start)
+	return total
+
+###############################################################################
+def copyrange(inFilePtr, outFilePtr, offset, count):
+	remaining = count
+	# the zero copy methods we try in order before falling back to a buffered copy
+	for kernelcopy in [copyfilerange, sendfile]:
+		try:
+			while remaining > 0:
+				copied = kernelcopy(inFilePtr.fileno(), outFilePtr.fileno(), offset + count - remaining, remaining)
+				if copied == 0:
+					break
+				remaining -= copied
+			if remaining == 0:
+				return count
+		except (OSError, AttributeError):
+			# not supported between these files, so try the next method from where we got to
+			continue
+
+	inFilePtr.seek(offset + count - remaining, 0)
+	while remaining > 0:
+		data = inFilePtr.read(min(COPY_BLOCK_SIZE, remaining))
+		if len(data) == 0:
+			raise IOError("unexpected end of file in %s at offset %d" % (inFilePtr.name, offset + count - remaining))
+		outFilePtr.write(data)
+		remaining -= len(data)
+	return count
+
+###############################################################################
+def copyfilerange(infd, outfd, offset, count):
+	return os.copy_file_range(infd, outfd, count, offset)
+
+###############################################################################
+def sendfile(infd, outfd, offset, count):
+	return os.sendfile(outfd, infd, offset, count)
+
 # ###############################################################################
 # def extractARC(filename, ARC, ARCIdx, beamPointingAngles, transmitSector):
 # 	r = pygsf.GSFREADER(filename, True)
@@ -210,6 +339,243 @@ def	createsubsetfile(filename, odir, exclude):
 # 				ARC[arcIndex][idx].sector = datagram.SECTOR_NUMBER_ARRAY[i]
 # 	return ARC
 
+###############################################################################
+def splitfile(filename, odir, suffix, pingkeys, exclude=None, keepleading=False):
+	'''
+	cut a file into pieces in one streaming pass, copying whole records as raw bytes.  pingkeys(ping, offset) returns the keys of the pieces each ping belongs to.  
+	a piece is opened at the first ping with its key and closed at the first ping without it, so every piece is a contiguous run of pings.  the records between the pings go to every open piece.
+	each piece starts with the HEADER and the most recent SVP, PROCESSING_PARAMETERS and ATTITUDE records so it is self-contained.
+	if keepleading is True the first piece starts with every record before the first ping instead, so splitting a whole file into parts loses nothing.
+	returns the output filenames
+	'''
+	if exclude is None:
+		exclude = []
+	leading = [] if keepleading else None
+	outputs = {}
+	outFileNames = []
+	context = SPLITCONTEXT()
+	offset = 0
+	for recordidentifier, data in readrecords(filename):
+		offset += len(data)
+		if recordidentifier in exclude:
+			continue
+		if recordidentifier == pygsf.SWATH_BATHYMETRY:
+			keys = pingkeys(data, offset - len(data))
+			for key in list(outputs):
+				if key not in keys:
+					outputs.pop(key).close()
+			for key in keys:
+				if key in outputs:
+					outputs[key].write(data)
+					continue
+				outFileName = os.path.join(os.path.dirname(os.path.abspath(filename)), odir, os.path.splitext(os.path.basename(filename))[0] + "%s%d" % (suffix, key) + os.path.splitext(os.path.basename(filename))[1])
+				outFileName = createOutputFileName(outFileName)
+				print ("writing %s to file: %s" % (suffix.strip("_"), outFileName))
+				outputs[key] = context.createfile(outFileName, leading)
+				leading = None
+				outputs[key].write(context.withscalefactors(data))
+				outFileNames.append(outFileName)
+		elif leading is not None:
+			leading.append(data)
+		elif recordidentifier != pygsf.HEADER:
+			# every piece already starts with the header
+			for outFilePtr in outputs.values():
+				outFilePtr.write(data)
+		context.update(recordidentifier, data)
+
+	for outFilePtr in outputs.values():
+		outFilePtr.close()
+	return outFileNames
+
+###############################################################################
+class SPLITCONTEXT:
+	'''the records we need to make a cut file self-contained, remembered as we stream through the input'''
+	def __init__(self):
+		self.records = {}				# the most recent raw record of each type we repeat at the start of a cut file
+		self.scalefactors = None		# the most recent raw scale factors subrecord.  pings only carry them when they change
+
+	###############################################################################
+	def update(self, recordidentifier, data):
+		if recordidentifier in [pygsf.HEADER, pygsf.SOUND_VELOCITY_PROFILE, pygsf.PROCESSING_PARAMETERS, pygsf.ATTITUDE]:
+			if recordidentifier != pygsf.HEADER or recordidentifier not in self.records:
+				self.records[recordidentifier] = data
+		if recordidentifier == pygsf.SWATH_BATHYMETRY:
+			scalefactors = scalefactorsubrecord(data)
+			if scalefactors is not None:
+				self.scalefactors = scalefactors
+
+	###############################################################################
+	def createfile(self, outFileName, leading=None):
+		'''create the output file and write the records which make it self-contained, or the leading records of the input if we have them'''
+		outFilePtr = open(outFileName, 'wb', buffering=COPY_BLOCK_SIZE)
+		if leading is not None:
+			for data in leading:
+				outFilePtr.write(data)
+			return outFilePtr
+		for recordidentifier in [pygsf.HEADER, pygsf.SOUND_VELOCITY_PROFILE, pygsf.PROCESSING_PARAMETERS, pygsf.ATTITUDE]:
+			if recordidentifier in self.records:
+				outFilePtr.write(self.records[recordidentifier])
+		return outFilePtr
+
+	###############################################################################
+	def withscalefactors(self, data):
+		'''return the ping with the scale factors in effect inserted as its first subrecord if it does not carry its own, so the first ping of a cut file can be decoded'''
+		if self.scalefactors is None or scalefactorsubrecord(data) is not None:
+			return data
+		sizeofdata, recordidentifier = struct.unpack_from('>LL', data, 0)
+		hdrlen = recordheaderlength(data)
+		pos = hdrlen + pygsf.PINGHEADER_RAW_DTYPE.itemsize
+		header = struct.pack('>LL', sizeofdata + len(self.scalefactors), recordidentifier)
+		if hdrlen == 12:
+			# the checksum is the sum of the data bytes, so add the bytes we insert
+			checksum = struct.unpack_from('>L', data, 8)[0]
+			header += struct.pack('>L', (checksum + sum(self.scalefactors)) & 0xFFFFFFFF)
+		return header + data[hdrlen:pos] + self.scalefactors + data[pos:]
+
+###############################################################################
+def readrecords(filename):
+	'''yield (recordidentifier, raw bytes including the record header) for every record in the file in one sequential pass'''
+	with open(filename, 'rb', buffering=COPY_BLOCK_SIZE) as inFilePtr:
+		while True:
+			header = inFilePtr.read(8)
+			if len(header) < 8:
+				return
+			numberofbytes, recordidentifier, haschecksum, hdrlen = pygsf.decoderecordheader(*struct.unpack('>LL', header))
+			body = inFilePtr.read(numberofbytes - 8)
+			if len(body) < numberofbytes - 8:
+				print ("record at offset %d is truncated, stopping" % (inFilePtr.tell() - len(body) - 8))
+				return
+			yield recordidentifier, header + body
+
+###############################################################################
+def recordheaderlength(data):
+	'''the length of the record header at the start of data, 12 bytes if the record carries a checksum, otherwise 8'''
+	return 12 if struct.unpack_from('>L', data, 4)[0] & 0x80000000 else 8
+
+###############################################################################
+def scalefactorsubrecord(data):
+	'''return the raw scale factors subrecord of a ping record, or None if it does not carry one.  gsflib writes it as the first subrecord but other writers may not, so we look through them all'''
+	pos = pygsf.findsubrecord(data, recordheaderlength(data) + pygsf.PINGHEADER_RAW_DTYPE.itemsize, len(data), pygsf.SCALE_FACTORS)
+	if pos is None or pos < 0:
+		return None
+	subrecord = struct.unpack_from('>L', data, pos - 4)[0]
+	return data[pos - 4:pos + (subrecord & 0x00FFFFFF)]
+
+###############################################################################
+def pingtime(data):
+	seconds, nanoseconds = struct.unpack_from('>ll', data, recordheaderlength(data))
+	return seconds + (nanoseconds / 1000000000)
+
+###############################################################################
+def pingposition(data):
+	longitude, latitude = struct.unpack_from('>ll', data, recordheaderlength(data) + 8)
+	return longitude / 10000000, latitude / 10000000
+
+###############################################################################
+def timewindowkeys(windows):
+	'''return a function which gives the indices of the (start, end) time windows containing a ping'''
+	def keys(data, offset):
+		timestamp = pingtime(data)
+		return [i for i, (start, end) in enumerate(windows) if start <= timestamp <= end]
+	return keys
+
+###############################################################################
+def polygonkeys(polygon):
+	'''return a function which numbers each run of consecutive pings inside the polygon, so each pass through the area becomes its own piece'''
+	state = {'segment': 0, 'inside': False}
+	def keys(data, offset):
+		longitude, latitude = pingposition(data)
+		inside = pointinpolygon(longitude, latitude, polygon)
+		if inside and not state['inside']:
+			state['segment'] += 1
+		state['inside'] = inside
+		return [state['segment']] if inside else []
+	return keys
+
+###############################################################################
+def sizekeys(size):
+	'''return a function which starts a new piece at the first ping after every size bytes of input'''
+	state = {'chunk': 0, 'start': 0}
+	def keys(data, offset):
+		if offset - state['start'] >= size:
+			state['chunk'] += 1
+			state['start'] = offset
+		return [state['chunk']]
+	return keys
+
+###############################################################################
+def durationkeys(duration):
+	'''return a function which starts a new piece at the first ping after every duration seconds'''
+	state = {'chunk': 0, 'start': None}
+	def keys(data, offset):
+		timestamp = pingtime(data)
+		if state['start'] is None:
+			state['start'] = timestamp
+		elif timestamp - state['start'] >= duration:
+			state['chunk'] += 1
+			state['start'] = timestamp
+		return [state['chunk']]
+	return keys
+
+###############################################################################
+def mergefiles(filenames, outFileName, exclude=None):
+	'''
+	merge files into one in time order, copying whole records as raw bytes.  we keep the first HEADER and drop sound velocity profiles, processing parameters and attitude which repeat the last one of their type we wrote, so the merged file does not repeat them.
+	returns the number of records written
+	'''
+	if exclude is None:
+		exclude = []
+	filenames = sorted(filenames, key=firstpingtime)
+	outFileName = createOutputFileName(outFileName)
+	print ("writing merged file: %s" % outFileName)
+
+	context = SPLITCONTEXT()
+	# the last record of each type we wrote.  a file only needs a profile again if it is different from the one in effect
+	lastwritten = {}
+	count = 0
+	with open(outFileName, 'wb', buffering=COPY_BLOCK_SIZE) as outFilePtr:
+		for filename in filenames:
+			firstping = True
+			for recordidentifier, data in readrecords(filename):
+				if recordidentifier in exclude:
+					continue
+				if recordidentifier == pygsf.HEADER and count > 0:
+					continue
+				if recordidentifier in [pygsf.SOUND_VELOCITY_PROFILE, pygsf.PROCESSING_PARAMETERS, pygsf.ATTITUDE]:
+					# a cut file repeats these before its first ping, and we have already written them at the end of the previous file
+					if data == lastwritten.get(recordidentifier):
+						continue
+					lastwritten[recordidentifier] = data
+				if recordidentifier == pygsf.SWATH_BATHYMETRY and firstping:
+					# the merged file must not rely on scale factors from the end of the previous file
+					data = context.withscalefactors(data)
+					firstping = False
+				outFilePtr.write(data)
+				context.update(recordidentifier, data)
+				count += 1
+	return count
+
+###############################################################################
+def firstpingtime(filename):
+	'''the time of the first ping in the file, or infinity if there are none so those files sort last'''
+	for recordidentifier, data in readrecords(filename):
+		if recordidentifier == pygsf.SWATH_BATHYMETRY:
+			return pingtime(data)
+	return math.inf
+
+###############################################################################
+def pointinpolygon(x, y, polygon):
+	'''even-odd ray casting test.  polygon is a list of (x, y) vertices'''
+	inside = False
+	j = len(polygon) - 1
+	for i in range(len(polygon)):
+		xi, yi = polygon[i]
+		xj, yj = polygon[j]
+		if ((yi > y) != (yj > y)) and (x < (xj - xi) * (y - yi) / (yj - yi) + xi):
+			inside = not inside
+		j = i
+	return inside
+
 ###############################################################################
 def from_timestamp(unixtime):
 	return datetime(1970, 1 ,1) + timedelta(seconds=unixtime)
@@ -222,38 +588,29 @@ def decdeg2dms(dd):
    degrees,minutes = divmod(minutes,60)
    degrees = degrees if is_positive else -degrees
    return (degrees,minutes,seconds)
-###############################################################################
-def update_progress(job_title, progress):
-	length = 20 # modify this to change the length
-	block = int(round(length*progress))
-	msg = "\r{0}: [{1}] {2}%".format(job_title, "#"*block + "-"*(length-block), round(progress*100, 2))
-	if progress >= 1: msg += " DONE\r\n"
-	sys.stdout.write(msg)
-	sys.stdout.flush()
 
 ###############################################################################
 def createOutputFileName(path):
-	'''Create a valid output filename. if the name of the file already exists the file name is auto-incremented.'''
+	'''
+	Create a valid output filename. if the name of the file already exists the file name is auto-incremented.
+	the file is created empty as we pick the name, so parallel workers writing to the same folder never pick the same one
+	'''
 	path	  = os.path.expanduser(path)
 
-	if not os.path.exists(os.path.dirname(path)):
-		os.makedirs(os.path.dirname(path))
+	if len(os.path.dirname(path)) > 0:
+		os.makedirs(os.path.dirname(path), exist_ok=True)
 
-	if not os.path.exists(path):
-		return path
-
-	root, ext = os.path.splitext(os.path.expanduser(path))
-	dir	   = os.path.dirname(root)
-	fname	 = os.path.basename(root)
-	candidate = fname+ext
+	root, ext = os.path.splitext(path)
+	candidate = path
 	index	 = 1
-	ls		= set(os.listdir(dir))
-	while candidate in ls:
-			candidate = "{}_{}{}".format(fname,index,ext)
+	while True:
+		try:
+			with open(candidate, 'xb'):
+				return candidate
+		except FileExistsError:
+			candidate = "{}_{}{}".format(root,index,ext)
 			index	+= 1
 
-	return os.path.join(dir, candidate)
-
 ###############################################################################
 if __name__ == "__main__":
 	start_time = time.time() # time  the process
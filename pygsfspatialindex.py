@@ -0,0 +1,242 @@
+#name:			pygsfspatialindex
+#created:		October 2026
+#description:	python module to index the swath footprint of every ping in a set of gsf files so we can quickly find the pings which touch an area of interest
+#				See readme.md for more details
+
+import os
+import sys
+from argparse import ArgumentParser
+from argparse import RawTextHelpFormatter
+
+import numpy as np
+
+import pygsf
+import fileutils
+
+# the spatial index lives in a sidecar file next to the gsf file, e.g. myfile.gsf.gsfbbox.  it is rebuilt if the gsf file size or modified time changes
+SPATIALINDEX_EXTENSION = ".gsfbbox"
+SPATIALINDEX_MAGIC = b"GSFBOX"
+SPATIALINDEX_VERSION = 1
+SPATIALINDEX_DTYPE = np.dtype([('offset', '<u8'), ('minx', '<f8'), ('miny', '<f8'), ('maxx', '<f8'), ('maxy', '<f8')])
+
+# the number of consecutive pings grouped into each node of the index.  a query tests the node boxes first, then only the pings inside the nodes which hit
+NODE_SIZE = 64
+
+# metres per degree of latitude.  the swath is only a few hundred metres wide so a local flat earth approximation is plenty
+METRES_PER_DEGREE = 111319.49
+
+###############################################################################
+def main():
+	parser = ArgumentParser(description='Index the swath footprint of every ping in gsf files and list the pings which touch a bounding box.',
+			epilog='Example: \n To query a single file use -i c:/temp/myfile.gsf -bbox 1.2345,51.1234,1.2375,51.1252 \n To query all .gsf files recursively from the current folder, use -r -i ./ -bbox 1.2345,51.1234,1.2375,51.1252 \n', formatter_class=RawTextHelpFormatter)
+	parser.add_argument('-bbox', dest='bbox', action='store', default="", help='Bounding box in geographicals: minlongitude,minlatitude,maxlongitude,maxlatitude.  If the box starts with a negative value use -bbox=-1.2,51.1,-1.1,51.2')
+	parser.add_argument('-i', dest='inputFile', action='store', help='Input gsf filename. It can also be a wildcard, e.g. *.gsf')
+	parser.add_argument('-r', action='store_true', default=False, dest='recursive', help='Search recursively from the current folder.  [Default: False]')
+	parser.add_argument('-rebuild', action='store_true', default=False, dest='rebuild', help='Rebuild the spatial index even if it is up to date.  [Default: False]')
+
+	if len(sys.argv)==1:
+		parser.print_help()
+		sys.exit(1)
+
+	args = parser.parse_args()
+
+	if os.path.isfile(args.inputFile):
+		matches = [args.inputFile]
+	elif args.recursive:
+		matches = fileutils.findFiles2(True, args.inputFile, "*.gsf")
+	else:
+		matches = fileutils.findFiles2(False, os.path.dirname(args.inputFile) or ".", os.path.basename(args.inputFile) or "*.gsf")
+
+	if len(matches) == 0:
+		print ("Nothing found in %s to index, quitting" % args.inputFile)
+		exit()
+
+	if len(args.bbox) == 0:
+		# no query, so just make sure the indexes are up to date
+		for filename in matches:
+			spatialindex = GSFSPATIALINDEX(filename)
+			spatialindex.load(rebuild=args.rebuild)
+			print ("%s pings: %d bbox: %s" % (filename, len(spatialindex), spatialindex.bbox))
+		return
+
+	bbox = list(map(float, args.bbox.split(",")))
+	for filename, pingnumbers, offsets in query(matches, bbox, rebuild=args.rebuild):
+		print ("%s pings: %d first: %d last: %d" % (filename, len(pingnumbers), pingnumbers[0], pingnumbers[-1]))
+
+###############################################################################
+def query(filenames, bbox, rebuild=False):
+	'''
+	find the pings in a list of gsf files whose swath footprint touches the bounding box (minlongitude, minlatitude, maxlongitude, maxlatitude).
+	returns a list of (filename, ping numbers, byte offsets of the pings) for only the files which have a hit
+	'''
+	results = []
+	for filename in filenames:
+		spatialindex = GSFSPATIALINDEX(filename)
+		spatialindex.load(rebuild=rebuild)
+		pingnumbers = spatialindex.query(bbox)
+		if len(pingnumbers) > 0:
+			results.append((filename, pingnumbers, spatialindex.boxes['offset'][pingnumbers]))
+	return results
+
+###############################################################################
+def readpings(filenames, bbox, fields=None, rebuild=False):
+	'''
+	decode only the pings whose swath footprint touches the bounding box.  files which do not touch the box are never opened.
+	returns a list of (filename, list of decoded pings)
+	'''
+	results = []
+	for filename, pingnumbers, offsets in query(filenames, bbox, rebuild=rebuild):
+		reader = pygsf.GSFREADER(filename)
+		results.append((filename, reader.readpings(pingnumbers, fields)))
+		reader.close()
+	return results
+
+###############################################################################
+def swathboxes(batch):
+	'''
+	compute the geographical bounding box of the swath footprint of each ping in a PINGBATCH from the ping position, heading and the across and along track distances.
+	returns the minx, miny, maxx, maxy arrays.  the nadir is always included so pings without beams still have a box
+	'''
+	count = len(batch)
+	across = np.zeros((count, 1))
+	along = np.zeros((count, 1))
+	if pygsf.ACROSS_TRACK_ARRAY in batch.arrays:
+		across = np.hstack([across, np.nan_to_num(batch.arrays[pygsf.ACROSS_TRACK_ARRAY])])
+	if pygsf.ALONG_TRACK_ARRAY in batch.arrays:
+		along = np.hstack([along, np.nan_to_num(batch.arrays[pygsf.ALONG_TRACK_ARRAY])])
+
+	# the 4 corners of the swath in the vessel frame (x starboard, y forwards), rotated into east and north
+	x = np.stack([across.min(axis=1), across.max(axis=1), across.min(axis=1), across.max(axis=1)], axis=1)
+	y = np.stack([along.min(axis=1), along.min(axis=1), along.max(axis=1), along.max(axis=1)], axis=1)
+	heading = np.radians(batch.header['heading'])[:, np.newaxis]
+	east = (y * np.sin(heading)) + (x * np.cos(heading))
+	north = (y * np.cos(heading)) - (x * np.sin(heading))
+
+	latitude = batch.header['latitude'][:, np.newaxis]
+	longitude = batch.header['longitude'][:, np.newaxis]
+	cosine = np.maximum(np.cos(np.radians(latitude)), 1e-6)
+	lons = longitude + (east / (METRES_PER_DEGREE * cosine))
+	lats = latitude + (north / METRES_PER_DEGREE)
+	return lons.min(axis=1), lats.min(axis=1), lons.max(axis=1), lats.max(axis=1)
+
+###############################################################################
+class GSFSPATIALINDEX:
+	'''
+	a two level spatial index of a gsf file.  the bottom level is the bounding box of the swath footprint of every ping.
+	consecutive pings are spatially coherent, so the top level groups every NODE_SIZE pings into a node with the bounding box of its pings.
+	queries test the file box, then the node boxes, then only the pings inside the nodes which hit
+	'''
+	def __init__(self, filename):
+		self.fileName = filename
+		self.boxes = None
+		self.nodeboxes = None
+		self.bbox = None
+
+	###########################################################################
+	def __len__(self):
+		'''the number of pings in the index'''
+		self.load()
+		return len(self.boxes)
+
+	###########################################################################
+	def indexfilename(self):
+		'''the name of the spatial index sidecar file which lives next to the gsf file'''
+		return self.fileName + SPATIALINDEX_EXTENSION
+
+	###########################################################################
+	def load(self, rebuild=False):
+		'''load the spatial index from the sidecar file.  if it is missing or stale, rebuild it and save it for next time'''
+		if self.boxes is not None and not rebuild:
+			return self.boxes
+
+		boxes = None
+		if not rebuild:
+			boxes = self.readindexfile()
+		if boxes is None:
+			boxes = self.build()
+			self.writeindexfile(boxes)
+
+		self.boxes = boxes
+		self.buildnodes()
+		return self.boxes
+
+	###########################################################################
+	def build(self):
+		'''read the across and along track arrays of every ping and compute the ping footprints'''
+		reader = pygsf.GSFREADER(self.fileName)
+		reader.loadindex()
+		offsets = reader.index['offset'][reader.pingindex]
+		boxes = np.zeros(len(offsets), dtype=SPATIALINDEX_DTYPE)
+		boxes['offset'] = offsets
+
+		pingnumber = 0
+		for batch in reader.iter_batches(fields=[pygsf.ACROSS_TRACK_ARRAY, pygsf.ALONG_TRACK_ARRAY]):
+			minx, miny, maxx, maxy = swathboxes(batch)
+			rows = slice(pingnumber, pingnumber + len(batch))
+			boxes['minx'][rows] = minx
+			boxes['miny'][rows] = miny
+			boxes['maxx'][rows] = maxx
+			boxes['maxy'][rows] = maxy
+			pingnumber += len(batch)
+		reader.close()
+		return boxes
+
+	###########################################################################
+	def buildnodes(self):
+		'''group the ping boxes into nodes of NODE_SIZE pings and compute the file bounding box'''
+		if len(self.boxes) == 0:
+			self.nodeboxes = np.zeros(0, dtype=SPATIALINDEX_DTYPE)
+			self.bbox = None
+			return
+
+		starts = np.arange(0, len(self.boxes), NODE_SIZE)
+		self.nodeboxes = np.zeros(len(starts), dtype=SPATIALINDEX_DTYPE)
+		self.nodeboxes['offset'] = self.boxes['offset'][starts]
+		self.nodeboxes['minx'] = np.minimum.reduceat(self.boxes['minx'], starts)
+		self.nodeboxes['miny'] = np.minimum.reduceat(self.boxes['miny'], starts)
+		self.nodeboxes['maxx'] = np.maximum.reduceat(self.boxes['maxx'], starts)
+		self.nodeboxes['maxy'] = np.maximum.reduceat(self.boxes['maxy'], starts)
+		self.bbox = (float(self.nodeboxes['minx'].min()), float(self.nodeboxes['miny'].min()), float(self.nodeboxes['maxx'].max()), float(self.nodeboxes['maxy'].max()))
+
+	###########################################################################
+	def query(self, bbox):
+		'''return the ping numbers (ascending) whose footprint touches the bounding box (minlongitude, minlatitude, maxlongitude, maxlatitude)'''
+		self.load()
+		minx, miny, maxx, maxy = bbox
+		if self.bbox is None or not intersects(self.bbox, minx, miny, maxx, maxy):
+			return np.zeros(0, dtype=np.int64)
+
+		nodes = np.flatnonzero(intersects(self.nodeboxes, minx, miny, maxx, maxy))
+		if len(nodes) == 0:
+			return np.zeros(0, dtype=np.int64)
+
+		candidates = (nodes[:, np.newaxis] * NODE_SIZE + np.arange(NODE_SIZE)).ravel()
+		candidates = candidates[candidates < len(self.boxes)]
+		return candidates[intersects(self.boxes[candidates], minx, miny, maxx, maxy)]
+
+	###########################################################################
+	def readindexfile(self):
+		'''read the spatial index sidecar file.  return None if it does not exist or no longer matches the gsf file'''
+		arrays = pygsf.readsidecar(self.indexfilename(), self.fileName, SPATIALINDEX_MAGIC, SPATIALINDEX_VERSION, [SPATIALINDEX_DTYPE])
+		if arrays is None:
+			return None
+		return arrays[0]
+
+	###########################################################################
+	def writeindexfile(self, boxes):
+		'''save the spatial index sidecar file'''
+		if not pygsf.writesidecar(self.indexfilename(), self.fileName, SPATIALINDEX_MAGIC, SPATIALINDEX_VERSION, [boxes], [SPATIALINDEX_DTYPE]):
+			print ("unable to save spatial index:", self.indexfilename())
+
+###############################################################################
+def intersects(boxes, minx, miny, maxx, maxy):
+	'''test if boxes (a structured array, or a single (minx, miny, maxx, maxy) tuple) touch the query box'''
+	if isinstance(boxes, tuple):
+		bminx, bminy, bmaxx, bmaxy = boxes
+	else:
+		bminx, bminy, bmaxx, bmaxy = boxes['minx'], boxes['miny'], boxes['maxx'], boxes['maxy']
+	return (bminx <= maxx) & (bmaxx >= minx) & (bminy <= maxy) & (bmaxy >= miny)
+
+###############################################################################
+if __name__ == "__main__":
+	main()
@@ -18,6 +18,8 @@ import warnings
 
 import geodetic
 import fileutils
+import batchutils
+from batchutils import update_progress
 
 # ignore numpy NaN warnings when applying a mask to the images.
 warnings.filterwarnings('ignore')
@@ -35,6 +37,7 @@ def main():
 	parser.add_argument('-r', action='store_true', default=False, dest='rotate', help='Rotate the resulting waterfall so the image reads from left to right instead of bottom to top.  [Default is bottom to top]')
 	parser.add_argument('-z', dest='zoom', default = 0, action='store', help='Zoom scale factor. A larger number makes a larger image, and a smaller number (0.5) provides a smaller image, e.g -z 2 makes an image twice the native resolution. [Default: 0]')
 	parser.add_argument('-arc', dest='arc', action='store', default="", help='Apply an angular response curve to the data e.g. -arc c:\\arc.csv')
+	parser.add_argument('-j', '--jobs', dest='jobs', action='store', type=int, default=1, help='Image this many files at the same time in separate processes. 0 uses every cpu. [Default: 1]')
 
 	if len(sys.argv)==1:
 		parser.print_help()
@@ -60,34 +63,39 @@ def main():
 	for filename in gsffiles:
 		if not filename.endswith('.gsf'):
 			print ("File %s is not a gsf file, skipping..." % (filename))
-			continue
-		if not os.path.isfile(filename):
-			print ("file not found:", filename)
-			exit()
-
-		xResolution, yResolution, beamCount, leftExtent, rightExtent, distanceTravelled, navigation = computeXYResolution(filename)
-		print("xRes %.2f yRes %.2f  leftExtent %.2f, rightExtent %.2f, distanceTravelled %.2f" % (xResolution, yResolution, leftExtent, rightExtent, distanceTravelled)) 
-		# pkpk tmp
-		# beamCount = 512
-		# xResolution = 0.4
-		# yResolution = 0.27
-		# leftExtent = -162.22
-		# rightExtent = 159.23
-		# distanceTravelled = 488.05
-		# navigation = []
-		# pkpk tmp
-		if beamCount == 0:
-			print ("No data to process, skipping empty file")
-			continue
-		zoom = float(args.zoom)
-		if (zoom ==0):
-			zoom = 1
-			# swathWidth = abs(leftExtent)+abs(rightExtent)
-			bc = beamCount
-			while (bc < 300):
-				zoom *= 2
-				bc *= zoom 
-		createWaterfall(filename, args.odir, args.color, beamCount, zoom, float(args.clip), float(args.minz), float(args.maxz), args.invert, args.annotate, xResolution, yResolution, args.rotate, leftExtent, rightExtent, distanceTravelled, navigation, applyarc, arc)
+	gsffiles = [filename for filename in gsffiles if filename.endswith('.gsf')]
+	results = batchutils.runbatch(waterfallfile, gsffiles, args.jobs, (args, applyarc, arc))
+	batchutils.printsummary(results)
+
+###############################################################################
+def waterfallfile(filename, args, applyarc, arc):
+	'''create the waterfall image for one file.  this is called by the batch runner, possibly in a worker process'''
+	if not os.path.isfile(filename):
+		raise FileNotFoundError("file not found: %s" % (filename))
+
+	xResolution, yResolution, beamCount, leftExtent, rightExtent, distanceTravelled, navigation = computeXYResolution(filename)
+	print("xRes %.2f yRes %.2f  leftExtent %.2f, rightExtent %.2f, distanceTravelled %.2f" % (xResolution, yResolution, leftExtent, rightExtent, distanceTravelled)) 
+	# pkpk tmp
+	# beamCount = 512
+	# xResolution = 0.4
+	# yResolution = 0.27
+	# leftExtent = -162.22
+	# rightExtent = 159.23
+	# distanceTravelled = 488.05
+	# navigation = []
+	# pkpk tmp
+	if beamCount == 0:
+		print ("No data to process, skipping empty file")
+		return
+	zoom = float(args.zoom)
+	if (zoom ==0):
+		zoom = 1
+		# swathWidth = abs(leftExtent)+abs(rightExtent)
+		bc = beamCount
+		while (bc < 300):
+			zoom *= 2
+			bc *= zoom 
+	createWaterfall(filename, args.odir, args.color, beamCount, zoom, float(args.clip), float(args.minz), float(args.maxz), args.invert, args.annotate, xResolution, yResolution, args.rotate, leftExtent, rightExtent, distanceTravelled, navigation, applyarc, arc)
 
 ###############################################################################
 def createWaterfall(filename, odir, colorScale, beamCount, zoom=1.0, clip=1, minz=0, maxz=100, invert=True, annotate=True, xResolution=1, yResolution=1, rotate=False, leftExtent=-100, rightExtent=100, distanceTravelled=0, navigation=[], applyarc=False, arc=[]):
@@ -106,6 +114,8 @@ def createWaterfall(filename, odir, colorScale, beamCount, zoom=1.0, clip=1, min
 
 	r = pygsf.GSFREADER(filename)
 	totalrecords = r.getrecordcount()
+	# the scale factors are only written when they change, so carry them forward from ping to ping
+	scalefactorsd = {}
 
 	while r.moreData():
 		numberofbytes, recordidentifier, datagram = r.readDatagram()
@@ -113,7 +123,7 @@ def createWaterfall(filename, odir, colorScale, beamCount, zoom=1.0, clip=1, min
 			# datagram.scalefactors = scalefactors
 			datagram.perbeam = True
 			datagram.snippettype = pygsf.SNIPPET_NONE
-			datagram.read()
+			scalefactorsd = datagram.read(scalefactorsd)
 			datagram.cliptwtt(0)
 			datagram.clipintensity(0)
 			datagram.clippolar(-60,60)
@@ -228,8 +238,7 @@ def createImage(filename, odir, suffix, colorScale, beamCount, waterfall, zoom=1
 
 	outFileName = os.path.join(os.path.dirname(os.path.abspath(filename[0])), odir, os.path.splitext(filename)[0] + "_Waterfall_" + suffix + ".png")
 
-	if not os.path.exists(os.path.dirname(outFileName)):
-		os.makedirs(os.path.dirname(outFileName))
+	os.makedirs(os.path.dirname(outFileName), exist_ok=True)
 
 	# img.save(os.path.splitext(filename)[0]+'.png')
 	img.save(outFileName)
@@ -390,11 +399,12 @@ def computeXYResolution(fileName):
 	# open the gsf file and read the scale factors
 	r = pygsf.GSFREADER(fileName)
 	# scalefactors = r.loadscalefactors()
+	scalefactorsd = {}
 
 	while r.moreData():
 		numberofbytes, recordidentifier, datagram = r.readDatagram()
 		if recordidentifier == 2: #SWATH_BATHYMETRY_PING
-			datagram.read()
+			scalefactorsd = datagram.read(scalefactorsd)
 			if prevLat == 0:
 				prevLat =  datagram.latitude
 				prevLong =  datagram.longitude
@@ -446,14 +456,6 @@ def writeLabel(img, y, label):
 	# img.paste( ImageOps.colorize(txt, (0,0,0), (0,0,255)), (x, y),  txt)
 	return img
 
-def update_progress(job_title, progress):
-	length = 20 # modify this to change the length
-	block = int(round(length*progress))
-	msg = "\r{0}: [{1}] {2}%".format(job_title, "#"*block + "-"*(length-block), round(progress*100, 2))
-	if progress >= 1: msg += " DONE\r\n"
-	sys.stdout.write(msg)
-	sys.stdout.flush()
-
 def spliceImages(img1, img2):
 	# images = map(Image.open, ['Test1.jpg', 'Test2.jpg', 'Test3.jpg'])
 	images = [img1, img2]
@@ -0,0 +1,8 @@
+#name:			conftest
+#created:		October 2026
+#description:	pytest setup.  the modules live in the repository root, so put it on the path
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,127 @@
+#name:			synthetic
+#created:		October 2026
+#description:	build small synthetic gsf files with GSFWRITER for the tests
+
+import struct
+from types import SimpleNamespace
+
+import numpy as np
+
+import pygsf
+
+STARTTIME = 1650000000.25
+PINGINTERVAL = 0.5
+
+###############################################################################
+def makeping(timestamp, longitude=151.0, latitude=-33.0, numbeams=8, depth=20.0, heading=45.0):
+	'''a ping with the same attributes SWATH_BATHYMETRY_PING.read() sets, so GSFWRITER.writeping() can write it'''
+	ping = SimpleNamespace(timestamp=timestamp, longitude=longitude, latitude=latitude, numbeams=numbeams, centrebeam=numbeams // 2, pingflags=0,
+		tidecorrector=0.0, depthcorrector=0.0, heading=heading, pitch=1.5, roll=-2.25, heave=0.12, course=heading, speed=5.0, height=12.34, separation=0.0, gpstidecorrector=0.0)
+	ping.DEPTH_ARRAY = depth + (np.arange(numbeams) * 0.25)
+	ping.ACROSS_TRACK_ARRAY = np.linspace(-40, 40, numbeams)
+	ping.ALONG_TRACK_ARRAY = np.linspace(-0.5, 0.5, numbeams)
+	ping.BEAM_ANGLE_ARRAY = np.linspace(-60, 60, numbeams)
+	return ping
+
+###############################################################################
+def makeattitude(starttime, duration, rate=10.0):
+	'''a smooth ATTITUDE_DTYPE series.  the heading crosses north so wrapping is exercised'''
+	attitude = np.zeros(int(duration * rate), dtype=pygsf.ATTITUDE_DTYPE)
+	attitude['timestamp'] = starttime + (np.arange(len(attitude)) / rate)
+	phase = np.arange(len(attitude)) / rate
+	attitude['roll'] = 3.0 * np.sin(phase)
+	attitude['pitch'] = 1.5 * np.cos(phase)
+	attitude['heave'] = 0.25 * np.sin(phase / 2)
+	attitude['heading'] = (355.0 + phase) % 360.0
+	return attitude
+
+###############################################################################
+def writesurvey(filename, pingcount=20, starttime=STARTTIME, longitude=151.0, latitude=-33.0, comment="synthetic survey"):
+	'''
+	write a small survey: a comment, a sound velocity profile, attitude covering the survey and pingcount pings heading north east.
+	returns the pings written
+	'''
+	pings = [makeping(starttime + (i * PINGINTERVAL), longitude + (i * 0.0001), latitude + (i * 0.0001)) for i in range(pingcount)]
+	with pygsf.GSFWRITER(filename) as writer:
+		writer.writecomment(starttime, comment)
+		writer.writesoundvelocityprofile(starttime, starttime, longitude, latitude, [0.0, 10.0, 50.0], [1500.0, 1498.5, 1490.25])
+		writer.writeattitude(makeattitude(starttime, (pingcount * PINGINTERVAL) + 1))
+		for ping in pings:
+			writer.writeping(ping)
+	return pings
+
+###############################################################################
+def readpings(filename, fields=None):
+	'''read every ping in a file, carrying the scale factors forward'''
+	pings = []
+	reader = pygsf.GSFREADER(filename)
+	scalefactorsd = {}
+	while reader.moreData():
+		numberofbytes, recordidentifier, datagram = reader.readDatagram()
+		if recordidentifier == pygsf.SWATH_BATHYMETRY:
+			scalefactorsd = datagram.read(scalefactorsd, fields=fields)
+			pings.append(datagram)
+	reader.close()
+	return pings
+
+###############################################################################
+def recordidentifiers(filename):
+	'''the identifier of every record in the file, in file order'''
+	identifiers = []
+	with open(filename, 'rb') as f:
+		while True:
+			header = f.read(8)
+			if len(header) < 8:
+				return identifiers
+			numberofbytes, recordidentifier, haschecksum, hdrlen = pygsf.decoderecordheader(*struct.unpack('>LL', header))
+			identifiers.append(recordidentifier)
+			f.seek(numberofbytes - 8, 1)
+
+###############################################################################
+def addchecksums(filename, outfilename):
+	'''rewrite a file with a checksum on every record, the same as gsflib does when asked to'''
+	with open(filename, 'rb') as f:
+		data = f.read()
+	pos = 0
+	with open(outfilename, 'wb') as f:
+		while pos < len(data):
+			sizeofdata, recordidentifier = struct.unpack_from('>LL', data, pos)
+			body = data[pos + 8:pos + 8 + sizeofdata]
+			f.write(struct.pack('>LLL', sizeofdata, recordidentifier | 0x80000000, sum(body) & 0xFFFFFFFF))
+			f.write(body)
+			pos += 8 + sizeofdata
+
+###############################################################################
+def packintensityseries(beams, bitspersample=16, serialnumber=b'SN1234', frequency=400000):
+	'''
+	pack a time series intensity subrecord (21) with the r2sonic imagery header.  beams is a list of (samples, bottom detect sample number), one per beam.
+	returns the subrecord with the padding gsflib puts after it
+	'''
+	imagery = [b'2024', serialnumber] + ([0] * 30) + [b'']
+	imagery[7] = int(frequency * 1000)
+	data = struct.pack(pygsf.INTENSITY_SERIES_HEADER_FORMAT, bitspersample, 0, b'') + struct.pack(pygsf.R2SONIC_IMAGERY_FORMAT, *imagery)
+	for samples, bottomdetect in beams:
+		data += struct.pack('>hh8s', len(samples), bottomdetect, b'') + np.asarray(samples, dtype=np.dtype(pygsf.SNIPPETSAMPLETYPES[bitspersample // 8]).newbyteorder('>')).tobytes()
+	return pygsf.packsubrecord(pygsf.INTENSITY_SERIES_ARRAY, data) + bytes((4 - (len(data) % 4)) % 4)
+
+###############################################################################
+def packsnippetping(ping, beams, scalefactors=None, sensorid=pygsf.R2SONIC_2024_SPECIFIC, **kwargs):
+	'''
+	pack a ping record body with the beam arrays of ping, a sensor specific subrecord and an intensity series built from beams (see packintensityseries).
+	the intensity series sits between the arrays so the padding after it matters.  scalefactors are only written if given, as {subrecord identifier: (multiplier, offset, bytes per value)}
+	'''
+	body = pygsf.packpingheader(ping)
+	if scalefactors is not None:
+		body += pygsf.packscalefactors(scalefactors)
+	arrays = []
+	for subrecordid in [pygsf.DEPTH_ARRAY, pygsf.ACROSS_TRACK_ARRAY, pygsf.ALONG_TRACK_ARRAY, pygsf.BEAM_ANGLE_ARRAY]:
+		multiplier, offset, bytespervalue = pygsf.ARRAYSCALEFACTORS[subrecordid]
+		raw, bytespervalue = pygsf.quantisearray(subrecordid, getattr(ping, pygsf.ARRAYNAMES[subrecordid]), multiplier, offset, bytespervalue)
+		arrays.append(pygsf.packsubrecord(subrecordid, raw))
+	return body + arrays[0] + pygsf.packsubrecord(sensorid, bytes(16)) + packintensityseries(beams, **kwargs) + b''.join(arrays[1:])
+
+###############################################################################
+def defaultscalefactors(*subrecordids):
+	'''the writer's default scale factors for the beam arrays packsnippetping writes, and any other subrecords asked for'''
+	ids = [pygsf.DEPTH_ARRAY, pygsf.ACROSS_TRACK_ARRAY, pygsf.ALONG_TRACK_ARRAY, pygsf.BEAM_ANGLE_ARRAY] + list(subrecordids)
+	return {subrecordid: pygsf.ARRAYSCALEFACTORS.get(subrecordid, (1, 0, 2)) for subrecordid in ids}
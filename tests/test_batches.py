@@ -0,0 +1,40 @@
+#name:			test_batches
+#created:		October 2026
+#description:	tests for the columnar PINGBATCH api
+
+import numpy as np
+
+import pygsf
+import synthetic
+
+###############################################################################
+def test_batches_hold_the_same_arrays(tmp_path):
+	filename = str(tmp_path / "survey.gsf")
+	pings = [synthetic.makeping(synthetic.STARTTIME + i, numbeams=8 if i < 3 else 6) for i in range(7)]
+	# the later pings do not have an along track array
+	for ping in pings[3:]:
+		ping.ALONG_TRACK_ARRAY = []
+	with pygsf.GSFWRITER(filename) as writer:
+		for ping in pings:
+			writer.writeping(ping)
+
+	batches = list(pygsf.GSFREADER(filename).iter_batches(batch_size=2))
+
+	assert [len(batch) for batch in batches] == [2, 2, 2, 1]
+	for batch in batches:
+		assert sorted(batch.arrays) == sorted(batches[0].arrays)
+	alongtrack = np.concatenate([batch.ALONG_TRACK_ARRAY[:, :6] for batch in batches])
+	assert not np.isnan(alongtrack[:3]).any()
+	assert np.isnan(alongtrack[3:]).all()
+	depths = np.concatenate([batch.DEPTH_ARRAY[:, :6] for batch in batches])
+	np.testing.assert_allclose(depths, [ping.DEPTH_ARRAY[:6] for ping in pings], atol=0.005)
+
+###############################################################################
+def test_batches_with_fields(tmp_path):
+	filename = str(tmp_path / "survey.gsf")
+	synthetic.writesurvey(filename)
+
+	batches = list(pygsf.GSFREADER(filename).iter_batches(batch_size=8, fields=[pygsf.DEPTH_ARRAY]))
+
+	assert [len(batch) for batch in batches] == [8, 8, 4]
+	assert all(list(batch.arrays) == [pygsf.DEPTH_ARRAY] for batch in batches)
@@ -0,0 +1,101 @@
+#name:			test_cache
+#created:		October 2026
+#description:	tests for the on disc cache of decoded beam arrays
+
+import os
+import time
+
+import numpy as np
+
+import pygsf
+import pygsfcache
+import synthetic
+
+###############################################################################
+def writeflaggedpings(filename):
+	'''pings with different beam counts, so the cache has to pad, and some beams flagged'''
+	pings = [synthetic.makeping(synthetic.STARTTIME + i, numbeams=8 if i % 2 == 0 else 6) for i in range(5)]
+	for i, ping in enumerate(pings):
+		ping.BEAM_FLAGS_ARRAY = np.zeros(ping.numbeams)
+		ping.BEAM_FLAGS_ARRAY[i] = 0x81
+	with pygsf.GSFWRITER(filename) as writer:
+		for ping in pings:
+			writer.writeping(ping)
+	return pings
+
+###############################################################################
+def test_cache_matches_a_fresh_decode(tmp_path):
+	filename = str(tmp_path / "survey.gsf")
+	pings = writeflaggedpings(filename)
+	cache = pygsfcache.GSFCACHE(str(tmp_path / "cache"))
+
+	batch = cache.load(filename)
+	cached = cache.load(filename)
+
+	assert len(cache.entries()) == 1
+	np.testing.assert_array_equal(cached.header['timestamp'], [ping.timestamp for ping in pings])
+	depths = np.full((5, 8), np.nan)
+	flags = np.ma.masked_all((5, 8), dtype=np.uint8)
+	for i, ping in enumerate(pings):
+		depths[i, :ping.numbeams] = ping.DEPTH_ARRAY
+		flags[i, :ping.numbeams] = ping.BEAM_FLAGS_ARRAY
+	for result in [batch, cached]:
+		np.testing.assert_allclose(result.DEPTH_ARRAY, depths, atol=0.005)
+		assert result.BEAM_FLAGS_ARRAY.dtype == np.uint8
+		np.testing.assert_array_equal(np.ma.getmaskarray(result.BEAM_FLAGS_ARRAY), np.isnan(depths))
+		np.testing.assert_array_equal(result.BEAM_FLAGS_ARRAY.filled(0), flags.filled(0))
+
+###############################################################################
+def test_cache_is_rebuilt_when_the_file_changes(tmp_path):
+	filename = str(tmp_path / "survey.gsf")
+	synthetic.writesurvey(filename, pingcount=4)
+	cache = pygsfcache.GSFCACHE(str(tmp_path / "cache"))
+	assert len(cache.load(filename)) == 4
+
+	synthetic.writesurvey(filename, pingcount=6)
+	assert len(cache.load(filename)) == 6
+
+###############################################################################
+def test_evict_least_recently_used(tmp_path):
+	cache = pygsfcache.GSFCACHE(str(tmp_path / "cache"))
+	filenames = [str(tmp_path / ("survey%d.gsf" % i)) for i in range(4)]
+	for filename in filenames:
+		synthetic.writesurvey(filename, pingcount=4)
+	entrydirs = [os.path.join(cache.cachedir, cache.key(filename, pygsfcache.CACHE_FIELDS)) for filename in filenames]
+	for filename in filenames[:3]:
+		cache.load(filename)
+	# last used: entry 0 longest ago, then entry 2, then entry 1
+	now = time.time()
+	for entrydir, age in zip(entrydirs, [300, 100, 200]):
+		os.utime(os.path.join(entrydir, pygsfcache.CACHE_MANIFEST), (now - age, now - age))
+	entrysize = max(size for lastused, size, entrydir in cache.entries())
+	assert [entrydir for lastused, size, entrydir in cache.entries()] == [entrydirs[0], entrydirs[2], entrydirs[1]]
+
+	# room for two entries, so adding a fourth pushes out the two least recently used
+	cache.maxbytes = 2 * entrysize
+	cache.load(filenames[3])
+	assert sorted(entrydir for lastused, size, entrydir in cache.entries()) == sorted([entrydirs[1], entrydirs[3]])
+	assert cache.size() <= cache.maxbytes
+
+	# the entry being kept survives even when it is the oldest and the cache is over size
+	os.utime(os.path.join(entrydirs[3], pygsfcache.CACHE_MANIFEST), (now - 1000, now - 1000))
+	cache.maxbytes = 0
+	assert cache.evict(keep=entrydirs[3]) > 0
+	assert [entrydir for lastused, size, entrydir in cache.entries()] == [entrydirs[3]]
+
+###############################################################################
+def test_stale_builds_are_removed(tmp_path):
+	cache = pygsfcache.GSFCACHE(str(tmp_path / "cache"))
+	stale = os.path.join(cache.cachedir, "abandoned.1234.tmp")
+	building = os.path.join(cache.cachedir, "building.5678.tmp")
+	for folder in [stale, building]:
+		os.makedirs(folder)
+		with open(os.path.join(folder, "DEPTH_ARRAY.npy"), "wb") as f:
+			f.write(bytes(100))
+	old = time.time() - pygsfcache.CACHE_STALE_SECONDS - 60
+	os.utime(stale, (old, old))
+
+	assert cache.entries() == []
+	assert not os.path.exists(stale)
+	# a build which may still be running in another process is left alone
+	assert os.path.isdir(building)
@@ -0,0 +1,166 @@
+#name:			test_gsfwriter
+#created:		October 2026
+#description:	round trip tests for GSFWRITER: write synthetic records, read them back with GSFREADER
+
+import numpy as np
+import pytest
+
+import pygsf
+import pygsfconditioner
+import synthetic
+
+###############################################################################
+def readrecords(filename, recordidentifier):
+	'''read and decode every record of one type'''
+	datagrams = []
+	reader = pygsf.GSFREADER(filename)
+	while reader.moreData():
+		numberofbytes, identifier, datagram = reader.readDatagram()
+		if identifier == recordidentifier:
+			datagram.read()
+			datagrams.append(datagram)
+	reader.close()
+	return datagrams
+
+###############################################################################
+def scalefactorpings(filename):
+	'''the index of every ping which carries a scale factors subrecord'''
+	pings = [data for recordidentifier, data in pygsfconditioner.readrecords(filename) if recordidentifier == pygsf.SWATH_BATHYMETRY]
+	return [i for i, data in enumerate(pings) if pygsfconditioner.scalefactorsubrecord(data) is not None]
+
+###############################################################################
+def angledifference(a, b):
+	return ((np.asarray(a) - np.asarray(b) + 180.0) % 360.0) - 180.0
+
+###############################################################################
+def test_pings_round_trip(tmp_path):
+	filename = str(tmp_path / "survey.gsf")
+	written = synthetic.writesurvey(filename)
+	pings = synthetic.readpings(filename)
+
+	assert len(pings) == len(written)
+	for ping, source in zip(pings, written):
+		for name in pygsf.PINGHEADERNAMES:
+			assert getattr(ping, name) == pytest.approx(getattr(source, name), abs=1e-7), name
+		for name in ["DEPTH_ARRAY", "ACROSS_TRACK_ARRAY", "ALONG_TRACK_ARRAY", "BEAM_ANGLE_ARRAY"]:
+			np.testing.assert_allclose(getattr(ping, name), getattr(source, name), atol=0.005, err_msg=name)
+
+###############################################################################
+def test_scale_factors_written_only_on_change(tmp_path):
+	filename = str(tmp_path / "widened.gsf")
+	pings = [synthetic.makeping(synthetic.STARTTIME + i) for i in range(10)]
+	# 1000m at a multiplier of 100 does not fit in 2 bytes, so this ping needs a wider depth field
+	pings[5].DEPTH_ARRAY = pings[5].DEPTH_ARRAY + 1000.0
+	with pygsf.GSFWRITER(filename) as writer:
+		for ping in pings:
+			writer.writeping(ping)
+
+	assert scalefactorpings(filename) == [0, 5, 6]
+	for ping, source in zip(synthetic.readpings(filename), pings):
+		np.testing.assert_allclose(ping.DEPTH_ARRAY, source.DEPTH_ARRAY, atol=0.005)
+		assert ping.scalefactorsd[pygsf.DEPTH_ARRAY].multiplier == 100
+
+###############################################################################
+def test_override_scale_factors(tmp_path):
+	filename = str(tmp_path / "override.gsf")
+	ping = synthetic.makeping(synthetic.STARTTIME)
+	ping.DEPTH_ARRAY = ping.DEPTH_ARRAY + 0.0004
+	with pygsf.GSFWRITER(filename, scalefactors={pygsf.DEPTH_ARRAY: (10000, 0, 4)}) as writer:
+		writer.writeping(ping)
+
+	(readback,) = synthetic.readpings(filename)
+	assert readback.scalefactorsd[pygsf.DEPTH_ARRAY].multiplier == 10000
+	np.testing.assert_allclose(readback.DEPTH_ARRAY, ping.DEPTH_ARRAY, atol=0.00005)
+
+###############################################################################
+def test_copies_undecoded_subrecords(tmp_path):
+	source = str(tmp_path / "source.gsf")
+	copy = str(tmp_path / "copy.gsf")
+	ping = synthetic.makeping(synthetic.STARTTIME)
+	depths, size = pygsf.quantisearray(pygsf.DEPTH_ARRAY, ping.DEPTH_ARRAY, 100, 0, 2)
+	acrosstrack, size = pygsf.quantisearray(pygsf.ACROSS_TRACK_ARRAY, ping.ACROSS_TRACK_ARRAY, 100, 0, 2)
+	# gsflib pads the intensity series to 4 bytes without counting the padding, and sensor specific subrecords are never decoded
+	intensity = pygsf.packsubrecord(pygsf.INTENSITY_SERIES_ARRAY, bytes(range(22))) + bytes(2)
+	sensor = pygsf.packsubrecord(151, b'sensor specific data')
+	body = pygsf.packpingheader(ping) + pygsf.packscalefactors({pygsf.DEPTH_ARRAY: (100, 0, 2), pygsf.ACROSS_TRACK_ARRAY: (100, 0, 2)})
+	body += pygsf.packsubrecord(pygsf.DEPTH_ARRAY, depths) + intensity + pygsf.packsubrecord(pygsf.ACROSS_TRACK_ARRAY, acrosstrack) + sensor
+	with pygsf.GSFWRITER(source) as writer:
+		writer.writerecord(pygsf.SWATH_BATHYMETRY, body)
+
+	# the writer copies from the source file, so keep the reader open while we write
+	reader = pygsf.GSFREADER(source)
+	with pygsf.GSFWRITER(copy) as writer:
+		while reader.moreData():
+			numberofbytes, recordidentifier, datagram = reader.readDatagram()
+			if recordidentifier == pygsf.SWATH_BATHYMETRY:
+				datagram.read({}, fields=[pygsf.DEPTH_ARRAY])
+				writer.writeping(datagram)
+	reader.close()
+
+	sourcerecords = list(pygsfconditioner.readrecords(source))
+	copyrecords = list(pygsfconditioner.readrecords(copy))
+	assert copyrecords == sourcerecords
+
+	(readback,) = synthetic.readpings(copy)
+	np.testing.assert_allclose(readback.ACROSS_TRACK_ARRAY, ping.ACROSS_TRACK_ARRAY, atol=0.005)
+
+###############################################################################
+def test_attitude_split_across_records(tmp_path):
+	filename = str(tmp_path / "attitude.gsf")
+	attitude = synthetic.makeattitude(synthetic.STARTTIME, 100)
+	with pygsf.GSFWRITER(filename) as writer:
+		records = writer.writeattitude(attitude)
+
+	# each record holds at most 32.767 seconds as the measurement times are 2 byte millisecond offsets
+	assert records == 4
+	assert synthetic.recordidentifiers(filename).count(pygsf.ATTITUDE) == records
+
+	readback = pygsf.GSFREADER(filename).loadattitude()
+	assert len(readback) == len(attitude)
+	np.testing.assert_allclose(readback['timestamp'], attitude['timestamp'], atol=0.0005)
+	for name in ["roll", "pitch", "heave"]:
+		np.testing.assert_allclose(readback[name], attitude[name], atol=0.005, err_msg=name)
+	np.testing.assert_allclose(angledifference(readback['heading'], attitude['heading']), 0, atol=0.005)
+
+###############################################################################
+def test_sound_velocity_profile_and_comment(tmp_path):
+	filename = str(tmp_path / "records.gsf")
+	with pygsf.GSFWRITER(filename) as writer:
+		writer.writecomment(synthetic.STARTTIME, "processed with pygsf")
+		writer.writesoundvelocityprofile(synthetic.STARTTIME, synthetic.STARTTIME + 60, 151.25, -33.5, [0.0, 10.5, 250.0], [1500.0, 1498.75, 1480.5])
+
+	(comment,) = readrecords(filename, pygsf.COMMENT)
+	assert comment.comment == "processed with pygsf"
+	assert comment.timeofcomment + (comment.timeofcommentnanoseconds / 1000000000) == synthetic.STARTTIME
+
+	(svp,) = readrecords(filename, pygsf.SOUND_VELOCITY_PROFILE)
+	assert svp.timeofobservation == int(synthetic.STARTTIME)
+	assert svp.timeofapplication == int(synthetic.STARTTIME + 60)
+	assert svp.longitude == pytest.approx(151.25)
+	assert svp.latitude == pytest.approx(-33.5)
+	np.testing.assert_allclose(svp.depths, [0.0, 10.5, 250.0])
+	np.testing.assert_allclose(svp.velocities, [1500.0, 1498.75, 1480.5])
+
+###############################################################################
+def test_quantisearray_widens_the_field():
+	raw, size = pygsf.quantisearray(pygsf.DEPTH_ARRAY, [10.0, 20.0], 100, 0, 2)
+	assert size == 2
+	assert np.frombuffer(raw, dtype='>u2').tolist() == [1000, 2000]
+
+	raw, size = pygsf.quantisearray(pygsf.DEPTH_ARRAY, [10.0, 1000.0], 100, 0, 2)
+	assert size == 4
+	assert np.frombuffer(raw, dtype='>u4').tolist() == [1000, 100000]
+
+	# across track is signed
+	raw, size = pygsf.quantisearray(pygsf.ACROSS_TRACK_ARRAY, [-300.0, 300.0], 100, 0, 2)
+	assert size == 2
+	assert np.frombuffer(raw, dtype='>i2').tolist() == [-30000, 30000]
+
+###############################################################################
+def test_quantisearray_rejects_values_it_cannot_write():
+	with pytest.raises(ValueError):
+		pygsf.quantisearray(pygsf.DEPTH_ARRAY, [10.0, np.nan], 100, 0, 2)
+	with pytest.raises(ValueError):
+		pygsf.quantisearray(pygsf.DEPTH_ARRAY, [-10.0], 100, 0, 2)
+	with pytest.raises(ValueError):
+		pygsf.quantisearray(pygsf.DEPTH_ARRAY, [1.0e9], 100, 0, 4)
@@ -0,0 +1,120 @@
+#name:			test_index
+#created:		October 2026
+#description:	tests for the record index sidecar and the random access built on it
+
+import os
+
+import numpy as np
+
+import pygsf
+import synthetic
+
+###############################################################################
+def test_bool_does_not_index_the_file(tmp_path):
+	filename = str(tmp_path / "survey.gsf")
+	synthetic.writesurvey(filename)
+	reader = pygsf.GSFREADER(filename)
+
+	assert reader
+	assert os.listdir(str(tmp_path)) == ["survey.gsf"]
+	assert len(reader) == 20
+	assert sorted(os.listdir(str(tmp_path))) == ["survey.gsf", "survey.gsf" + pygsf.GSFIDX_EXTENSION]
+
+###############################################################################
+def test_sidecar_round_trip(tmp_path):
+	filename = str(tmp_path / "survey.gsf")
+	synthetic.writesurvey(filename)
+	sidecar = filename + ".test"
+	arrays = [np.arange(5, dtype=np.int64), np.linspace(0, 1, 3)]
+	dtypes = [np.int64, np.float64]
+
+	assert pygsf.writesidecar(sidecar, filename, b"GSFTST", 1, arrays, dtypes)
+	for array, expected in zip(pygsf.readsidecar(sidecar, filename, b"GSFTST", 1, dtypes), arrays):
+		np.testing.assert_array_equal(array, expected)
+	# a different version is stale
+	assert pygsf.readsidecar(sidecar, filename, b"GSFTST", 2, dtypes) is None
+	assert sorted(os.listdir(str(tmp_path))) == ["survey.gsf", "survey.gsf.test"]
+
+###############################################################################
+def test_failed_sidecar_write_leaves_nothing_behind(tmp_path):
+	filename = str(tmp_path / "survey.gsf")
+	synthetic.writesurvey(filename)
+	# a folder in the way of the sidecar makes the final rename fail
+	os.makedirs(str(tmp_path / "blocked" / "inside"))
+
+	assert not pygsf.writesidecar(str(tmp_path / "blocked"), filename, b"GSFTST", 1, [np.arange(3)], [np.int64])
+	assert sorted(os.listdir(str(tmp_path))) == ["blocked", "survey.gsf"]
+
+###############################################################################
+def writewidenedsurvey(filename):
+	'''the pings of test_scale_factors_written_only_on_change, where ping 5 needs a wider depth field so the scale factors change mid file'''
+	pings = [synthetic.makeping(synthetic.STARTTIME + i) for i in range(10)]
+	pings[5].DEPTH_ARRAY = pings[5].DEPTH_ARRAY + 1000.0
+	with pygsf.GSFWRITER(filename) as writer:
+		for ping in pings:
+			writer.writeping(ping)
+	return [ping.DEPTH_ARRAY for ping in pings]
+
+###############################################################################
+def writelatescalefactors(filename):
+	'''pings whose scale factors follow a sensor specific subrecord rather than lead the ping.  the depth multiplier changes from ping 5'''
+	depths = []
+	with pygsf.GSFWRITER(filename) as writer:
+		for i in range(10):
+			ping = synthetic.makeping(synthetic.STARTTIME + i)
+			multiplier = 100 if i < 5 else 1000
+			body = pygsf.packpingheader(ping) + pygsf.packsubrecord(pygsf.R2SONIC_2024_SPECIFIC, bytes(16))
+			if i in (0, 5):
+				body += pygsf.packscalefactors({pygsf.DEPTH_ARRAY: (multiplier, 0, 4)})
+			depths.append(ping.DEPTH_ARRAY + (i * 0.001))
+			raw, bytespervalue = pygsf.quantisearray(pygsf.DEPTH_ARRAY, depths[-1], multiplier, 0, 4)
+			writer.writerecord(pygsf.SWATH_BATHYMETRY, body + pygsf.packsubrecord(pygsf.DEPTH_ARRAY, raw))
+	return depths
+
+###############################################################################
+def sequentialpings(reader):
+	'''read every ping in file order, carrying the scale factors forward'''
+	pings = []
+	scalefactorsd = {}
+	while reader.moreData():
+		numberofbytes, recordidentifier, datagram = reader.readDatagram()
+		if recordidentifier == pygsf.SWATH_BATHYMETRY:
+			scalefactorsd = datagram.read(scalefactorsd)
+			pings.append(datagram)
+	return pings
+
+###############################################################################
+def assertsamepings(pings, expected):
+	'''pings may be datagrams or the dictionaries from decode_parallel'''
+	assert len(pings) == len(expected)
+	for ping, other in zip(pings, expected):
+		if isinstance(ping, dict):
+			assert ping["timestamp"] == other.timestamp
+			for name, values in ping.items():
+				if name in pygsf.ARRAYNAMES.values():
+					np.testing.assert_array_equal(values, getattr(other, name), err_msg=name)
+			continue
+		assert ping.timestamp == other.timestamp
+		for name in pygsf.ARRAYNAMES.values():
+			np.testing.assert_array_equal(getattr(ping, name), getattr(other, name), err_msg=name)
+
+###############################################################################
+def test_random_access_when_the_scale_factors_change(tmp_path):
+	for writesurvey in [writewidenedsurvey, writelatescalefactors]:
+		filename = str(tmp_path / (writesurvey.__name__ + ".gsf"))
+		depths = writesurvey(filename)
+		expected = synthetic.readpings(filename)
+		for ping, depth in zip(expected, depths):
+			np.testing.assert_allclose(ping.DEPTH_ARRAY, depth, atol=0.005)
+
+		for options in [{}, {"mmap": True}, {"prefetch": 4}]:
+			reader = pygsf.GSFREADER(filename, **options)
+			assert len(reader) == 10
+			assertsamepings(reader.readpings(range(10)), expected)
+			assertsamepings(reader.readpings([7, 5, 4]), [expected[7], expected[5], expected[4]])
+			assertsamepings(reader.read_time_range(expected[3].timestamp, expected[8].timestamp), expected[3:9])
+			for workers in [1, 2]:
+				assertsamepings(reader.decode_parallel(workers=workers), expected)
+			reader.rewind()
+			assertsamepings(sequentialpings(reader), expected)
+			reader.close()
@@ -0,0 +1,76 @@
+#name:			test_interpolation
+#created:		October 2026
+#description:	tests for the vectorised attitude and navigation interpolation
+
+import numpy as np
+
+import pygsf
+import synthetic
+
+###############################################################################
+def interpolate(seriestimes, values, times, period=None, previous=False):
+	return pygsf.interpolatevalues(values, pygsf.interpolationweights(seriestimes, np.asarray(times, dtype=np.float64)), period=period, previous=previous)
+
+###############################################################################
+def test_interpolatevalues_linear():
+	result = interpolate([0.0, 1.0, 2.0], [10.0, 20.0, 40.0], [0.0, 0.25, 1.0, 1.5, 2.0])
+	np.testing.assert_allclose(result, [10.0, 12.5, 20.0, 30.0, 40.0])
+
+###############################################################################
+def test_interpolatevalues_outside_the_series_is_nan():
+	result = interpolate([0.0, 1.0], [10.0, 20.0], [-0.1, 0.5, 1.1])
+	assert np.isnan(result[0]) and np.isnan(result[2])
+	assert result[1] == 15.0
+
+###############################################################################
+def test_interpolatevalues_unsorted_series():
+	result = interpolate([2.0, 0.0, 1.0], [40.0, 10.0, 20.0], [0.5, 1.5])
+	np.testing.assert_allclose(result, [15.0, 30.0])
+
+###############################################################################
+def test_interpolatevalues_short_series():
+	assert np.isnan(interpolate([0.0], [10.0], [0.0, 1.0])).all()
+	assert np.isnan(interpolate([], [], [0.0])).all()
+
+###############################################################################
+def test_interpolatevalues_wraps_with_a_period():
+	result = interpolate([0.0, 1.0], [350.0, 10.0], [0.5, 0.75], period=360.0) % 360.0
+	np.testing.assert_allclose(result, [0.0, 5.0], atol=1e-9)
+
+###############################################################################
+def test_interpolatevalues_previous():
+	result = interpolate([0.0, 1.0, 2.0], [0.0, 1.0, 2.0], [0.0, 0.5, 1.0, 1.9, 2.0], previous=True)
+	np.testing.assert_allclose(result, [0.0, 0.0, 1.0, 1.0, 2.0])
+
+###############################################################################
+def test_interpolateattitude_keeps_the_shape_of_times():
+	attitude = synthetic.makeattitude(synthetic.STARTTIME, 10)
+	times = synthetic.STARTTIME + np.array([[1.05, 2.05], [3.05, 4.05]])
+	result = pygsf.interpolateattitude(attitude, times)
+	assert result.shape == (2, 2)
+	np.testing.assert_allclose(result['roll'], 3.0 * np.sin(times - synthetic.STARTTIME), atol=0.01)
+
+###############################################################################
+def test_interpolatenavigation_across_the_antimeridian():
+	navigation = np.zeros(2, dtype=pygsf.NAVIGATION_DTYPE)
+	navigation['timestamp'] = [0.0, 1.0]
+	navigation['longitude'] = [179.9, -179.9]
+	navigation['heading'] = [359.0, 1.0]
+	result = pygsf.interpolatenavigation(navigation, [0.25, 0.5])
+	np.testing.assert_allclose(np.abs(result['longitude']), [179.95, 180.0])
+	np.testing.assert_allclose(result['heading'] % 360.0, [359.5, 0.0], atol=1e-9)
+	np.testing.assert_allclose(result['deltatime'], [0.25, 0.5])
+
+###############################################################################
+def test_interpolate_attitude_at_the_pings(tmp_path):
+	filename = str(tmp_path / "survey.gsf")
+	synthetic.writesurvey(filename)
+	reader = pygsf.GSFREADER(filename)
+	attitude = reader.loadattitude()
+	navigation = reader.loadnavigation()
+	reader.close()
+
+	pingattitude = pygsf.interpolateattitude(attitude, navigation['timestamp'])
+	phase = navigation['timestamp'] - synthetic.STARTTIME
+	np.testing.assert_allclose(pingattitude['roll'], 3.0 * np.sin(phase), atol=0.02)
+	np.testing.assert_allclose(pingattitude['pitch'], 1.5 * np.cos(phase), atol=0.02)
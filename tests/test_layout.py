@@ -0,0 +1,105 @@
+#name:			test_layout
+#created:		October 2026
+#description:	tests that the compiled ping layout decodes the same as the generic subrecord walk
+
+import numpy as np
+
+import pygsf
+import synthetic
+
+###############################################################################
+def makebeams(numbeams, seed):
+	'''a few intensity samples per beam with a bottom detect in range'''
+	rng = np.random.default_rng(seed)
+	return [(list(rng.integers(1, 3000, size=3 + (beam % 4))), 1) for beam in range(numbeams)]
+
+###############################################################################
+def writesnippetpings(filename, beamcounts, sensorid=pygsf.R2SONIC_2024_SPECIFIC):
+	'''write a ping per beam count with a sensor specific subrecord and a padded intensity series, with the scale factors on the first ping only'''
+	with pygsf.GSFWRITER(filename) as writer:
+		for i, numbeams in enumerate(beamcounts):
+			ping = synthetic.makeping(synthetic.STARTTIME + (i * synthetic.PINGINTERVAL), numbeams=numbeams, depth=20.0 + i)
+			scalefactors = synthetic.defaultscalefactors() if i == 0 else None
+			writer.writerecord(pygsf.SWATH_BATHYMETRY, synthetic.packsnippetping(ping, makebeams(numbeams, i), scalefactors, sensorid))
+
+###############################################################################
+def decode(filename, compiled, fields=None, usemmap=False):
+	'''read every ping, either through the compiled layouts or the generic decode.  returns the pings and the layouts compiled'''
+	reader = pygsf.GSFREADER(filename, mmap=usemmap)
+	if not compiled:
+		reader.layoutcache = None
+	pings = []
+	scalefactorsd = {}
+	while reader.moreData():
+		numberofbytes, recordidentifier, datagram = reader.readDatagram()
+		if recordidentifier == pygsf.SWATH_BATHYMETRY:
+			scalefactorsd = datagram.read(scalefactorsd, fields=fields)
+			pings.append(datagram)
+	reader.close()
+	return pings, reader.layoutcache
+
+###############################################################################
+def assertsamepings(pings, expected):
+	assert len(pings) == len(expected)
+	for ping, other in zip(pings, expected):
+		assert (ping.timestamp, ping.numbeams, ping.sensorid) == (other.timestamp, other.numbeams, other.sensorid)
+		for name in list(pygsf.ARRAYNAMES.values()) + ["SNIPPET_SERIES_ARRAY"]:
+			np.testing.assert_array_equal(getattr(ping, name), getattr(other, name), err_msg=name)
+
+###############################################################################
+def test_compiled_layout_with_padded_intensity_series(tmp_path):
+	filename = str(tmp_path / "snippets.gsf")
+	writesnippetpings(filename, [8] * 4)
+
+	generic, layouts = decode(filename, compiled=False)
+	compiled, layouts = decode(filename, compiled=True)
+	mapped, mappedlayouts = decode(filename, compiled=True, usemmap=True)
+
+	# the first ping carries the scale factors so its subrecords sit further along
+	assert len(layouts) == 2
+	assert len(mappedlayouts) == 2
+	assertsamepings(compiled, generic)
+	assertsamepings(mapped, generic)
+	# the arrays after the padded intensity series are still where they should be
+	np.testing.assert_allclose(generic[0].BEAM_ANGLE_ARRAY, np.linspace(-60, 60, 8), atol=0.005)
+	assert generic[0].sensorid == pygsf.R2SONIC_2024_SPECIFIC
+	assert np.all(generic[0].SNIPPET_SERIES_ARRAY > 0)
+
+###############################################################################
+def test_compiled_layout_with_other_sensors(tmp_path):
+	filename = str(tmp_path / "snippets.gsf")
+	writesnippetpings(filename, [8] * 3, sensorid=149)
+
+	generic, layouts = decode(filename, compiled=False)
+	compiled, layouts = decode(filename, compiled=True)
+
+	assertsamepings(compiled, generic)
+	assert all(ping.sensorid == 149 for ping in compiled)
+	assert all(np.all(ping.SNIPPET_SERIES_ARRAY == 0) for ping in compiled)
+
+###############################################################################
+def test_compiled_layout_when_the_beam_count_changes(tmp_path):
+	filename = str(tmp_path / "snippets.gsf")
+	writesnippetpings(filename, [8, 8, 6, 6, 8, 5])
+
+	generic, layouts = decode(filename, compiled=False)
+	compiled, layouts = decode(filename, compiled=True)
+
+	# one layout per beam count, plus the first ping which carries the scale factors
+	assert len(layouts) == 4
+	assert [ping.numbeams for ping in compiled] == [8, 8, 6, 6, 8, 5]
+	assertsamepings(compiled, generic)
+
+###############################################################################
+def test_compiled_layout_with_fields(tmp_path):
+	filename = str(tmp_path / "snippets.gsf")
+	writesnippetpings(filename, [8, 8, 6, 8])
+
+	for fields in [[pygsf.DEPTH_ARRAY], [pygsf.ACROSS_TRACK_ARRAY, pygsf.INTENSITY_SERIES_ARRAY], [pygsf.BEAM_ANGLE_ARRAY]]:
+		generic, layouts = decode(filename, compiled=False, fields=fields)
+		compiled, layouts = decode(filename, compiled=True, fields=fields)
+
+		assertsamepings(compiled, generic)
+		for ping in compiled:
+			for subrecordid, name in pygsf.ARRAYNAMES.items():
+				assert (len(getattr(ping, name)) > 0) == (subrecordid in fields), name
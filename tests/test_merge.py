@@ -0,0 +1,91 @@
+#name:			test_merge
+#created:		October 2026
+#description:	tests for splitting gsf files by size and duration and merging them in pygsfconditioner
+
+import os
+
+import numpy as np
+
+import pygsf
+import pygsfconditioner
+import synthetic
+
+###############################################################################
+def writeprofileandpings(filename, starttime, velocity, pingcount=3, profiletime=synthetic.STARTTIME):
+	'''a file with one sound velocity profile and a few pings'''
+	with pygsf.GSFWRITER(filename) as writer:
+		writer.writesoundvelocityprofile(profiletime, profiletime, 151.0, -33.0, [0.0, 100.0], [velocity, velocity - 10.0])
+		for i in range(pingcount):
+			writer.writeping(synthetic.makeping(starttime + i))
+
+###############################################################################
+def test_split_by_duration(tmp_path):
+	filename = str(tmp_path / "survey.gsf")
+	written = synthetic.writesurvey(filename)
+
+	outfilenames = pygsfconditioner.splitfile(filename, "parts", "_part", pygsfconditioner.durationkeys(3.0), keepleading=True)
+
+	assert [os.path.basename(f) for f in outfilenames] == ["survey_part%d.gsf" % i for i in range(4)]
+	pings = [synthetic.readpings(f) for f in outfilenames]
+	assert [len(p) for p in pings] == [6, 6, 6, 2]
+	assert [ping.timestamp for part in pings for ping in part] == [ping.timestamp for ping in written]
+	# the first part keeps everything before the first ping, the comment included
+	assert synthetic.recordidentifiers(outfilenames[0]).count(pygsf.COMMENT) == 1
+
+###############################################################################
+def test_split_by_size_keeps_checksums(tmp_path):
+	filename = str(tmp_path / "survey.gsf")
+	synthetic.writesurvey(filename, pingcount=40)
+	checksummed = str(tmp_path / "checksummed.gsf")
+	synthetic.addchecksums(filename, checksummed)
+
+	outfilenames = pygsfconditioner.splitfile(checksummed, "parts", "_part", pygsfconditioner.sizekeys(os.path.getsize(checksummed) // 3), keepleading=True)
+
+	assert len(outfilenames) == 3
+	assert sum(len(synthetic.readpings(f)) for f in outfilenames) == 40
+	# the scale factors inserted into the first ping of each part are added to its checksum
+	for outfilename in outfilenames:
+		assert pygsf.GSFREADER(outfilename).verify(workers=1)['errors'] == []
+
+###############################################################################
+def test_merge_undoes_a_split(tmp_path):
+	filename = str(tmp_path / "survey.gsf")
+	written = synthetic.writesurvey(filename)
+	outfilenames = pygsfconditioner.splitfile(filename, "parts", "_part", pygsfconditioner.durationkeys(3.0), keepleading=True)
+	merged = str(tmp_path / "merged.gsf")
+
+	# the parts are put back in time order whatever order they are given in
+	pygsfconditioner.mergefiles(list(reversed(outfilenames)), merged)
+
+	assert synthetic.recordidentifiers(merged) == synthetic.recordidentifiers(filename)
+	pings = synthetic.readpings(merged)
+	assert [ping.timestamp for ping in pings] == [ping.timestamp for ping in written]
+	for ping, source in zip(pings, written):
+		np.testing.assert_allclose(ping.DEPTH_ARRAY, source.DEPTH_ARRAY, atol=0.005)
+
+###############################################################################
+def test_merge_keeps_a_profile_which_changes_back(tmp_path):
+	filenames = [str(tmp_path / name) for name in ["a.gsf", "b.gsf", "c.gsf"]]
+	# the third file goes back to the first profile, so it must be written again
+	writeprofileandpings(filenames[0], synthetic.STARTTIME, 1500.0)
+	writeprofileandpings(filenames[1], synthetic.STARTTIME + 10, 1490.0)
+	writeprofileandpings(filenames[2], synthetic.STARTTIME + 20, 1500.0)
+	merged = str(tmp_path / "merged.gsf")
+
+	count = pygsfconditioner.mergefiles(filenames, merged)
+
+	profile = [pygsf.SOUND_VELOCITY_PROFILE] + ([pygsf.SWATH_BATHYMETRY] * 3)
+	assert synthetic.recordidentifiers(merged) == [pygsf.HEADER] + (profile * 3)
+	assert count == 13
+
+###############################################################################
+def test_merge_drops_a_repeated_profile(tmp_path):
+	filenames = [str(tmp_path / name) for name in ["a.gsf", "b.gsf"]]
+	writeprofileandpings(filenames[0], synthetic.STARTTIME, 1500.0)
+	writeprofileandpings(filenames[1], synthetic.STARTTIME + 10, 1500.0)
+	merged = str(tmp_path / "merged.gsf")
+
+	pygsfconditioner.mergefiles(filenames, merged)
+
+	assert synthetic.recordidentifiers(merged).count(pygsf.SOUND_VELOCITY_PROFILE) == 1
+	assert len(synthetic.readpings(merged)) == 6
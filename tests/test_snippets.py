@@ -0,0 +1,154 @@
+#name:			test_snippets
+#created:		October 2026
+#description:	tests for the intensity time series (snippet) decode and reductions
+
+import math
+import struct
+
+import numpy as np
+import pytest
+
+import pygsf
+import synthetic
+
+# (samples, bottom detect) per beam: a zero sample, an empty beam, a beam of zeros, bottom detects past the end and negative, and a wide spread for the 5dB cut
+BEAMS = [
+	([120, 0, 300, 45], 2),
+	([], 0),
+	([0, 0, 0], 1),
+	([500, 600, 700], 3),
+	([10, 60000, 12], -1),
+	([65535, 1, 2000, 2100], 0),
+]
+
+REDUCTIONS = [pygsf.SNIPPET_MEAN, pygsf.SNIPPET_MAX, pygsf.SNIPPET_DETECT, pygsf.SNIPPET_MEAN5DB]
+
+###############################################################################
+def clipbeams(bitspersample):
+	'''the test beams with the samples clipped to fit bitspersample'''
+	highest = (2 ** bitspersample) - 1
+	return [([min(sample, highest) for sample in samples], bottomdetect) for samples, bottomdetect in BEAMS]
+
+###############################################################################
+def reference(beams, snippettype, scale=1, offset=0):
+	'''reduce each beam to one value the slow way, one beam at a time'''
+	result = []
+	for samples, bottomdetect in beams:
+		if snippettype == pygsf.SNIPPET_DETECT:
+			result.append((samples[bottomdetect] / scale) - offset if 0 <= bottomdetect < len(samples) else 0)
+			continue
+		values = [(sample / scale) - offset for sample in samples if sample != 0]
+		if snippettype == pygsf.SNIPPET_MEAN5DB:
+			values = [value for value in values if value > 0]
+		if len(values) == 0:
+			result.append(0)
+		elif snippettype == pygsf.SNIPPET_MEAN:
+			result.append(sum(values) / len(values))
+		elif snippettype == pygsf.SNIPPET_MAX:
+			result.append(max(values))
+		elif snippettype == pygsf.SNIPPET_MEAN5DB:
+			db = [20.0 * math.log10(value) for value in values]
+			meandb = sum(db) / len(db)
+			inside = [value for value in db if abs(value - meandb) < 5]
+			result.append(sum(inside) / len(inside) if inside else meandb)
+	return result
+
+###############################################################################
+def writesnippetping(filename, beams, intensityscale=(1, 0, 2), sensorid=pygsf.R2SONIC_2024_SPECIFIC, **kwargs):
+	'''write one ping with the intensity series of beams and its own intensity scale factor'''
+	ping = synthetic.makeping(synthetic.STARTTIME, numbeams=len(beams))
+	scalefactors = synthetic.defaultscalefactors()
+	scalefactors[pygsf.INTENSITY_SERIES_ARRAY] = intensityscale
+	with pygsf.GSFWRITER(filename) as writer:
+		writer.writerecord(pygsf.SWATH_BATHYMETRY, synthetic.packsnippetping(ping, beams, scalefactors, sensorid, **kwargs))
+
+###############################################################################
+def readsnippetping(filename, snippettype, snippetseries=False):
+	'''read the ping written by writesnippetping, reducing the snippets as per snippettype'''
+	reader = pygsf.GSFREADER(filename, snippetseries=snippetseries)
+	while reader.moreData():
+		numberofbytes, recordidentifier, datagram = reader.readDatagram()
+		if recordidentifier == pygsf.SWATH_BATHYMETRY:
+			datagram.snippettype = snippettype
+			datagram.read({})
+			reader.close()
+			return datagram
+
+###############################################################################
+@pytest.mark.parametrize("bitspersample", [8, 16, 32])
+@pytest.mark.parametrize("snippettype", REDUCTIONS)
+def test_reductions_match_a_per_beam_reference(tmp_path, bitspersample, snippettype):
+	filename = str(tmp_path / "snippets.gsf")
+	beams = clipbeams(bitspersample)
+	writesnippetping(filename, beams, bitspersample=bitspersample)
+
+	ping = readsnippetping(filename, snippettype)
+
+	np.testing.assert_allclose(ping.SNIPPET_SERIES_ARRAY, reference(beams, snippettype))
+
+###############################################################################
+@pytest.mark.parametrize("snippettype", REDUCTIONS)
+def test_reductions_are_scaled(tmp_path, snippettype):
+	filename = str(tmp_path / "snippets.gsf")
+	writesnippetping(filename, BEAMS, intensityscale=(2, 1, 2))
+
+	ping = readsnippetping(filename, snippettype)
+
+	# the 5dB mean drops the samples which scale to zero or below
+	np.testing.assert_allclose(ping.SNIPPET_SERIES_ARRAY, reference(BEAMS, snippettype, scale=2, offset=1))
+
+###############################################################################
+@pytest.mark.parametrize("bitspersample", [8, 16, 32])
+def test_snippet_series_is_kept_flat(tmp_path, bitspersample):
+	filename = str(tmp_path / "snippets.gsf")
+	beams = clipbeams(bitspersample)
+	writesnippetping(filename, beams, bitspersample=bitspersample)
+
+	ping = readsnippetping(filename, pygsf.SNIPPET_NONE, snippetseries=True)
+
+	assert ping.SNIPPET_SAMPLES.dtype == pygsf.SNIPPETSAMPLETYPES[bitspersample // 8]
+	np.testing.assert_array_equal(ping.SNIPPET_SAMPLES, [sample for samples, bottomdetect in beams for sample in samples])
+	np.testing.assert_array_equal(ping.SNIPPET_BEAM_OFFSETS, np.cumsum([0] + [len(samples) for samples, bottomdetect in beams]))
+	np.testing.assert_array_equal(ping.SNIPPET_BOTTOM_DETECT, [bottomdetect for samples, bottomdetect in beams])
+	for beam, (samples, bottomdetect) in enumerate(beams):
+		np.testing.assert_array_equal(ping.snippetbeam(beam), samples)
+	np.testing.assert_array_equal(ping.SNIPPET_SERIES_ARRAY, np.zeros(len(beams)))
+
+###############################################################################
+def test_splitsnippets_and_reducesnippets():
+	subrecord = synthetic.packintensityseries(BEAMS)
+	size = struct.unpack_from('>L', subrecord)[0] & 0x00FFFFFF
+	end = 4 + size
+	pos = 4 + struct.calcsize(pygsf.INTENSITY_SERIES_HEADER_FORMAT) + struct.calcsize(pygsf.R2SONIC_IMAGERY_FORMAT)
+
+	samples, counts, bottomdetect = pygsf.splitsnippets(subrecord, pos, end, len(BEAMS), 2)
+
+	np.testing.assert_array_equal(samples, [sample for beam in BEAMS for sample in beam[0]])
+	np.testing.assert_array_equal(counts, [len(beam[0]) for beam in BEAMS])
+	np.testing.assert_array_equal(bottomdetect, [beam[1] for beam in BEAMS])
+	for snippettype in REDUCTIONS:
+		np.testing.assert_allclose(pygsf.reducesnippets(samples, counts, bottomdetect, snippettype), reference(BEAMS, snippettype))
+	# beams which run past the end of the subrecord
+	assert pygsf.splitsnippets(subrecord, pos, end - 2, len(BEAMS), 2) is None
+	assert pygsf.splitsnippets(subrecord, pos, end, len(BEAMS) + 1, 2) is None
+
+###############################################################################
+def test_other_sensors_are_left_as_zeros(tmp_path):
+	filename = str(tmp_path / "snippets.gsf")
+	writesnippetping(filename, BEAMS, sensorid=149)
+
+	ping = readsnippetping(filename, pygsf.SNIPPET_MAX, snippetseries=True)
+
+	assert ping.sensorid == 149
+	np.testing.assert_array_equal(ping.SNIPPET_SERIES_ARRAY, np.zeros(len(BEAMS)))
+	assert len(ping.SNIPPET_SAMPLES) == 0
+
+###############################################################################
+def test_serial_number_which_is_not_utf8(tmp_path):
+	filename = str(tmp_path / "snippets.gsf")
+	writesnippetping(filename, BEAMS, sensorid=pygsf.R2SONIC_2022_SPECIFIC, serialnumber=b'\xff\xfeSN99')
+
+	ping = readsnippetping(filename, pygsf.SNIPPET_MAX)
+
+	assert ping.serialnumber == "SN99"
+	np.testing.assert_allclose(ping.SNIPPET_SERIES_ARRAY, reference(BEAMS, pygsf.SNIPPET_MAX))
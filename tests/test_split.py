@@ -0,0 +1,80 @@
+#name:			test_split
+#created:		October 2026
+#description:	tests for cutting gsf files by time window and polygon in pygsfconditioner
+
+import os
+
+import numpy as np
+
+import pygsf
+import pygsfconditioner
+import synthetic
+
+###############################################################################
+def pingtimes(filename):
+	return [ping.timestamp for ping in synthetic.readpings(filename)]
+
+###############################################################################
+def test_pointinpolygon():
+	square = [(0, 0), (10, 0), (10, 10), (0, 10)]
+	assert pygsfconditioner.pointinpolygon(5, 5, square)
+	assert not pygsfconditioner.pointinpolygon(15, 5, square)
+	assert not pygsfconditioner.pointinpolygon(5, -1, square)
+	# an L shape, so the notch is outside even though it is inside the bounding box
+	lshape = [(0, 0), (10, 0), (10, 4), (4, 4), (4, 10), (0, 10)]
+	assert pygsfconditioner.pointinpolygon(2, 8, lshape)
+	assert pygsfconditioner.pointinpolygon(8, 2, lshape)
+	assert not pygsfconditioner.pointinpolygon(8, 8, lshape)
+
+###############################################################################
+def test_split_by_time_window(tmp_path):
+	filename = str(tmp_path / "survey.gsf")
+	written = synthetic.writesurvey(filename)
+	start = synthetic.STARTTIME
+	windows = [(start + 1, start + 3), (start + 2, start + 5)]
+
+	outfilenames = pygsfconditioner.splitfile(filename, "split", "_window", pygsfconditioner.timewindowkeys(windows))
+
+	assert [os.path.basename(f) for f in outfilenames] == ["survey_window0.gsf", "survey_window1.gsf"]
+	for outfilename, (first, last) in zip(outfilenames, windows):
+		expected = [ping for ping in written if first <= ping.timestamp <= last]
+		pings = synthetic.readpings(outfilename)
+		assert [ping.timestamp for ping in pings] == [ping.timestamp for ping in expected]
+		# the first ping of each piece carries the scale factors, so it decodes on its own
+		for ping, source in zip(pings, expected):
+			np.testing.assert_allclose(ping.DEPTH_ARRAY, source.DEPTH_ARRAY, atol=0.005)
+		# and each piece starts with the records in effect at its first ping
+		identifiers = synthetic.recordidentifiers(outfilename)
+		assert identifiers[0] == pygsf.HEADER
+		firstping = identifiers.index(pygsf.SWATH_BATHYMETRY)
+		assert pygsf.SOUND_VELOCITY_PROFILE in identifiers[:firstping]
+		assert pygsf.ATTITUDE in identifiers[:firstping]
+
+###############################################################################
+def test_split_by_polygon(tmp_path):
+	filename = str(tmp_path / "passes.gsf")
+	# two passes through the box, with pings outside it before, between and after
+	longitudes = [150.0, 151.0, 151.1, 151.2, 150.0, 150.0, 151.3, 151.4, 152.0]
+	pings = [synthetic.makeping(synthetic.STARTTIME + i, longitude=longitude) for i, longitude in enumerate(longitudes)]
+	with pygsf.GSFWRITER(filename) as writer:
+		for ping in pings:
+			writer.writeping(ping)
+	box = [(150.5, -34.0), (151.5, -34.0), (151.5, -32.0), (150.5, -32.0)]
+
+	outfilenames = pygsfconditioner.splitfile(filename, "split", "_segment", pygsfconditioner.polygonkeys(box))
+
+	assert [os.path.basename(f) for f in outfilenames] == ["passes_segment1.gsf", "passes_segment2.gsf"]
+	assert pingtimes(outfilenames[0]) == [pings[i].timestamp for i in [1, 2, 3]]
+	assert pingtimes(outfilenames[1]) == [pings[i].timestamp for i in [6, 7]]
+
+###############################################################################
+def test_split_excludes_records(tmp_path):
+	filename = str(tmp_path / "survey.gsf")
+	synthetic.writesurvey(filename)
+	windows = [(synthetic.STARTTIME, synthetic.STARTTIME + 2)]
+
+	(outfilename,) = pygsfconditioner.splitfile(filename, "split", "_window", pygsfconditioner.timewindowkeys(windows), exclude=[pygsf.ATTITUDE])
+
+	identifiers = synthetic.recordidentifiers(outfilename)
+	assert pygsf.ATTITUDE not in identifiers
+	assert identifiers.count(pygsf.SWATH_BATHYMETRY) == 5
@@ -0,0 +1,122 @@
+#name:			test_verify
+#created:		October 2026
+#description:	tests for the checksum aware record header decoding and the integrity verify
+
+import os
+import struct
+
+import pytest
+
+import pygsf
+import synthetic
+
+###############################################################################
+@pytest.fixture
+def checksummedfile(tmp_path):
+	'''a synthetic survey with a checksum on every record'''
+	filename = str(tmp_path / "survey.gsf")
+	synthetic.writesurvey(filename, pingcount=50)
+	checksummed = str(tmp_path / "checksummed.gsf")
+	synthetic.addchecksums(filename, checksummed)
+	return checksummed
+
+###############################################################################
+def recordheaders(filename):
+	'''(offset, numberofbytes, recordidentifier, header length) for every record in the file'''
+	reader = pygsf.GSFREADER(filename)
+	headers = [(offset, numberofbytes, recordidentifier, hdrlen) for offset, numberofbytes, recordidentifier, hdrlen, peek in reader.walkheaders()]
+	reader.close()
+	return headers
+
+###############################################################################
+def rewrite(filename, offset, data):
+	with open(filename, 'r+b') as f:
+		f.seek(offset, 0)
+		f.write(data)
+
+###############################################################################
+def test_decoderecordheader():
+	assert pygsf.decoderecordheader(16, pygsf.SWATH_BATHYMETRY) == (24, pygsf.SWATH_BATHYMETRY, False, 8)
+	assert pygsf.decoderecordheader(16, pygsf.SWATH_BATHYMETRY | 0x80000000) == (28, pygsf.SWATH_BATHYMETRY, True, 12)
+
+###############################################################################
+def test_checksumerrors():
+	buffer = bytes(range(1, 17)) + bytes(4) + bytes([255] * 8)
+	good = (0, pygsf.COMMENT, 0, 16, sum(range(1, 17)))
+	empty = (16, pygsf.COMMENT, 16, 16, 0)
+	bad = (20, pygsf.SWATH_BATHYMETRY, 20, 28, 1)
+	assert pygsf.checksumerrors(buffer, []) == []
+	assert pygsf.checksumerrors(buffer, [good, empty]) == []
+	errors = pygsf.checksumerrors(buffer, [good, empty, bad])
+	assert [(offset, recordidentifier) for offset, recordidentifier, reason in errors] == [(20, pygsf.SWATH_BATHYMETRY)]
+	assert "checksum mismatch" in errors[0][2]
+
+###############################################################################
+def test_checksumerrors_wraps_at_32_bits():
+	buffer = bytes([255]) * 32
+	assert pygsf.checksumerrors(buffer, [(0, pygsf.COMMENT, 0, 32, (255 * 32) & 0xFFFFFFFF)]) == []
+
+###############################################################################
+def test_findrecordheader(checksummedfile):
+	headers = recordheaders(checksummedfile)
+	filesize = os.path.getsize(checksummedfile)
+	with open(checksummedfile, 'rb') as f:
+		assert pygsf.findrecordheader(f, 0, filesize) == 0
+		# from part way through a record we skip to the next one, whatever the block size
+		for blocksize in [64, 4096]:
+			assert pygsf.findrecordheader(f, headers[3][0] + 5, filesize, blocksize) == headers[4][0]
+		assert pygsf.findrecordheader(f, headers[-1][0] + 4, filesize) == filesize
+
+###############################################################################
+def test_verify_clean_file(checksummedfile):
+	headers = recordheaders(checksummedfile)
+	assert all(hdrlen == 12 for offset, numberofbytes, recordidentifier, hdrlen in headers)
+	result = pygsf.GSFREADER(checksummedfile).verify(workers=1)
+	assert result == {'records': len(headers), 'checksummed': len(headers), 'errors': []}
+
+###############################################################################
+def test_verify_finds_a_flipped_byte(checksummedfile):
+	headers = recordheaders(checksummedfile)
+	pings = [header for header in headers if header[2] == pygsf.SWATH_BATHYMETRY]
+	offset, numberofbytes, recordidentifier, hdrlen = pings[10]
+	with open(checksummedfile, 'rb') as f:
+		f.seek(offset + hdrlen + 20, 0)
+		value = f.read(1)[0]
+	rewrite(checksummedfile, offset + hdrlen + 20, bytes([value ^ 0x01]))
+
+	result = pygsf.GSFREADER(checksummedfile).verify(workers=1)
+	assert result['records'] == len(headers)
+	assert [(o, r) for o, r, reason in result['errors']] == [(offset, pygsf.SWATH_BATHYMETRY)]
+
+###############################################################################
+def test_verify_resynchronises_after_a_bad_header(checksummedfile):
+	headers = recordheaders(checksummedfile)
+	offset = headers[5][0]
+	rewrite(checksummedfile, offset + 4, struct.pack('>L', 0x7F000000))
+
+	result = pygsf.GSFREADER(checksummedfile).verify(workers=1)
+	assert [(o, reason) for o, r, reason in result['errors']] == [(offset, "bad record header")]
+	# only the corrupt record is lost
+	assert result['records'] == len(headers) - 1
+
+###############################################################################
+def test_verify_truncated_file(checksummedfile):
+	filesize = os.path.getsize(checksummedfile)
+	with open(checksummedfile, 'r+b') as f:
+		f.truncate(filesize - 10)
+	result = pygsf.GSFREADER(checksummedfile).verify(workers=1)
+	assert len(result['errors']) == 1
+	assert result['errors'][0][0] == recordheaders(checksummedfile)[-1][0]
+	assert "truncated" in result['errors'][0][2]
+
+###############################################################################
+def test_verify_in_parallel_matches_serial(checksummedfile):
+	headers = recordheaders(checksummedfile)
+	offset, numberofbytes, recordidentifier, hdrlen = headers[len(headers) // 2]
+	rewrite(checksummedfile, offset + hdrlen, b'\xff\xff')
+
+	serial = pygsf.GSFREADER(checksummedfile).verify(workers=1, blocksize=256)
+	parallel = pygsf.GSFREADER(checksummedfile).verify(workers=2, blocksize=256)
+	assert parallel == serial
+	assert serial['records'] == len(headers)
+	assert [o for o, r, reason in serial['errors']] == [offset]
@@ -0,0 +1,17 @@
+#name:			timeutils
+#created:		October 2026
+#description:	time helpers shared by the command line tools
+
+from datetime import datetime
+from datetime import timezone
+
+###############################################################################
+def parsetime(value):
+	'''convert an ISO 8601 UTC time or seconds since 1970 into seconds since 1970'''
+	try:
+		return float(value)
+	except ValueError:
+		dt = datetime.fromisoformat(value)
+		if dt.tzinfo is None:
+			dt = dt.replace(tzinfo=timezone.utc)
+		return dt.timestamp()